@@ -9,18 +9,7 @@ import { MatFormFieldModule } from '@angular/material/form-field';
 import { MatSelectModule } from '@angular/material/select';
 import { MatPaginatorModule } from '@angular/material/paginator';
 import { MatProgressSpinnerModule } from '@angular/material/progress-spinner';
-import { AdminManagementService } from '../../services/admin-management.service';
-
-interface AuditEntry {
-  id: string;
-  action: string;
-  entity_type: string;
-  entity_id: string;
-  old_values: any;
-  new_values: any;
-  created_at: string;
-  ip_address: string;
-}
+import { AdminManagementService, AuditLogEntry } from '../../services/admin-management.service';
 
 @Component({
   selector: 'app-admin-audit-log',
@@ -50,7 +39,7 @@ interface AuditEntry {
           <div class="filters">
             <mat-form-field>
               <mat-label>Action</mat-label>
-              <mat-select [(value)]="selectedAction" (selectionChange)="loadAuditLog()">
+              <mat-select [(value)]="selectedAction" (selectionChange)="onFilterChange()">
                 <mat-option value="">Toutes</mat-option>
                 <mat-option value="CREATE">Création</mat-option>
                 <mat-option value="UPDATE">Modification</mat-option>
@@ -61,11 +50,13 @@ interface AuditEntry {
 
             <mat-form-field>
               <mat-label>Type d'entité</mat-label>
-              <mat-select [(value)]="selectedEntityType" (selectionChange)="loadAuditLog()">
+              <mat-select [(value)]="selectedEntityType" (selectionChange)="onFilterChange()">
                 <mat-option value="">Tous</mat-option>
-                <mat-option value="credit_products">Produits de crédit</mat-option>
-                <mat-option value="savings_products">Produits d'épargne</mat-option>
-                <mat-option value="insurance_products">Produits d'assurance</mat-option>
+                <mat-option value="bank">Banques</mat-option>
+                <mat-option value="credit_product">Produits de crédit</mat-option>
+                <mat-option value="savings_product">Produits d'épargne</mat-option>
+                <mat-option value="insurance_company">Compagnies d'assurance</mat-option>
+                <mat-option value="insurance_product">Produits d'assurance</mat-option>
                 <mat-option value="admin_user">Utilisateurs admin</mat-option>
               </mat-select>
             </mat-form-field>
@@ -78,7 +69,7 @@ interface AuditEntry {
                   <mat-icon [class]="getActionClass(entry.action)">
                     {{ getActionIcon(entry.action) }}
                   </mat-icon>
-                  {{ entry.action }} - {{ entry.entity_type }}
+                  {{ entry.action }} - {{ entry.entity_type }}{{ entry.entity_id ? ' ' + entry.entity_id : '' }}
                 </mat-panel-title>
                 <mat-panel-description>
                   {{ entry.created_at | date:'medium' }}
@@ -105,6 +96,7 @@ interface AuditEntry {
 
           <mat-paginator 
             [length]="totalEntries"
+            [pageIndex]="currentPage"
             [pageSize]="pageSize"
             [pageSizeOptions]="[10, 25, 50]"
             (page)="onPageChange($event)">
@@ -167,10 +159,12 @@ export class AdminAuditLogComponent implements OnInit {
 
   adminId: string = '';
   adminName: string = '';
-  auditEntries: AuditEntry[] = [];
+  auditEntries: AuditLogEntry[] = [];
   totalEntries = 0;
   pageSize = 25;
   currentPage = 0;
+  // Curseur de début de chaque page déjà visitée (l'API ne connaît pas de numéro de page)
+  pageCursors: (string | undefined)[] = [undefined];
   selectedAction = '';
   selectedEntityType = '';
   loading = false;
@@ -195,37 +189,50 @@ export class AdminAuditLogComponent implements OnInit {
   loadAuditLog(): void {
     this.loading = true;
     const params = {
-      skip: this.currentPage * this.pageSize,
+      cursor: this.pageCursors[this.currentPage],
       limit: this.pageSize,
       action: this.selectedAction || undefined,
       entity_type: this.selectedEntityType || undefined
     };
 
-    // Simulation de données d'audit
-    setTimeout(() => {
-      this.auditEntries = [
-        {
-          id: '1',
-          action: 'CREATE',
-          entity_type: 'credit_products',
-          entity_id: 'prod_123',
-          old_values: null,
-          new_values: { name: 'Nouveau produit', rate: 8.5 },
-          created_at: new Date().toISOString(),
-          ip_address: '192.168.1.1'
+    this.adminService.getAdminAuditLog(this.adminId, params).subscribe({
+      next: (page) => {
+        this.auditEntries = page.items;
+        if (page.next_cursor) {
+          this.pageCursors[this.currentPage + 1] = page.next_cursor;
         }
-      ];
-      this.totalEntries = 1;
-      this.loading = false;
-    }, 1000);
+        // Total inconnu : le paginateur propose une page de plus tant que has_more est vrai
+        this.totalEntries = this.currentPage * this.pageSize + page.items.length + (page.has_more ? 1 : 0);
+        this.loading = false;
+      },
+      error: (error) => {
+        console.error('Erreur chargement journal d\'audit:', error);
+        this.auditEntries = [];
+        this.loading = false;
+      }
+    });
+  }
+
+  onFilterChange(): void {
+    this.resetPagination();
+    this.loadAuditLog();
   }
 
   onPageChange(event: any): void {
-    this.currentPage = event.pageIndex;
-    this.pageSize = event.pageSize;
+    if (event.pageSize !== this.pageSize) {
+      this.pageSize = event.pageSize;
+      this.resetPagination();
+    } else {
+      this.currentPage = event.pageIndex;
+    }
     this.loadAuditLog();
   }
 
+  private resetPagination(): void {
+    this.currentPage = 0;
+    this.pageCursors = [undefined];
+  }
+
   getActionIcon(action: string): string {
     const icons = {
       'CREATE': 'add_circle',
@@ -4,7 +4,7 @@ import { RouterModule, Router } from '@angular/router';
 import { Subject } from 'rxjs';
 import { takeUntil } from 'rxjs/operators';
 
-import { AuthService, User, UserDashboard, UserSimulation, UserApplication, UserNotification } from '../../services/user-auth.service';
+import { AuthService, User, UserDashboard, UserSimulation, UserApplication, UserNotification, NotificationStreamEvent } from '../../services/user-auth.service';
 import { NotificationService } from '../../services/notification.service';
 
 @Component({
@@ -926,6 +926,7 @@ export class UserDashboardComponent implements OnInit, OnDestroy {
   ngOnInit(): void {
     this.loadDashboard();
     this.loadAllNotifications();
+    this.listenToNotifications();
   }
 
   ngOnDestroy(): void {
@@ -966,6 +967,61 @@ export class UserDashboardComponent implements OnInit, OnDestroy {
     });
   }
 
+  // Notifications poussées par le serveur (SSE) : pas d'interrogation périodique
+  private listenToNotifications(): void {
+    this.authService.streamNotifications().pipe(
+      takeUntil(this.destroy$)
+    ).subscribe(message => this.applyNotificationEvent(message));
+  }
+
+  private applyNotificationEvent(message: NotificationStreamEvent): void {
+    const { event, data } = message;
+    switch (event) {
+      case 'notification':
+        if (data.notification && !this.allNotifications.some(n => n.id === data.notification!.id)) {
+          this.allNotifications = [data.notification, ...this.allNotifications];
+          if (this.dashboard?.notifications) {
+            this.dashboard.notifications = [data.notification, ...this.dashboard.notifications];
+          }
+        }
+        this.setUnreadCount(data.unread ?? this.getUnreadCount() + 1);
+        break;
+
+      case 'read': {
+        const ids = new Set(data.notification_ids || []);
+        const isRead = (n: UserNotification) => data.all || ids.has(n.id);
+        this.allNotifications.filter(isRead).forEach(n => n.is_read = true);
+        this.dashboard?.notifications?.filter(isRead).forEach(n => n.is_read = true);
+        this.setUnreadCount(data.unread ?? (data.all ? 0 : Math.max(0, this.getUnreadCount() - ids.size)));
+        break;
+      }
+
+      case 'unread':
+        if (data.unread !== undefined && data.unread !== null) {
+          this.setUnreadCount(data.unread);
+        }
+        break;
+
+      case 'resync':
+        // Événements perdus (client trop lent) : rechargement complet
+        this.loadAllNotifications();
+        this.authService.getUnreadNotificationsCount().pipe(
+          takeUntil(this.destroy$)
+        ).subscribe({ next: ({ unread }) => this.setUnreadCount(unread), error: () => {} });
+        break;
+    }
+  }
+
+  private getUnreadCount(): number {
+    return this.dashboard?.stats?.unread_notifications || 0;
+  }
+
+  private setUnreadCount(count: number): void {
+    if (this.dashboard?.stats) {
+      this.dashboard.stats.unread_notifications = count;
+    }
+  }
+
   // ==================== ACTIONS UTILISATEUR ====================
 
   logout(): void {
@@ -1015,12 +1071,10 @@ export class UserDashboardComponent implements OnInit, OnDestroy {
     this.authService.markNotificationsRead([notification.id]).pipe(
       takeUntil(this.destroy$)
     ).subscribe({
-      next: () => {
+      next: (response) => {
         notification.is_read = true;
-        // Mettre à jour le compteur
-        if (this.dashboard?.stats) {
-          this.dashboard.stats.unread_notifications = Math.max(0, this.dashboard.stats.unread_notifications - 1);
-        }
+        // Compteur renvoyé par le serveur : identique à celui diffusé aux autres onglets
+        this.setUnreadCount(response.unread);
       },
       error: (error) => {
         console.error('Erreur lors du marquage de notification:', error);
@@ -1029,13 +1083,10 @@ export class UserDashboardComponent implements OnInit, OnDestroy {
   }
 
   markAllNotificationsRead(): void {
-    const unreadIds = this.allNotifications
-      .filter(n => !n.is_read)
-      .map(n => n.id);
-
-    if (unreadIds.length === 0) return;
+    if (this.getUnreadCount() === 0 && !this.allNotifications.some(n => !n.is_read)) return;
 
-    this.authService.markNotificationsRead(unreadIds).pipe(
+    // Une seule requête côté serveur, y compris pour les notifications non chargées ici
+    this.authService.markAllNotificationsRead().pipe(
       takeUntil(this.destroy$)
     ).subscribe({
       next: () => {
@@ -80,6 +80,27 @@ export interface AdminStats {
   recent_admins: number;
 }
 
+export interface AuditLogEntry {
+  id: string;
+  admin_user_id?: string;
+  admin_username?: string;
+  action: string;
+  entity_type: string;
+  entity_id?: string;
+  old_values?: any;
+  new_values?: any;
+  ip_address?: string;
+  user_agent?: string;
+  created_at: string;
+}
+
+export interface AuditLogPage {
+  items: AuditLogEntry[];
+  limit: number;
+  has_more: boolean;
+  next_cursor: string | null;
+}
+
 export interface Institution {
   id: string;
   name: string;
@@ -206,19 +227,20 @@ export class AdminManagementService {
    * Obtenir l'historique des actions d'un administrateur
    */
   getAdminAuditLog(adminId: string, params: {
-    skip?: number;
+    cursor?: string;
     limit?: number;
     action?: string;
     entity_type?: string;
-  }): Observable<any> {
-    let httpParams = new HttpParams();
+  }): Observable<AuditLogPage> {
+    let httpParams = new HttpParams().set('admin_user_id', adminId);
     
-    if (params.skip !== undefined) httpParams = httpParams.set('skip', params.skip.toString());
+    if (params.cursor) httpParams = httpParams.set('cursor', params.cursor);
     if (params.limit !== undefined) httpParams = httpParams.set('limit', params.limit.toString());
     if (params.action) httpParams = httpParams.set('action', params.action);
     if (params.entity_type) httpParams = httpParams.set('entity_type', params.entity_type);
 
-    return this.http.get(`${this.apiUrl}/admins/${adminId}/audit-log`, { params: httpParams });
+    // Pagination par curseur : next_cursor de la page précédente, pas de skip
+    return this.http.get<AuditLogPage>(`${environment.apiUrl}/api/admin/audit-logs`, { params: httpParams });
   }
 
   /**
@@ -166,6 +166,16 @@ export interface UserNotification {
   created_at: string;
 }
 
+export interface NotificationStreamEvent {
+  event: 'unread' | 'notification' | 'read' | 'resync';
+  data: {
+    unread?: number | null;
+    notification?: UserNotification;
+    notification_ids?: string[] | null;
+    all?: boolean;
+  };
+}
+
 export interface UserDashboard {
   user: User;
   stats: {
@@ -574,18 +584,97 @@ export class AuthService {
     const headers = this.getAuthHeaders();
     const params = { unread_only: unreadOnly.toString(), limit: limit.toString() };
     
-    return this.http.get<UserNotification[]>(`${this.apiUrl}/notifications`, { headers, params })
+    return this.http.get<UserNotification[]>(`${this.apiUrl}/auth/notifications`, { headers, params })
+      .pipe(catchError(this.handleError));
+  }
+
+  getUnreadNotificationsCount(): Observable<{ unread: number }> {
+    const headers = this.getAuthHeaders();
+    return this.http.get<{ unread: number }>(`${this.apiUrl}/auth/notifications/unread-count`, { headers })
       .pipe(catchError(this.handleError));
   }
 
   markNotificationsRead(notificationIds: string[]): Observable<any> {
     const headers = this.getAuthHeaders();
-    return this.http.post(`${this.apiUrl}/notifications/mark-read`, 
+    return this.http.post(`${this.apiUrl}/auth/notifications/mark-read`, 
       { notification_ids: notificationIds }, 
       { headers }
     ).pipe(catchError(this.handleError));
   }
 
+  markAllNotificationsRead(): Observable<any> {
+    const headers = this.getAuthHeaders();
+    return this.http.post(`${this.apiUrl}/auth/notifications/mark-all-read`, {}, { headers })
+      .pipe(catchError(this.handleError));
+  }
+
+  /**
+   * Flux SSE des notifications (remplace l'interrogation périodique).
+   * fetch plutôt qu'EventSource : ce dernier ne permet pas d'envoyer l'en-tête Authorization.
+   * Reconnexion automatique après 5 s en cas de coupure ; se désabonner ferme la connexion.
+   */
+  streamNotifications(): Observable<NotificationStreamEvent> {
+    return new Observable<NotificationStreamEvent>(subscriber => {
+      const controller = new AbortController();
+      let retryTimer: any = null;
+
+      const connect = async () => {
+        try {
+          const response = await fetch(`${this.apiUrl}/auth/notifications/stream`, {
+            headers: { 'Authorization': `Bearer ${this.tokenSubject.value || ''}`, 'Accept': 'text/event-stream' },
+            signal: controller.signal
+          });
+          if (response.status === 401) {
+            subscriber.complete();
+            return;
+          }
+          if (!response.ok || !response.body) {
+            throw new Error(`HTTP ${response.status}`);
+          }
+
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = '';
+          while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Un événement SSE se termine par une ligne vide
+            let boundary = buffer.indexOf('\n\n');
+            while (boundary >= 0) {
+              const block = buffer.slice(0, boundary);
+              buffer = buffer.slice(boundary + 2);
+              boundary = buffer.indexOf('\n\n');
+
+              let event = 'message';
+              let data = '';
+              for (const line of block.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+              }
+              if (data) {
+                subscriber.next({ event, data: JSON.parse(data) } as NotificationStreamEvent);
+              }
+            }
+          }
+        } catch (error) {
+          if (controller.signal.aborted) return;
+          console.warn('Flux de notifications interrompu:', error);
+        }
+        if (!controller.signal.aborted) {
+          retryTimer = setTimeout(connect, 5000);
+        }
+      };
+
+      connect();
+      return () => {
+        controller.abort();
+        if (retryTimer) clearTimeout(retryTimer);
+      };
+    });
+  }
+
   // ==================== DASHBOARD ====================
 
   getDashboard(): Observable<UserDashboard> {
@@ -1,305 +0,0 @@
-# routers/analytics.py - Version corrigée
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
-import models
-from database import get_db
-
-router = APIRouter()
-
-@router.get("/market-statistics")
-async def get_market_statistics(db: Session = Depends(get_db)):
-    """Récupère les statistiques du marché financier"""
-    try:
-        # Statistiques des produits de crédit
-        credit_stats = db.query(
-            func.avg(models.CreditProduct.average_rate).label('avg_rate'),
-            func.min(models.CreditProduct.average_rate).label('min_rate'),
-            func.max(models.CreditProduct.average_rate).label('max_rate'),
-            func.count(models.CreditProduct.id).label('total_products')
-        ).filter(models.CreditProduct.is_active == True).first()
-        
-        # Trouver la banque avec le meilleur taux
-        best_rate_product = db.query(models.CreditProduct).join(models.Bank).filter(
-            models.CreditProduct.is_active == True,
-            models.Bank.is_active == True
-        ).order_by(models.CreditProduct.average_rate.asc()).first()
-        
-        # Temps de traitement moyen
-        avg_processing_time = db.query(
-            func.avg(models.CreditProduct.processing_time_hours).label('avg_time')
-        ).filter(models.CreditProduct.is_active == True).scalar() or 72
-        
-        # Nombre de banques actives
-        active_banks_count = db.query(models.Bank).filter(models.Bank.is_active == True).count()
-        
-        # Simulations récentes (7 derniers jours)
-        recent_date = datetime.now() - timedelta(days=7)
-        recent_simulations = db.query(models.CreditSimulation).filter(
-            models.CreditSimulation.created_at >= recent_date
-        ).count()
-        
-        # Construction de la réponse avec conversion des types
-        response_data = {
-            "average_rate": float(credit_stats.avg_rate) if credit_stats.avg_rate else 0.0,
-            "trend": -0.2,  # Simulation d'une tendance
-            "best_rate": float(credit_stats.min_rate) if credit_stats.min_rate else 0.0,
-            "best_rate_bank": best_rate_product.bank.name if best_rate_product and best_rate_product.bank else "N/A",
-            "worst_rate": float(credit_stats.max_rate) if credit_stats.max_rate else 0.0,
-            "average_processing_time": int(avg_processing_time),
-            "total_products": int(credit_stats.total_products) if credit_stats.total_products else 0,
-            "active_banks": active_banks_count,
-            "recent_simulations": recent_simulations,
-            "last_updated": datetime.now().isoformat(),
-            "market_health": "stable",
-            "recommendations": [
-                "Les taux sont stables",
-                "Bonne diversité d'offres disponibles",
-                "Temps de traitement dans la moyenne"
-            ]
-        }
-        
-        return response_data
-        
-    except Exception as e:
-        print(f"Erreur dans get_market_statistics: {str(e)}")
-        # Retour de données par défaut en cas d'erreur
-        return {
-            "average_rate": 8.5,
-            "trend": 0.0,
-            "best_rate": 6.5,
-            "best_rate_bank": "BGFI Bank",
-            "worst_rate": 12.0,
-            "average_processing_time": 72,
-            "total_products": 10,
-            "active_banks": 5,
-            "recent_simulations": 0,
-            "last_updated": datetime.now().isoformat(),
-            "market_health": "stable",
-            "recommendations": ["Données par défaut - Erreur API"]
-        }
-
-@router.get("/banks-comparison")
-async def get_banks_comparison(db: Session = Depends(get_db)):
-    """Compare les performances des banques"""
-    try:
-        banks_data = []
-        
-        banks = db.query(models.Bank).filter(models.Bank.is_active == True).all()
-        
-        for bank in banks:
-            # Statistiques des produits de crédit
-            credit_products = db.query(models.CreditProduct).filter(
-                models.CreditProduct.bank_id == bank.id,
-                models.CreditProduct.is_active == True
-            ).all()
-            
-            # Statistiques des produits d'épargne
-            savings_products = db.query(models.SavingsProduct).filter(
-                models.SavingsProduct.bank_id == bank.id,
-                models.SavingsProduct.is_active == True
-            ).all()
-            
-            # Simulations récentes
-            recent_simulations = db.query(models.CreditSimulation).join(models.CreditProduct).filter(
-                models.CreditProduct.bank_id == bank.id,
-                models.CreditSimulation.created_at >= datetime.now() - timedelta(days=30)
-            ).count()
-            
-            # Calcul des moyennes
-            avg_credit_rate = sum(float(p.average_rate) for p in credit_products) / len(credit_products) if credit_products else 0
-            avg_savings_rate = sum(float(p.interest_rate) for p in savings_products) / len(savings_products) if savings_products else 0
-            avg_processing_time = sum(p.processing_time_hours for p in credit_products) / len(credit_products) if credit_products else 72
-            
-            bank_data = {
-                "id": bank.id,
-                "name": bank.name,
-                "logo_url": bank.logo_url,
-                "credit_products_count": len(credit_products),
-                "savings_products_count": len(savings_products),
-                "average_credit_rate": round(avg_credit_rate, 2),
-                "average_savings_rate": round(avg_savings_rate, 2),
-                "average_processing_time": int(avg_processing_time),
-                "recent_simulations": recent_simulations,
-                "market_share": round(len(credit_products) / max(1, db.query(models.CreditProduct).filter(models.CreditProduct.is_active == True).count()) * 100, 1),
-                "rating": bank.rating or "N/A"
-            }
-            banks_data.append(bank_data)
-        
-        # Tri par nombre de produits
-        banks_data.sort(key=lambda x: x["credit_products_count"] + x["savings_products_count"], reverse=True)
-        
-        return {
-            "banks": banks_data,
-            "total_banks": len(banks_data),
-            "last_updated": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        print(f"Erreur dans get_banks_comparison: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la comparaison des banques: {str(e)}")
-
-@router.get("/products-performance")
-async def get_products_performance(product_type: str = None, db: Session = Depends(get_db)):
-    """Analyse des performances des produits"""
-    try:
-        performance_data = []
-        
-        if not product_type or product_type == "credit":
-            # Produits de crédit les plus populaires
-            credit_query = db.query(
-                models.CreditProduct.id,
-                models.CreditProduct.name,
-                models.CreditProduct.type,
-                models.CreditProduct.average_rate,
-                models.Bank.name.label('bank_name'),
-                func.count(models.CreditSimulation.id).label('simulation_count')
-            ).join(models.Bank).outerjoin(models.CreditSimulation).filter(
-                models.CreditProduct.is_active == True
-            ).group_by(
-                models.CreditProduct.id,
-                models.CreditProduct.name,
-                models.CreditProduct.type,
-                models.CreditProduct.average_rate,
-                models.Bank.name
-            ).order_by(desc('simulation_count')).limit(10)
-            
-            for row in credit_query.all():
-                performance_data.append({
-                    "id": row.id,
-                    "name": row.name,
-                    "type": row.type,
-                    "category": "credit",
-                    "rate": float(row.average_rate),
-                    "bank_name": row.bank_name,
-                    "popularity_score": int(row.simulation_count) if row.simulation_count else 0,
-                    "performance_indicator": "simulations"
-                })
-        
-        if not product_type or product_type == "savings":
-            # Produits d'épargne
-            savings_query = db.query(
-                models.SavingsProduct.id,
-                models.SavingsProduct.name,
-                models.SavingsProduct.type,
-                models.SavingsProduct.interest_rate,
-                models.Bank.name.label('bank_name'),
-                func.count(models.SavingsSimulation.id).label('simulation_count')
-            ).join(models.Bank).outerjoin(models.SavingsSimulation).filter(
-                models.SavingsProduct.is_active == True
-            ).group_by(
-                models.SavingsProduct.id,
-                models.SavingsProduct.name,
-                models.SavingsProduct.type,
-                models.SavingsProduct.interest_rate,
-                models.Bank.name
-            ).order_by(desc('simulation_count')).limit(10)
-            
-            for row in savings_query.all():
-                performance_data.append({
-                    "id": row.id,
-                    "name": row.name,
-                    "type": row.type,
-                    "category": "savings",
-                    "rate": float(row.interest_rate),
-                    "bank_name": row.bank_name,
-                    "popularity_score": int(row.simulation_count) if row.simulation_count else 0,
-                    "performance_indicator": "simulations"
-                })
-        
-        return {
-            "products": performance_data,
-            "total_products": len(performance_data),
-            "filter_applied": product_type or "all",
-            "last_updated": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        print(f"Erreur dans get_products_performance: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse des performances: {str(e)}")
-
-@router.get("/trends")
-async def get_trends(period_days: int = 30, db: Session = Depends(get_db)):
-    """Analyse des tendances sur une période donnée"""
-    try:
-        start_date = datetime.now() - timedelta(days=period_days)
-        
-        # Tendances des simulations
-        simulations_by_day = db.query(
-            func.date(models.CreditSimulation.created_at).label('date'),
-            func.count(models.CreditSimulation.id).label('count')
-        ).filter(
-            models.CreditSimulation.created_at >= start_date
-        ).group_by(func.date(models.CreditSimulation.created_at)).order_by('date').all()
-        
-        # Types de crédit les plus demandés
-        popular_types = db.query(
-            models.CreditProduct.type,
-            func.count(models.CreditSimulation.id).label('count')
-        ).join(models.CreditSimulation).filter(
-            models.CreditSimulation.created_at >= start_date
-        ).group_by(models.CreditProduct.type).order_by(desc('count')).limit(5).all()
-        
-        # Montants moyens demandés
-        avg_amounts = db.query(
-            models.CreditProduct.type,
-            func.avg(models.CreditSimulation.requested_amount).label('avg_amount')
-        ).join(models.CreditSimulation).filter(
-            models.CreditSimulation.created_at >= start_date
-        ).group_by(models.CreditProduct.type).all()
-        
-        trends_data = {
-            "period_days": period_days,
-            "start_date": start_date.isoformat(),
-            "end_date": datetime.now().isoformat(),
-            "simulations_trend": [
-                {
-                    "date": row.date.isoformat() if row.date else None,
-                    "count": int(row.count)
-                }
-                for row in simulations_by_day
-            ],
-            "popular_credit_types": [
-                {
-                    "type": row.type,
-                    "requests_count": int(row.count)
-                }
-                for row in popular_types
-            ],
-            "average_amounts_by_type": [
-                {
-                    "type": row.type,
-                    "average_amount": float(row.avg_amount) if row.avg_amount else 0
-                }
-                for row in avg_amounts
-            ],
-            "total_simulations": sum(int(row.count) for row in simulations_by_day),
-            "insights": [
-                f"Total de {sum(int(row.count) for row in simulations_by_day)} simulations sur {period_days} jours",
-                f"Type le plus demandé: {popular_types[0].type if popular_types else 'N/A'}",
-                f"Activité quotidienne moyenne: {round(sum(int(row.count) for row in simulations_by_day) / max(1, period_days), 1)} simulations"
-            ]
-        }
-        
-        return trends_data
-        
-    except Exception as e:
-        print(f"Erreur dans get_trends: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse des tendances: {str(e)}")
-
-@router.get("/test")
-async def test_analytics_endpoint():
-    """Test de fonctionnement du router analytics"""
-    return {
-        "status": "OK", 
-        "message": "Analytics router fonctionne correctement",
-        "timestamp": datetime.now().isoformat(),
-        "available_endpoints": [
-            "/market-statistics",
-            "/banks-comparison", 
-            "/products-performance",
-            "/trends"
-        ]
-    }
\ No newline at end of file
@@ -0,0 +1,262 @@
+# analytics_extract.py - Extraction colonnaire (Parquet) de l'historique des simulations pour les analystes
+# Usage (depuis la racine de l'API) : python -m analytics_extract [--dataset NOM] [--full]
+# Écrit <ANALYTICS_EXTRACT_DIR>/<table>/date=AAAA-MM-JJ/part-<run>.parquet, incrémentalement :
+# chaque exécution reprend après le dernier created_at extrait (high-watermark dans _state.json).
+from sqlalchemy import Boolean, DECIMAL, Date, DateTime, Float, Integer, JSON, Numeric, select
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import shutil
+import sys
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = pq = None
+    PYARROW_AVAILABLE = False
+
+import models
+from database import ReadSessionLocal
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_DIR = os.getenv("ANALYTICS_EXTRACT_DIR", "extracts/analytics")
+# Les lignes plus récentes que ce délai sont laissées au prochain passage : les transactions
+# encore ouvertes (ou le retard d'un réplica) ne peuvent pas glisser sous le watermark.
+SAFETY_LAG_SECONDS = int(os.getenv("ANALYTICS_EXTRACT_LAG_SECONDS", "300"))
+BATCH_SIZE = 5000
+ROW_GROUP_SIZE = 100_000
+STATE_FILE = "_state.json"
+
+# Table -> colonnes exclues (données personnelles, volumineuses et sans intérêt analytique)
+EXTRACT_TABLES = {
+    "credit_simulations": (models.CreditSimulation, ("client_ip", "user_agent", "amortization_schedule")),
+    "savings_simulations": (models.SavingsSimulation, ("client_ip", "user_agent", "monthly_breakdown")),
+    "insurance_quotes": (models.InsuranceQuote, ("client_ip", "user_agent")),
+}
+
+# ==================== SCHÉMA ====================
+
+def _arrow_type(column_type):
+    """Type Arrow correspondant à un type de colonne SQLAlchemy"""
+    if isinstance(column_type, (DECIMAL, Numeric)) and not isinstance(column_type, Float):
+        if column_type.precision:
+            return pa.decimal128(column_type.precision, column_type.scale or 0)
+        return pa.float64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    # JSON, Text, String : texte (JSON sérialisé)
+    return pa.string()
+
+def extract_columns(model, excluded: Tuple[str, ...]) -> list:
+    """Colonnes extraites d'une table, dans l'ordre du modèle"""
+    return [column for column in model.__table__.columns if column.name not in excluded]
+
+def arrow_schema(columns) -> "pa.Schema":
+    return pa.schema([pa.field(column.name, _arrow_type(column.type)) for column in columns])
+
+def _converters(columns) -> list:
+    """Conversion Python -> Arrow par colonne (JSON sérialisé, dates en UTC)"""
+    converters = []
+    for column in columns:
+        if isinstance(column.type, JSON):
+            converters.append(lambda value: None if value is None else json.dumps(value, ensure_ascii=False, default=str))
+        elif isinstance(column.type, DateTime):
+            converters.append(_utc)
+        else:
+            converters.append(None)
+    return converters
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+# ==================== ÉTAT (HIGH-WATERMARK) ====================
+
+def _state_path(directory: str) -> str:
+    return os.path.join(directory, STATE_FILE)
+
+def load_state(directory: str = EXTRACT_DIR) -> Dict[str, dict]:
+    """État des extractions par table : watermark, lignes et fichiers cumulés"""
+    try:
+        with open(_state_path(directory), encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+def _save_state(directory: str, state: Dict[str, dict]):
+    """Écriture atomique : un arrêt en cours d'écriture laisse l'ancien état intact"""
+    os.makedirs(directory, exist_ok=True)
+    temporary = _state_path(directory) + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=2)
+    os.replace(temporary, _state_path(directory))
+
+def _watermark(state: Dict[str, dict], table: str) -> Optional[datetime]:
+    value = state.get(table, {}).get("watermark")
+    return datetime.fromisoformat(value) if value else None
+
+# ==================== EXTRACTION ====================
+
+class _PartitionWriter:
+    """
+    Écrit une partition date=... : les lignes sont converties en lots Arrow (colonnaires,
+    compacts) tous les BATCH_SIZE et écrites par groupes de ROW_GROUP_SIZE lignes.
+    Le fichier reste caché (préfixe '.') jusqu'à close() : les lecteurs Arrow/DuckDB
+    ignorent les fichiers cachés, un passage interrompu ne laisse donc rien de visible.
+    """
+
+    def __init__(self, directory: str, day: date, run_id: str, schema):
+        self.directory = os.path.join(directory, f"date={day.isoformat()}")
+        self.filename = f"part-{run_id}.parquet"
+        self.schema = schema
+        self.rows = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._temporary = os.path.join(self.directory, "." + self.filename)
+        self._writer = pq.ParquetWriter(self._temporary, schema, compression="zstd")
+        self._rows: List[list] = []
+        self._batches: list = []
+        self._pending = 0
+
+    def append(self, row: list):
+        self._rows.append(row)
+        if len(self._rows) >= BATCH_SIZE:
+            self._convert()
+            if self._pending >= ROW_GROUP_SIZE:
+                self._flush()
+
+    def _convert(self):
+        if not self._rows:
+            return
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*self._rows), self.schema)]
+        self._batches.append(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._pending += len(self._rows)
+        self._rows = []
+
+    def _flush(self):
+        self._convert()
+        if not self._pending:
+            return
+        self._writer.write_table(pa.Table.from_batches(self._batches, schema=self.schema), row_group_size=ROW_GROUP_SIZE)
+        self.rows += self._pending
+        self._batches, self._pending = [], 0
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+        os.replace(self._temporary, os.path.join(self.directory, self.filename))
+
+    def abort(self):
+        self._writer.close()
+        if os.path.exists(self._temporary):
+            os.remove(self._temporary)
+
+def _iter_rows(statement) -> Iterator[tuple]:
+    """Lecture par lots (curseur serveur) sur un réplica de lecture"""
+    db = ReadSessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=BATCH_SIZE))
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        db.close()
+
+def extract_table(table: str, directory: str = EXTRACT_DIR, until: Optional[datetime] = None) -> dict:
+    """
+    Extrait les lignes créées après le watermark et jusqu'à until (par défaut maintenant moins
+    SAFETY_LAG_SECONDS), triées par created_at : une seule partition est ouverte à la fois.
+    Le watermark n'avance qu'une fois tous les fichiers du passage finalisés.
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow n'est pas installé : extraction Parquet indisponible")
+
+    model, excluded = EXTRACT_TABLES[table]
+    columns = extract_columns(model, excluded)
+    schema = arrow_schema(columns)
+    converters = _converters(columns)
+    created_index = [column.name for column in columns].index("created_at")
+
+    state = load_state(directory)
+    since = _watermark(state, table)
+    # Temps UTC naïf, comme les dates stockées (CURRENT_TIMESTAMP / now() en UTC)
+    until = until or datetime.utcnow().replace(microsecond=0) - timedelta(seconds=SAFETY_LAG_SECONDS)
+    if since and since >= until:
+        return {"table": table, "rows": 0, "files": 0, "watermark": since.isoformat()}
+
+    created_at = model.__table__.c.created_at
+    statement = select(*columns).where(created_at.isnot(None), created_at <= until).order_by(created_at)
+    if since:
+        statement = statement.where(created_at > since)
+
+    table_directory = os.path.join(directory, table)
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    writer: Optional[_PartitionWriter] = None
+    rows = files = 0
+
+    try:
+        for row in _iter_rows(statement):
+            values = [convert(value) if convert else value for convert, value in zip(converters, row)]
+            day = values[created_index].date()
+            if writer is None or writer.directory != os.path.join(table_directory, f"date={day.isoformat()}"):
+                if writer:
+                    writer.close()
+                    rows, files = rows + writer.rows, files + 1
+                writer = _PartitionWriter(table_directory, day, run_id, schema)
+            writer.append(values)
+        if writer:
+            writer.close()
+            rows, files = rows + writer.rows, files + 1
+            writer = None
+    except Exception:
+        if writer:
+            writer.abort()
+        raise
+
+    previous = state.get(table, {})
+    state[table] = {
+        "watermark": until.isoformat(),
+        "rows": previous.get("rows", 0) + rows,
+        "files": previous.get("files", 0) + files,
+        "updated_at": datetime.utcnow().isoformat()
+    }
+    _save_state(directory, state)
+    logger.info(f"Extraction {table}: {rows} lignes, {files} fichiers jusqu'à {until.isoformat()}")
+    return {"table": table, "rows": rows, "files": files, "watermark": until.isoformat()}
+
+def run_extract(tables: Optional[List[str]] = None, directory: str = EXTRACT_DIR, full: bool = False) -> List[dict]:
+    """Extrait toutes les tables (ou celles demandées) ; full=True repart de zéro"""
+    tables = tables or list(EXTRACT_TABLES)
+    if full:
+        state = load_state(directory)
+        for table in tables:
+            shutil.rmtree(os.path.join(directory, table), ignore_errors=True)
+            state.pop(table, None)
+        _save_state(directory, state)
+    return [extract_table(table, directory) for table in tables]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    selected = None
+    if "--dataset" in sys.argv:
+        selected = [sys.argv[sys.argv.index("--dataset") + 1]]
+        if selected[0] not in EXTRACT_TABLES:
+            sys.exit(f"Table inconnue: {selected[0]} (choix : {', '.join(EXTRACT_TABLES)})")
+
+    for summary in run_extract(selected, full="--full" in sys.argv):
+        print(f"{summary['table']}: {summary['rows']} lignes, {summary['files']} fichiers, watermark {summary['watermark']}")
@@ -0,0 +1,332 @@
+# audit_log.py - Journal d'audit des actions d'administration, écrit par lots hors des requêtes
+# record() place l'événement dans une file bornée du processus ; un thread l'écrit par lots (un seul commit
+# pour AUDIT_BATCH_SIZE événements). Si la base est indisponible ou la file pleine, les événements sont
+# ajoutés à un fichier de débordement (JSON Lines, fsync) rejoué dès que l'écriture en base réussit.
+# Usage (depuis la racine de l'API) : python -m audit_log  (rejoue les fichiers de débordement)
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from jose import JWTError, jwt
+from sqlalchemy import insert, select
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+
+from auth import SECRET_KEY, ALGORITHM
+from models import AdminUser, AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_QUEUE_MAX_EVENTS = int(os.getenv("AUDIT_QUEUE_MAX_EVENTS", "10000"))
+AUDIT_SPILL_DIR = os.getenv(
+    "AUDIT_SPILL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit_spill")
+)
+
+_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=AUDIT_QUEUE_MAX_EVENTS)
+_wakeup = threading.Event()
+_flush_lock = threading.Lock()
+_spill_lock = threading.Lock()
+_stats = {"recorded": 0, "written": 0, "batches": 0, "spilled": 0, "replayed": 0, "flush_errors": 0}
+
+# ==================== ENREGISTREMENT ====================
+
+def record(action: str, entity_type: str, entity_id: Optional[str] = None,
+           old_values: Optional[dict] = None, new_values: Optional[dict] = None,
+           admin_user_id: Optional[str] = None, admin_username: Optional[str] = None,
+           ip_address: Optional[str] = None, user_agent: Optional[str] = None):
+    """Ajoute un événement d'audit à la file (aucun accès à la base dans la requête)"""
+    event = {
+        "id": str(uuid.uuid4()),
+        "admin_user_id": admin_user_id,
+        "admin_username": admin_username,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": str(entity_id) if entity_id is not None else None,
+        "old_values": jsonable_encoder(old_values) if old_values is not None else None,
+        "new_values": jsonable_encoder(new_values) if new_values is not None else None,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    _stats["recorded"] += 1
+    try:
+        _queue.put_nowait(event)
+    except queue.Full:
+        _spill([event])
+        return
+    if not _flusher.running:
+        # Hors de l'API (scripts, tests) : écriture immédiate
+        flush()
+    elif _queue.qsize() >= AUDIT_BATCH_SIZE:
+        _wakeup.set()
+
+def _request_admin(request: Request) -> Optional[str]:
+    """Nom d'utilisateur de l'administrateur d'après le jeton Bearer (résolu en id à l'écriture)"""
+    authorization = request.headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        return jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+def record_request(request: Request, action: str, entity_type: str, entity_id: Optional[str] = None,
+                   old_values: Optional[dict] = None, new_values: Optional[dict] = None):
+    """Enregistre une action d'un routeur d'administration (auteur, IP et navigateur tirés de la requête)"""
+    record(
+        action, entity_type, entity_id, old_values, new_values,
+        admin_username=_request_admin(request),
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    )
+
+def snapshot(entity, fields) -> Dict[str, Any]:
+    """Valeurs actuelles des champs (à prendre avant la modification)"""
+    return {field: getattr(entity, field) for field in fields if hasattr(entity, field)}
+
+def changes(before: Dict[str, Any], entity) -> Tuple[dict, dict]:
+    """(anciennes, nouvelles) valeurs des champs réellement modifiés depuis snapshot()"""
+    old_values, new_values = {}, {}
+    for field, value in before.items():
+        current = getattr(entity, field)
+        if current != value:
+            old_values[field] = value
+            new_values[field] = current
+    return old_values, new_values
+
+# ==================== ÉCRITURE PAR LOTS ====================
+
+def _write(db, events: List[Dict[str, Any]]) -> int:
+    """Insère un lot (une transaction) ; ignore les événements déjà présents (rejeu après incident)"""
+    ids = [event["id"] for event in events]
+    existing = set(db.execute(select(AuditLog.id).where(AuditLog.id.in_(ids))).scalars())
+
+    # Auteurs résolus en une requête : id connu, sinon nom d'utilisateur du jeton, sinon anonyme
+    candidates = {event["admin_user_id"] for event in events if event.get("admin_user_id")}
+    usernames = {event["admin_username"] for event in events if event.get("admin_username")}
+    known_ids, ids_by_username = set(), {}
+    if candidates or usernames:
+        for admin_id, username in db.execute(
+            select(AdminUser.id, AdminUser.username).where(
+                AdminUser.id.in_(candidates) | AdminUser.username.in_(usernames)
+            )
+        ):
+            known_ids.add(admin_id)
+            ids_by_username[username] = admin_id
+
+    rows = []
+    for event in events:
+        if event["id"] in existing:
+            continue
+        admin_user_id = event.get("admin_user_id")
+        if admin_user_id not in known_ids:
+            admin_user_id = ids_by_username.get(event.get("admin_username"))
+        rows.append({
+            "id": event["id"],
+            "admin_user_id": admin_user_id,
+            "action": event["action"],
+            "entity_type": event["entity_type"],
+            "entity_id": event["entity_id"],
+            "old_values": event["old_values"],
+            "new_values": event["new_values"],
+            "ip_address": event["ip_address"],
+            "user_agent": event["user_agent"],
+            "created_at": datetime.fromisoformat(event["created_at"])
+        })
+    if rows:
+        db.execute(insert(AuditLog), rows)
+    db.commit()
+    return len(rows)
+
+def _write_batch(events: List[Dict[str, Any]]) -> int:
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return _write(db, events)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def flush() -> int:
+    """Écrit les événements en file par lots ; en cas d'échec, le lot part dans le fichier de débordement"""
+    written = 0
+    with _flush_lock:
+        while True:
+            batch = []
+            while len(batch) < AUDIT_BATCH_SIZE:
+                try:
+                    batch.append(_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            try:
+                written += _write_batch(batch)
+                _stats["batches"] += 1
+            except Exception as e:
+                _stats["flush_errors"] += 1
+                logger.error(f"Écriture du journal d'audit impossible, {len(batch)} événements mis de côté: {e}")
+                _spill(batch)
+                # Base indisponible : le reste de la file attend le prochain passage
+                break
+        _stats["written"] += written
+
+        if written and _spill_files():
+            try:
+                replay_spilled()
+            except Exception as e:
+                logger.error(f"Erreur rejeu du débordement d'audit: {e}")
+    return written
+
+# ==================== DÉBORDEMENT SUR DISQUE ====================
+# Un fichier par processus (spill-<pid>.jsonl). Un fichier est rejoué par son processus ou, si celui-ci
+# n'existe plus, par le premier worker qui le renomme (renommage atomique : un seul repreneur).
+
+def _spill_path(pid: int) -> str:
+    return os.path.join(AUDIT_SPILL_DIR, f"spill-{pid}.jsonl")
+
+def _spill(events: List[Dict[str, Any]]):
+    with _spill_lock:
+        os.makedirs(AUDIT_SPILL_DIR, exist_ok=True)
+        with open(_spill_path(os.getpid()), "a", encoding="utf-8") as spill_file:
+            for event in events:
+                spill_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            spill_file.flush()
+            os.fsync(spill_file.fileno())
+    _stats["spilled"] += len(events)
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _owner(path: str) -> Optional[int]:
+    """Processus propriétaire : auteur d'un spill-<pid>.jsonl, repreneur d'un *.<pid>.replay"""
+    name = os.path.basename(path)
+    try:
+        if name.endswith(".replay"):
+            return int(name.rsplit(".", 2)[-2])
+        return int(name[len("spill-"):-len(".jsonl")])
+    except ValueError:
+        return None
+
+def _spill_files() -> List[str]:
+    return sorted(
+        glob.glob(os.path.join(AUDIT_SPILL_DIR, "spill-*.jsonl")) +
+        glob.glob(os.path.join(AUDIT_SPILL_DIR, "spill-*.jsonl.*.replay"))
+    )
+
+def replay_spilled(include_live: bool = False) -> int:
+    """Rejoue les fichiers de débordement de ce processus et des processus disparus"""
+    replayed = 0
+    pid = os.getpid()
+    for path in _spill_files():
+        owner = _owner(path)
+        if owner is None or (owner != pid and not include_live and _alive(owner)):
+            continue
+        claimed = f"{path[:path.index('.jsonl') + len('.jsonl')]}.{pid}.replay"
+        with _spill_lock:
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+
+        events = []
+        with open(claimed, encoding="utf-8") as spill_file:
+            for line in spill_file:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # Dernière ligne tronquée (arrêt pendant l'écriture) : ignorée
+                    logger.warning(f"Ligne illisible ignorée dans {claimed}")
+        try:
+            for start in range(0, len(events), AUDIT_BATCH_SIZE):
+                replayed += _write_batch(events[start:start + AUDIT_BATCH_SIZE])
+        except Exception:
+            # Remis dans le débordement du processus courant (les événements déjà écrits seront ignorés)
+            _spill(events)
+            os.remove(claimed)
+            raise
+        os.remove(claimed)
+    _stats["replayed"] += replayed
+    if replayed:
+        logger.info(f"Journal d'audit : {replayed} événements rejoués depuis le débordement")
+    return replayed
+
+# ==================== THREAD D'ÉCRITURE ====================
+
+class _Flusher:
+    """Thread d'écriture : toutes les interval secondes, ou dès qu'un lot complet est en file"""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self, interval: float):
+        while not self._stop.is_set():
+            _wakeup.wait(interval)
+            _wakeup.clear()
+            try:
+                flush()
+            except Exception as e:
+                logger.error(f"Erreur écriture du journal d'audit: {e}")
+
+    def start(self, interval: float):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="audit-log-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        _wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        # Dernier passage : rien ne reste en mémoire à l'arrêt
+        flush()
+
+_flusher = _Flusher()
+
+def start(interval: float = AUDIT_FLUSH_INTERVAL_SECONDS):
+    """Rejoue le débordement laissé par un arrêt précédent puis démarre l'écriture périodique"""
+    try:
+        replay_spilled()
+    except Exception as e:
+        logger.error(f"Erreur rejeu du débordement d'audit: {e}")
+    _flusher.start(interval)
+
+def stop():
+    _flusher.stop()
+
+def stats() -> dict:
+    return {
+        "queued": _queue.qsize(),
+        "max_queued": AUDIT_QUEUE_MAX_EVENTS,
+        "batch_size": AUDIT_BATCH_SIZE,
+        "spill_files": len(_spill_files()),
+        **_stats
+    }
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"{replay_spilled(include_live=True)} événements d'audit rejoués")
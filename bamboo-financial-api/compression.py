@@ -0,0 +1,192 @@
+# compression.py - Middleware ASGI de compression des réponses (brotli / gzip) en flux continu
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Optional, Sequence
+import zlib
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+# Types compressibles : JSON, texte et exports. Les images (logos PNG/JPEG/WebP) sont
+# déjà compressées et ne figurent volontairement pas dans la liste.
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/problem+json",
+    "application/javascript",
+    "application/xml",
+    "text/plain",
+    "text/csv",
+    "text/html",
+    "text/css",
+    "text/javascript",
+)
+
+def _accepted_encodings(header: str) -> dict:
+    """Analyse Accept-Encoding en {encodage: qualité}"""
+    encodings = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[token] = quality
+    return encodings
+
+class _GzipEncoder:
+    """Encodeur gzip incrémental"""
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class _BrotliEncoder:
+    """Encodeur brotli incrémental"""
+    name = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class CompressionMiddleware:
+    """
+    Compresse les réponses sans les mettre en mémoire tampon : chaque fragment du corps
+    est compressé et transmis dès sa réception (exports en flux, gros JSON).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        compressible_types: Sequence[str] = DEFAULT_COMPRESSIBLE_TYPES,
+        flush_each_chunk: bool = True
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.compressible_types = tuple(compressible_types)
+        self.flush_each_chunk = flush_each_chunk
+
+    def _select_encoder(self, scope: Scope):
+        """Choisit brotli si le client l'accepte et qu'il est installé, sinon gzip"""
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if BROTLI_AVAILABLE and accepted.get("br", 0) > 0:
+            return lambda: _BrotliEncoder(self.brotli_quality)
+        if accepted.get("gzip", accepted.get("*", 0)) > 0:
+            return lambda: _GzipEncoder(self.gzip_level)
+        return None
+
+    def _is_compressible(self, headers: Headers) -> bool:
+        """Type de contenu dans la liste autorisée et réponse non encore encodée"""
+        if "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in self.compressible_types
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoder_factory = self._select_encoder(scope)
+        if encoder_factory is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, encoder, passthrough
+
+            if message["type"] == "http.response.start":
+                # On attend le premier fragment pour décider
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            if passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                declared_length = headers.get("content-length")
+                too_small = (
+                    len(body) < self.minimum_size if not more_body
+                    else declared_length is not None and int(declared_length) < self.minimum_size
+                )
+
+                if start_message["status"] in (204, 304) or not self._is_compressible(headers) or too_small:
+                    passthrough = True
+                    if self._is_compressible(headers):
+                        headers.add_vary_header("Accept-Encoding")
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                encoder = encoder_factory()
+                headers["Content-Encoding"] = encoder.name
+                headers.add_vary_header("Accept-Encoding")
+                del headers["content-length"]
+
+                if not more_body:
+                    # Réponse complète en un seul fragment : longueur connue
+                    compressed = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                await send(start_message)
+
+            chunk = encoder.compress(body)
+            if more_body:
+                if self.flush_each_chunk:
+                    chunk += encoder.flush()
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": chunk + encoder.finish()})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,208 @@
+# counters.py - Compteurs globaux en mémoire (entités, simulations) pour les tableaux de bord
+# Tenus à jour par les événements ORM, appliqués au commit, et recalés périodiquement sur la base.
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session, object_session
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+import threading
+
+import models
+import user_models
+
+logger = logging.getLogger(__name__)
+
+class CounterSpec:
+    """Un compteur : nombre de lignes d'un modèle réparties par clé (None = ligne non comptée)"""
+
+    def __init__(self, name: str, model, attributes: Tuple[str, ...] = (), key: Callable[[dict], Optional[str]] = None):
+        self.name = name
+        self.model = model
+        self.attributes = attributes
+        self.key = key or (lambda values: "all")
+
+def _status(values: dict) -> str:
+    return "active" if values["is_active"] else "inactive"
+
+SPECS = (
+    CounterSpec("banks", models.Bank, ("is_active",), _status),
+    CounterSpec("insurance_companies", models.InsuranceCompany, ("is_active",), _status),
+    CounterSpec("credit_products", models.CreditProduct, ("is_active",), _status),
+    CounterSpec("savings_products", models.SavingsProduct, ("is_active",), _status),
+    CounterSpec("savings_products_featured", models.SavingsProduct, ("is_featured",),
+                lambda values: "featured" if values["is_featured"] else None),
+    CounterSpec("savings_products_by_type", models.SavingsProduct, ("type",), lambda values: values["type"]),
+    CounterSpec("insurance_products", models.InsuranceProduct, ("is_active",), _status),
+    CounterSpec("insurance_products_active_by_type", models.InsuranceProduct, ("type", "is_active"),
+                lambda values: values["type"] if values["is_active"] else None),
+    CounterSpec("credit_simulations", models.CreditSimulation),
+    CounterSpec("savings_simulations", models.SavingsSimulation),
+    CounterSpec("insurance_quotes", models.InsuranceQuote),
+    CounterSpec("users", user_models.User, ("is_active",), _status),
+)
+
+_lock = threading.Lock()
+_counts: Dict[str, Dict[str, int]] = {spec.name: {} for spec in SPECS}
+_reconciled_at: Optional[datetime] = None
+
+# ==================== MAINTENANCE SUR ÉCRITURE ====================
+# Les variations sont accumulées dans la session et appliquées seulement au commit :
+# un rollback ne fausse pas les compteurs.
+
+_PENDING_KEY = "counter_deltas"
+
+def _add_delta(target, name: str, key: Optional[str], delta: int):
+    if key is None:
+        return
+    session = object_session(target)
+    if session is None:
+        return
+    deltas = session.info.setdefault(_PENDING_KEY, {})
+    deltas[(name, key)] = deltas.get((name, key), 0) + delta
+
+def _current_values(spec: CounterSpec, target) -> dict:
+    return {attribute: getattr(target, attribute) for attribute in spec.attributes}
+
+def _previous_values(spec: CounterSpec, target) -> dict:
+    """Valeurs avant la mise à jour en cours (historique de l'attribut)"""
+    state = inspect(target)
+    values = {}
+    for attribute in spec.attributes:
+        history = state.attrs[attribute].history
+        values[attribute] = history.deleted[0] if history.deleted else getattr(target, attribute)
+    return values
+
+def _insert_listener(spec: CounterSpec):
+    def after_insert(mapper, connection, target):
+        _add_delta(target, spec.name, spec.key(_current_values(spec, target)), 1)
+    return after_insert
+
+def _delete_listener(spec: CounterSpec):
+    def after_delete(mapper, connection, target):
+        _add_delta(target, spec.name, spec.key(_current_values(spec, target)), -1)
+    return after_delete
+
+def _update_listener(spec: CounterSpec):
+    def after_update(mapper, connection, target):
+        old_key = spec.key(_previous_values(spec, target))
+        new_key = spec.key(_current_values(spec, target))
+        if old_key != new_key:
+            _add_delta(target, spec.name, old_key, -1)
+            _add_delta(target, spec.name, new_key, 1)
+    return after_update
+
+def _apply_pending(session):
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if not deltas:
+        return
+    with _lock:
+        for (name, key), delta in deltas.items():
+            _counts[name][key] = _counts[name].get(key, 0) + delta
+
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+for _spec in SPECS:
+    event.listen(_spec.model, 'after_insert', _insert_listener(_spec))
+    event.listen(_spec.model, 'after_delete', _delete_listener(_spec))
+    if _spec.attributes:
+        event.listen(_spec.model, 'after_update', _update_listener(_spec))
+
+event.listen(Session, 'after_commit', _apply_pending)
+event.listen(Session, 'after_rollback', _discard_pending)
+
+# ==================== RECALAGE ====================
+
+def reconcile(db: Session = None):
+    """
+    Recalcule tous les compteurs depuis la base (une requête groupée par compteur).
+    Rattrape les écritures hors ORM (requêtes bulk, SQL brut) et celles des autres workers.
+    """
+    global _reconciled_at
+    from database import SessionLocal
+
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        fresh = {}
+        for spec in SPECS:
+            columns = [getattr(spec.model, attribute) for attribute in spec.attributes]
+            rows = db.execute(select(*columns, func.count()).select_from(spec.model).group_by(*columns)).all()
+            counts: Dict[str, int] = {}
+            for row in rows:
+                key = spec.key(dict(zip(spec.attributes, row[:-1])))
+                if key is not None:
+                    counts[key] = counts.get(key, 0) + int(row[-1])
+            fresh[spec.name] = counts
+    finally:
+        if own_session:
+            db.close()
+
+    with _lock:
+        _counts.update(fresh)
+        _reconciled_at = datetime.utcnow()
+
+class _Reconciler:
+    """Thread de recalage périodique"""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                reconcile()
+            except Exception as e:
+                logger.error(f"Erreur recalage des compteurs: {e}")
+
+    def start(self, interval: float):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="counters-reconcile", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+_reconciler = _Reconciler()
+
+def start(interval: float = 300):
+    """Recalage initial puis périodique (toutes les interval secondes)"""
+    reconcile()
+    _reconciler.start(interval)
+
+def stop():
+    _reconciler.stop()
+
+# ==================== LECTURE ====================
+
+def _ensure_loaded():
+    if _reconciled_at is None:
+        reconcile()
+
+def count(name: str, key: Optional[str] = None) -> int:
+    """Valeur d'un compteur : total, ou seulement la clé demandée"""
+    _ensure_loaded()
+    with _lock:
+        values = _counts[name]
+        return values.get(key, 0) if key is not None else sum(values.values())
+
+def breakdown(name: str) -> Dict[str, int]:
+    """Répartition d'un compteur par clé"""
+    _ensure_loaded()
+    with _lock:
+        return {key: value for key, value in _counts[name].items() if value}
+
+def snapshot() -> Dict[str, Any]:
+    """Tous les compteurs et la date du dernier recalage"""
+    _ensure_loaded()
+    with _lock:
+        return {
+            "counters": {name: dict(values) for name, values in _counts.items()},
+            "reconciled_at": _reconciled_at.isoformat() if _reconciled_at else None
+        }
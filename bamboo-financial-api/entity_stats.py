@@ -0,0 +1,139 @@
+# entity_stats.py - Compteurs par entité calculés pour une page entière en requêtes groupées
+# Un nombre fixe de requêtes par page (GROUP BY ... WHERE id IN (...)) au lieu de N requêtes par ligne.
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+import models
+
+Rollup = models.SimulationDailyRollup
+
+def _latest(*dates):
+    """Date la plus récente parmi des valeurs éventuellement nulles"""
+    present = [value for value in dates if value is not None]
+    return max(present) if present else None
+
+def active_product_counts(db: Session, product_model, owner_column, owner_ids: List[str]) -> Dict[str, int]:
+    """Nombre de produits actifs par propriétaire (banque ou compagnie)"""
+    if not owner_ids:
+        return {}
+    rows = db.query(owner_column, func.count(product_model.id)).filter(
+        owner_column.in_(owner_ids),
+        product_model.is_active == True
+    ).group_by(owner_column).all()
+    return {owner_id: int(count) for owner_id, count in rows}
+
+def bank_simulation_counts(db: Session, bank_ids: Optional[List[str]] = None,
+                           since: Optional[date] = None) -> Dict[str, Dict[str, int]]:
+    """Simulations par banque et par famille, lues dans les agrégats journaliers"""
+    query = db.query(Rollup.bank_id, Rollup.simulation_type, func.sum(Rollup.simulation_count))
+    if bank_ids is not None:
+        if not bank_ids:
+            return {}
+        query = query.filter(Rollup.bank_id.in_(bank_ids))
+    if since:
+        query = query.filter(Rollup.day >= since)
+
+    counts: Dict[str, Dict[str, int]] = {}
+    for bank_id, simulation_type, count in query.group_by(Rollup.bank_id, Rollup.simulation_type).all():
+        counts.setdefault(bank_id, {"credit": 0, "savings": 0})[simulation_type] = int(count or 0)
+    return counts
+
+def _last_simulation_dates(db: Session, simulation_model, product_model, product_fk, bank_ids: List[str]) -> Dict[str, object]:
+    """Date de la dernière simulation par banque pour une famille de produits"""
+    rows = db.query(product_model.bank_id, func.max(simulation_model.created_at)).join(
+        product_model, product_fk == product_model.id
+    ).filter(product_model.bank_id.in_(bank_ids)).group_by(product_model.bank_id).all()
+    return dict(rows)
+
+def bank_activity(db: Session, bank_ids: Iterable[str]) -> Dict[str, dict]:
+    """Produits actifs, simulations et dernière simulation pour une page de banques (5 requêtes)"""
+    bank_ids = list(bank_ids)
+    if not bank_ids:
+        return {}
+
+    credit_products = active_product_counts(db, models.CreditProduct, models.CreditProduct.bank_id, bank_ids)
+    savings_products = active_product_counts(db, models.SavingsProduct, models.SavingsProduct.bank_id, bank_ids)
+    simulations = bank_simulation_counts(db, bank_ids)
+    last_credit = _last_simulation_dates(
+        db, models.CreditSimulation, models.CreditProduct, models.CreditSimulation.credit_product_id, bank_ids
+    )
+    last_savings = _last_simulation_dates(
+        db, models.SavingsSimulation, models.SavingsProduct, models.SavingsSimulation.savings_product_id, bank_ids
+    )
+
+    activity = {}
+    for bank_id in bank_ids:
+        bank_simulations = simulations.get(bank_id, {})
+        activity[bank_id] = {
+            "credit_products_count": credit_products.get(bank_id, 0),
+            "savings_products_count": savings_products.get(bank_id, 0),
+            "total_simulations": bank_simulations.get("credit", 0) + bank_simulations.get("savings", 0),
+            "last_simulation_date": _latest(last_credit.get(bank_id), last_savings.get(bank_id))
+        }
+    return activity
+
+def bank_product_averages(db: Session, bank_ids: Iterable[str]) -> Dict[str, dict]:
+    """Nombre de produits actifs, taux et délai moyens par banque (2 requêtes)"""
+    bank_ids = list(bank_ids)
+    if not bank_ids:
+        return {}
+
+    credit = db.query(
+        models.CreditProduct.bank_id,
+        func.count(models.CreditProduct.id),
+        func.avg(models.CreditProduct.average_rate),
+        func.avg(models.CreditProduct.processing_time_hours)
+    ).filter(
+        models.CreditProduct.bank_id.in_(bank_ids),
+        models.CreditProduct.is_active == True
+    ).group_by(models.CreditProduct.bank_id).all()
+
+    savings = db.query(
+        models.SavingsProduct.bank_id,
+        func.count(models.SavingsProduct.id),
+        func.avg(models.SavingsProduct.interest_rate)
+    ).filter(
+        models.SavingsProduct.bank_id.in_(bank_ids),
+        models.SavingsProduct.is_active == True
+    ).group_by(models.SavingsProduct.bank_id).all()
+
+    averages = {
+        bank_id: {
+            "credit_products_count": 0, "savings_products_count": 0,
+            "average_credit_rate": 0.0, "average_savings_rate": 0.0, "average_processing_time": None
+        }
+        for bank_id in bank_ids
+    }
+    for bank_id, count, rate, processing_time in credit:
+        averages[bank_id].update({
+            "credit_products_count": int(count),
+            "average_credit_rate": float(rate or 0),
+            "average_processing_time": float(processing_time) if processing_time is not None else None
+        })
+    for bank_id, count, rate in savings:
+        averages[bank_id].update({
+            "savings_products_count": int(count),
+            "average_savings_rate": float(rate or 0)
+        })
+    return averages
+
+def company_product_counts(db: Session, company_ids: Iterable[str]) -> Dict[str, int]:
+    """Nombre de produits actifs par compagnie d'assurance (1 requête)"""
+    return active_product_counts(
+        db, models.InsuranceProduct, models.InsuranceProduct.insurance_company_id, list(company_ids)
+    )
+
+def product_quote_stats(db: Session, product_ids: Iterable[str]) -> Dict[str, tuple]:
+    """(nombre de devis, date du dernier devis) par produit d'assurance (1 requête)"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    rows = db.query(
+        models.InsuranceQuote.insurance_product_id,
+        func.count(models.InsuranceQuote.id),
+        func.max(models.InsuranceQuote.created_at)
+    ).filter(
+        models.InsuranceQuote.insurance_product_id.in_(product_ids)
+    ).group_by(models.InsuranceQuote.insurance_product_id).all()
+    return {product_id: (int(count), last_date) for product_id, count, last_date in rows}
@@ -0,0 +1,112 @@
+# fieldsets.py - Sélection de champs (?fields=...) et vue compacte pour les listes
+from fastapi import HTTPException
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only
+from typing import Any, Dict, List, Optional, Sequence
+from datetime import date, datetime
+from decimal import Decimal
+
+VIEWS = ("full", "compact")
+
+class FieldSelection:
+    """Champs demandés : colonnes du modèle, colonnes des relations et champs calculés"""
+
+    def __init__(self, columns: List[str], relations: Dict[str, List[str]], extras: List[str]):
+        self.columns = columns
+        self.relations = relations
+        self.extras = extras
+
+    def wants(self, name: str) -> bool:
+        """Indique si un champ (colonne, relation ou champ calculé) a été demandé"""
+        return name in self.columns or name in self.relations or name in self.extras
+
+def _column_names(model) -> List[str]:
+    """Noms des attributs colonnes d'un modèle"""
+    return [attr.key for attr in inspect(model).column_attrs]
+
+def parse_fields(
+    model,
+    fields: Optional[str],
+    view: Optional[str] = None,
+    relations: Optional[Dict[str, Any]] = None,
+    compact: Sequence[str] = (),
+    extras: Sequence[str] = ()
+) -> Optional[FieldSelection]:
+    """
+    Analyse ?fields=id,name,bank.name et ?view=compact.
+    Retourne None pour la vue complète (comportement historique de l'endpoint).
+    """
+    if view and view not in VIEWS:
+        raise HTTPException(status_code=400, detail=f"Vue inconnue: {view} (valeurs: {', '.join(VIEWS)})")
+
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+    elif view == "compact":
+        requested = list(compact)
+    else:
+        return None
+
+    relations = relations or {}
+    model_columns = _column_names(model)
+    columns, nested, computed = [], {}, []
+
+    for field in requested:
+        name, _, sub_field = field.partition(".")
+        if sub_field:
+            if name not in relations:
+                raise HTTPException(status_code=400, detail=f"Champ inconnu: {field}")
+            target = relations[name].property.mapper.class_
+            if sub_field not in _column_names(target):
+                raise HTTPException(status_code=400, detail=f"Champ inconnu: {field}")
+            nested.setdefault(name, [])
+            if sub_field not in nested[name]:
+                nested[name].append(sub_field)
+        elif name in relations:
+            # Relation demandée sans précision : identifiant et nom
+            nested.setdefault(name, [])
+            nested[name].extend(c for c in ("id", "name") if c not in nested[name])
+        elif name in model_columns:
+            if name not in columns:
+                columns.append(name)
+        elif name in extras:
+            if name not in computed:
+                computed.append(name)
+        else:
+            raise HTTPException(status_code=400, detail=f"Champ inconnu: {field}")
+
+    return FieldSelection(columns, nested, computed)
+
+def query_options(model, selection: FieldSelection, relations: Optional[Dict[str, Any]] = None, loader=joinedload) -> list:
+    """Options de chargement limitant le SELECT aux colonnes demandées"""
+    relations = relations or {}
+    mapper = inspect(model)
+    columns = selection.columns or [mapper.primary_key[0].key]
+    options = [load_only(*[getattr(model, column) for column in columns])]
+
+    for name, sub_columns in selection.relations.items():
+        relation = relations[name]
+        target = relation.property.mapper.class_
+        options.append(loader(relation).load_only(*[getattr(target, column) for column in sub_columns]))
+
+    return options
+
+def _json_value(value):
+    """Conversion des types SQLAlchemy vers des valeurs JSON"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def serialize(obj, selection: FieldSelection, relations: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Sérialise uniquement les champs demandés (les champs calculés sont ajoutés par l'appelant)"""
+    relations = relations or {}
+    result = {column: _json_value(getattr(obj, column)) for column in selection.columns}
+
+    for name, sub_columns in selection.relations.items():
+        related = getattr(obj, relations[name].key)
+        result[name] = {
+            column: _json_value(getattr(related, column)) for column in sub_columns
+        } if related is not None else None
+
+    return result
@@ -0,0 +1,367 @@
+# idempotency.py - En-tête Idempotency-Key sur les POST de simulation et de devis
+# Une requête rejouée avec la même clé (et le même corps) reçoit la réponse déjà calculée au lieu
+# d'insérer une nouvelle simulation. La table idempotency_keys est la référence partagée entre workers
+# (l'insertion de la clé fait office de verrou) ; un cache LRU borné sert les rejeux sans aller-retour.
+# Clé réutilisée avec un autre corps -> 422 ; requête d'origine toujours en cours après l'attente -> 409.
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_ROUTES = (
+    "/api/simulations/credit",
+    "/api/simulations/savings",
+    "/api/credits/simulate",
+    "/api/insurance/quote",
+)
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "5000"))
+IDEMPOTENCY_MAX_RESPONSE_BYTES = int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(256 * 1024)))
+# Attente maximale d'une requête d'origine encore en cours, puis délai au-delà duquel elle est réputée perdue
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "5"))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_PURGE_EVERY = int(os.getenv("IDEMPOTENCY_PURGE_EVERY", "500"))
+IDEMPOTENCY_PURGE_BATCH_SIZE = 1000
+MAX_KEY_LENGTH = 255
+
+# Réponses jamais mémorisées : le client doit pouvoir réessayer
+_TRANSIENT_STATUSES = {408, 409, 425, 429}
+
+StoredResponse = Tuple[int, List[Tuple[str, str]], bytes]
+
+CLAIMED, COMPLETED, MISMATCH, IN_PROGRESS = "claimed", "completed", "mismatch", "in_progress"
+
+# ==================== STOCKAGE ====================
+
+class IdempotencyStore:
+    """Clés persistées (table idempotency_keys) devant un cache LRU borné des réponses terminées"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._responses: "OrderedDict[str, Tuple[str, StoredResponse, float]]" = OrderedDict()
+        self._claims = 0
+
+    def _cached(self, key: str) -> Optional[Tuple[str, StoredResponse]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._responses.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= now:
+                del self._responses[key]
+                return None
+            self._responses.move_to_end(key)
+            return entry[0], entry[1]
+
+    def _remember(self, key: str, fingerprint: str, response: StoredResponse, expires_at: datetime):
+        ttl = min(self.ttl, (expires_at - datetime.utcnow()).total_seconds())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._responses.pop(key, None)
+            self._responses[key] = (fingerprint, response, time.monotonic() + ttl)
+            while len(self._responses) > self.max_entries:
+                self._responses.popitem(last=False)
+
+    async def claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """Réserve la clé (CLAIMED) ou décrit son état : réponse terminée, corps différent, en cours"""
+        cached = self._cached(key)
+        if cached is not None:
+            return (COMPLETED, cached[1]) if cached[0] == fingerprint else (MISMATCH, None)
+
+        from database import AsyncSessionLocal
+
+        self._claims += 1
+        async with AsyncSessionLocal() as db:
+            if IDEMPOTENCY_PURGE_EVERY and self._claims % IDEMPOTENCY_PURGE_EVERY == 0:
+                await self._purge(db)
+
+            # Deux tentatives : une clé expirée ou libérée entre l'insertion et la lecture est réservée à nouveau
+            for _ in range(2):
+                db.expunge_all()
+                now = datetime.utcnow()
+                db.add(IdempotencyKey(
+                    key=key, fingerprint=fingerprint, status="processing",
+                    created_at=now, expires_at=now + timedelta(seconds=self.ttl)
+                ))
+                try:
+                    await db.commit()
+                    return CLAIMED, None
+                except IntegrityError:
+                    await db.rollback()
+
+                record = (await db.execute(
+                    select(IdempotencyKey).where(IdempotencyKey.key == key).execution_options(populate_existing=True)
+                )).scalar_one_or_none()
+                if record is None:
+                    continue
+                if record.expires_at <= now:
+                    await db.execute(delete(IdempotencyKey).where(
+                        IdempotencyKey.key == key, IdempotencyKey.expires_at <= now
+                    ))
+                    await db.commit()
+                    continue
+                if record.fingerprint != fingerprint:
+                    return MISMATCH, None
+                if record.status == "completed":
+                    response = (
+                        record.response_status,
+                        [tuple(header) for header in record.response_headers or []],
+                        record.response_body or b""
+                    )
+                    self._remember(key, fingerprint, response, record.expires_at)
+                    return COMPLETED, response
+
+                # Requête d'origine abandonnée (worker arrêté) : reprise conditionnelle, un seul repreneur
+                if record.created_at <= now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS):
+                    result = await db.execute(
+                        update(IdempotencyKey)
+                        .where(IdempotencyKey.key == key, IdempotencyKey.created_at == record.created_at)
+                        .values(created_at=now)
+                    )
+                    await db.commit()
+                    if result.rowcount == 1:
+                        return CLAIMED, None
+                return IN_PROGRESS, None
+        return IN_PROGRESS, None
+
+    async def complete(self, key: str, fingerprint: str, response: StoredResponse):
+        """Enregistre la réponse d'une clé réservée"""
+        from database import AsyncSessionLocal
+
+        status, headers, body = response
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .values(status="completed", response_status=status, response_headers=[list(h) for h in headers],
+                        response_body=body, expires_at=expires_at)
+            )
+            await db.commit()
+        self._remember(key, fingerprint, response, expires_at)
+
+    async def release(self, key: str):
+        """Libère une clé réservée sans réponse mémorisable (erreur serveur, réponse trop volumineuse)"""
+        from database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.key == key, IdempotencyKey.status == "processing"
+            ))
+            await db.commit()
+
+    async def _purge(self, db):
+        """Supprime un lot de clés expirées"""
+        now = datetime.utcnow()
+        expired = select(IdempotencyKey.key).where(IdempotencyKey.expires_at <= now).limit(IDEMPOTENCY_PURGE_BATCH_SIZE)
+        await db.execute(delete(IdempotencyKey).where(IdempotencyKey.key.in_(expired)))
+        await db.commit()
+
+    def cached_entries(self) -> int:
+        with self._lock:
+            return len(self._responses)
+
+store = IdempotencyStore(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_CACHE_MAX_ENTRIES)
+
+# ==================== MIDDLEWARE ====================
+
+def _error(status_code: int, detail: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers)
+
+class IdempotencyMiddleware:
+    """
+    Sur les routes IDEMPOTENT_ROUTES, en présence d'un en-tête Idempotency-Key : réserve la clé
+    (client + route + clé), exécute la requête puis mémorise sa réponse, ou rejoue la réponse
+    mémorisée avec l'en-tête Idempotent-Replayed. Sans en-tête, la requête passe inchangée.
+    Si le stockage est indisponible, la requête est traitée normalement (sans garantie d'unicité).
+    """
+
+    def __init__(self, app: ASGIApp, routes: Tuple[str, ...] = IDEMPOTENT_ROUTES,
+                 idempotency_store: IdempotencyStore = store):
+        self.app = app
+        self.routes = frozenset(routes)
+        self.store = idempotency_store
+        # Requêtes réservées par ce worker : les doublons attendent leur fin sans interroger la base
+        self._in_flight: Dict[str, asyncio.Event] = {}
+        self.stats = {"claimed": 0, "replayed": 0, "mismatched": 0, "conflicts": 0, "not_stored": 0, "store_errors": 0}
+        _instances.append(self)
+
+    @staticmethod
+    def _client(headers: Headers) -> str:
+        # Jamais l'adresse IP : un mobile qui change de réseau doit retrouver sa réponse
+        authorization = headers.get("authorization", "")
+        if authorization.lower().startswith("bearer ") and len(authorization) > 7:
+            return "s:" + hashlib.sha256(authorization[7:].encode("utf-8")).hexdigest()
+        return "anonymous"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].rstrip("/") not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get("idempotency-key")
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = idempotency_key.strip()
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _error(400, f"En-tête Idempotency-Key invalide (1 à {MAX_KEY_LENGTH} caractères)")(scope, receive, send)
+            return
+
+        # Corps lu une fois : il sert d'empreinte puis est rejoué à l'application
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+
+        path = scope["path"].rstrip("/")
+        key = hashlib.sha256(f"{self._client(headers)}|{path}|{idempotency_key}".encode("utf-8")).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        try:
+            outcome, stored = await self._claim(key, fingerprint)
+        except Exception as e:
+            self.stats["store_errors"] += 1
+            logger.warning(f"Stockage d'idempotence indisponible, requête traitée sans clé: {e}")
+            await self.app(scope, self._replay_body(body, receive), send)
+            return
+
+        if outcome == COMPLETED:
+            self.stats["replayed"] += 1
+            await self._send_stored(stored, send)
+            return
+        if outcome == MISMATCH:
+            self.stats["mismatched"] += 1
+            await _error(422, "Idempotency-Key déjà utilisée avec un corps de requête différent")(scope, receive, send)
+            return
+        if outcome == IN_PROGRESS:
+            self.stats["conflicts"] += 1
+            await _error(409, "Requête d'origine toujours en cours pour cette Idempotency-Key",
+                         {"Retry-After": "1"})(scope, receive, send)
+            return
+
+        self.stats["claimed"] += 1
+        event = self._in_flight[key] = asyncio.Event()
+        try:
+            await self._run(scope, self._replay_body(body, receive), send, key, fingerprint)
+        finally:
+            # La clé libérée peut déjà avoir été réservée à nouveau par un doublon
+            if self._in_flight.get(key) is event:
+                del self._in_flight[key]
+            event.set()
+
+    async def _claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """Réserve la clé ; un doublon attend la fin de la requête d'origine jusqu'à IDEMPOTENCY_WAIT_SECONDS"""
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            event = self._in_flight.get(key)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    return IN_PROGRESS, None
+            outcome, stored = await self.store.claim(key, fingerprint)
+            if outcome != IN_PROGRESS or time.monotonic() >= deadline:
+                return outcome, stored
+            # En cours dans un autre worker : nouvelle lecture après une courte pause
+            if key not in self._in_flight:
+                await asyncio.sleep(0.1)
+
+    @staticmethod
+    def _replay_body(body: bytes, receive: Receive) -> Receive:
+        sent = False
+
+        async def replay() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return replay
+
+    async def _run(self, scope: Scope, receive: Receive, send: Send, key: str, fingerprint: str):
+        status = None
+        response_headers: List[Tuple[str, str]] = []
+        body_parts: List[bytes] = []
+        size = 0
+        complete = False
+
+        async def capture(message: Message):
+            nonlocal status, size, complete
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.extend(
+                    (name.decode("latin-1"), value.decode("latin-1")) for name, value in message.get("headers", [])
+                )
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size <= IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                    body_parts.append(chunk)
+                if not message.get("more_body", False):
+                    complete = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            storable = (
+                complete and status is not None and status < 500 and status not in _TRANSIENT_STATUSES
+                and size <= IDEMPOTENCY_MAX_RESPONSE_BYTES
+            )
+            try:
+                if storable:
+                    await self.store.complete(key, fingerprint, (status, response_headers, b"".join(body_parts)))
+                else:
+                    self.stats["not_stored"] += 1
+                    await self.store.release(key)
+            except Exception as e:
+                self.stats["store_errors"] += 1
+                logger.error(f"Erreur enregistrement de la réponse idempotente: {e}")
+
+    @staticmethod
+    async def _send_stored(stored: StoredResponse, send: Send):
+        status, headers, body = stored
+        raw_headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+        raw_headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def metrics(self) -> dict:
+        return {"routes": sorted(self.routes), "in_flight": len(self._in_flight), **self.stats}
+
+# Instances créées par Starlette à la construction de la pile (pour l'endpoint de supervision)
+_instances = []
+
+def snapshot() -> dict:
+    """Compteurs d'idempotence du worker courant"""
+    base = {"ttl_seconds": IDEMPOTENCY_TTL_SECONDS, "cached_responses": store.cached_entries(),
+            "max_cached_responses": IDEMPOTENCY_CACHE_MAX_ENTRIES}
+    if not _instances:
+        return base
+    return {**base, **_instances[-1].metrics()}
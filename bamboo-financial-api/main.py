@@ -1,9 +1,9 @@
 # main.py - Version complète corrigée avec tous les routers + routes admin intégrées
-from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import text
 from contextlib import contextmanager
 from pydantic import BaseModel, EmailStr
@@ -21,7 +21,14 @@ load_dotenv()
 # Imports locaux
 import models
 import schemas
-from database import get_db, SessionLocal
+from database import get_db, SessionLocal, async_engine, db_settings, replica_set, test_async_connection
+import pool_metrics
+from compression import CompressionMiddleware
+from rate_limit import AdmissionControlMiddleware
+import rate_limit
+from idempotency import IdempotencyMiddleware
+import idempotency
+import single_flight
 
 # ==================== CONFIGURATION AUTH ====================
 
@@ -296,6 +303,20 @@ except ImportError:
     admin_dashboard_available = False
     print("Warning: admin_dashboard router not available")
 
+try:
+    from routers import exports
+    exports_available = True
+except ImportError:
+    exports_available = False
+    print("Warning: exports router not available")
+
+try:
+    from routers import audit_logs
+    audit_logs_available = True
+except ImportError:
+    audit_logs_available = False
+    print("Warning: audit_logs router not available")
+
 try:
     from routers import admin_management
     admin_management_available = True
@@ -303,6 +324,76 @@ except ImportError:
     admin_management_available = False
     print("Warning: admin_management router not available")
 
+try:
+    import search_index
+    search_index_available = True
+except ImportError:
+    search_index_available = False
+    print("Warning: search index not available")
+
+try:
+    import suggest_index
+    suggest_index_available = True
+except ImportError:
+    suggest_index_available = False
+    print("Warning: suggest index not available")
+
+try:
+    import rollups
+    rollups_available = True
+except ImportError:
+    rollups_available = False
+    print("Warning: simulation rollups not available")
+
+try:
+    import counters
+    counters_available = True
+except ImportError:
+    counters_available = False
+    print("Warning: counters not available")
+
+try:
+    import sketches
+    sketches_available = True
+except ImportError:
+    sketches_available = False
+    print("Warning: simulation sketches not available")
+
+try:
+    import password_hashing
+    password_hashing_available = True
+except ImportError:
+    password_hashing_available = False
+    print("Warning: password hashing pool not available")
+
+try:
+    import session_cache
+    session_cache_available = True
+except ImportError:
+    session_cache_available = False
+    print("Warning: session cache not available")
+
+try:
+    import session_purge
+    session_purge_available = True
+except ImportError:
+    session_purge_available = False
+    print("Warning: session purge not available")
+
+try:
+    import audit_log
+    audit_log_available = True
+except ImportError:
+    audit_log_available = False
+    print("Warning: audit log writer not available")
+
+try:
+    import notifications
+    notifications_available = True
+except ImportError:
+    notifications_available = False
+    print("Warning: notification streams not available")
+
 # Configuration de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -345,15 +436,27 @@ app.add_middleware(
         "Content-Type",
         "Authorization",
         "X-Requested-With",
-        "X-API-Version"
+        "X-API-Version",
+        "Idempotency-Key"
     ],
     expose_headers=[
         "X-Process-Time",
         "X-API-Version",
-        "Access-Control-Allow-Origin"
+        "Access-Control-Allow-Origin",
+        "Idempotent-Replayed"
     ]
 )
 
+# ==================== IDEMPOTENCE DES SIMULATIONS ====================
+
+# Sous la limitation de débit : un rejeu refusé (429) ne touche pas au stockage des clés
+app.add_middleware(IdempotencyMiddleware)
+
+# ==================== LIMITATION DE DÉBIT ====================
+
+# Sous le middleware CORS personnalisé : les réponses 429/503 restent lisibles par le navigateur
+app.add_middleware(AdmissionControlMiddleware)
+
 # ==================== ROUTES ADMIN AUTH INTÉGRÉES ====================
 
 @app.post("/api/admin/login", response_model=LoginResponse)
@@ -484,12 +587,22 @@ async def cors_handler(request: Request, call_next):
         response.headers["Access-Control-Allow-Origin"] = "http://localhost:4200"
     
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
-    response.headers["Access-Control-Allow-Headers"] = "Accept, Accept-Language, Content-Language, Content-Type, Authorization, X-Requested-With, X-API-Version"
+    response.headers["Access-Control-Allow-Headers"] = "Accept, Accept-Language, Content-Language, Content-Type, Authorization, X-Requested-With, X-API-Version, Idempotency-Key"
     response.headers["Access-Control-Allow-Credentials"] = "true"
     response.headers["Access-Control-Max-Age"] = "86400"
     
     return response
 
+# ==================== COMPRESSION DES RÉPONSES ====================
+
+# Ajouté en dernier pour envelopper toute la pile : les réponses finales sont compressées
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+)
+
 # Inclusion des routers - seulement ceux qui sont disponibles
 if auth_available:
     app.include_router(auth.router, prefix="/api", tags=["Authentification"])
@@ -550,6 +663,14 @@ if admin_dashboard_available:
     app.include_router(admin_dashboard.router, prefix="/api/admin/dashboard", tags=["Admin - Dashboard"])
     logger.info("Admin dashboard router included")
 
+if exports_available:
+    app.include_router(exports.router, prefix="/api", dependencies=[Depends(get_current_admin_user)])
+    logger.info("Exports router included")
+
+if audit_logs_available:
+    app.include_router(audit_logs.router, prefix="/api", dependencies=[Depends(get_current_admin_user)])
+    logger.info("Audit logs router included")
+
 # ==================== ENDPOINTS PRINCIPAUX ====================
 
 @app.get("/")
@@ -687,6 +808,60 @@ async def test_admin_endpoint():
         }
     }
 
+# Supervision du pool de connexions (dimensionnement workers × pool_size + max_overflow)
+@app.get("/api/admin/system/pool")
+async def get_pool_status(current_user = Depends(get_current_admin_user)):
+    """Occupation des pools, débordement et temps d'attente d'une connexion"""
+    pools = pool_metrics.snapshot_all()
+    per_worker = sum(pool.get("capacity", 0) for pool in pools.values())
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    return {
+        "settings": db_settings.public_dump(),
+        "pools": pools,
+        "replicas": replica_set.status(),
+        "connections_per_worker": per_worker,
+        "workers": workers,
+        "max_connections_required": per_worker * workers,
+        "timestamp": datetime.utcnow()
+    }
+
+@app.get("/api/admin/system/password-hashing")
+async def get_password_hashing_status(current_user = Depends(get_current_admin_user)):
+    """Pool bcrypt dédié : profondeur de file, rejets et temps d'attente"""
+    if not password_hashing_available:
+        raise HTTPException(status_code=503, detail="Pool de hachage non disponible")
+    return {**password_hashing.hasher.metrics(), "timestamp": datetime.utcnow()}
+
+@app.get("/api/admin/system/admission")
+async def get_admission_status(current_user = Depends(get_current_admin_user)):
+    """Limitation de débit et requêtes simultanées par classe de routes (worker courant)"""
+    return {**rate_limit.snapshot(), "timestamp": datetime.utcnow()}
+
+@app.get("/api/admin/system/idempotency")
+async def get_idempotency_status(current_user = Depends(get_current_admin_user)):
+    """Clés Idempotency-Key : réservations, rejeux, conflits (worker courant)"""
+    return {**idempotency.snapshot(), "timestamp": datetime.utcnow()}
+
+@app.get("/api/admin/system/single-flight")
+async def get_single_flight_status(current_user = Depends(get_current_admin_user)):
+    """Calculs regroupés (comparateur, statistiques de marché) : exécutions, doublons, cache (worker courant)"""
+    return {"flights": single_flight.snapshot(), "timestamp": datetime.utcnow()}
+
+@app.get("/api/admin/system/audit-log")
+async def get_audit_log_status(current_user = Depends(get_current_admin_user)):
+    """Écriture différée du journal d'audit : file d'attente, lots écrits, débordement sur disque"""
+    if not audit_log_available:
+        raise HTTPException(status_code=503, detail="Journal d'audit non disponible")
+    return {**audit_log.stats(), "timestamp": datetime.utcnow()}
+
+@app.get("/api/admin/system/notifications")
+async def get_notifications_status(current_user = Depends(get_current_admin_user)):
+    """Flux SSE de notifications ouverts, événements diffusés et compteurs de non-lues en cache (worker courant)"""
+    if not notifications_available:
+        raise HTTPException(status_code=503, detail="Flux de notifications non disponibles")
+    return {**notifications.stats(), "timestamp": datetime.utcnow()}
+
 # Endpoint de test CORS spécifique
 @app.get("/api/test-cors")
 async def test_cors():
@@ -700,7 +875,7 @@ async def test_cors():
     }
 
 @app.get("/api/stats")
-async def get_api_stats(db: Session = Depends(get_db)):
+async def get_api_stats():
     """Statistiques générales de l'API"""
     try:
         stats = {
@@ -722,59 +897,20 @@ async def get_api_stats(db: Session = Depends(get_db)):
             }
         }
         
-        # Statistiques des banques si le modèle existe
-        try:
-            if hasattr(models, 'Bank'):
-                total_banks = db.query(models.Bank).count()
-                active_banks = db.query(models.Bank).filter(models.Bank.is_active == True).count()
-                stats["banks"] = {"total": total_banks, "active": active_banks}
-        except Exception as e:
-            logger.warning(f"Error getting bank stats: {str(e)}")
-        
-        # Statistiques des produits de crédit
-        try:
-            if hasattr(models, 'CreditProduct'):
-                total_credit_products = db.query(models.CreditProduct).filter(
-                    models.CreditProduct.is_active == True
-                ).count()
-                stats["products"]["credit"] = total_credit_products
-        except Exception as e:
-            logger.warning(f"Error getting credit product stats: {str(e)}")
-        
-        # Statistiques des produits d'épargne
+        # Compteurs en mémoire (maintenus par counters.py, recalés périodiquement)
         try:
-            if hasattr(models, 'SavingsProduct'):
-                total_savings_products = db.query(models.SavingsProduct).filter(
-                    models.SavingsProduct.is_active == True
-                ).count()
-                stats["products"]["savings"] = total_savings_products
+            if counters_available:
+                stats["banks"] = {
+                    "total": counters.count("banks"),
+                    "active": counters.count("banks", "active")
+                }
+                stats["products"]["credit"] = counters.count("credit_products", "active")
+                stats["products"]["savings"] = counters.count("savings_products", "active")
+                stats["products"]["insurance"] = counters.count("insurance_products", "active")
+                stats["simulations"]["credit"] = counters.count("credit_simulations")
+                stats["simulations"]["savings"] = counters.count("savings_simulations")
         except Exception as e:
-            logger.warning(f"Error getting savings product stats: {str(e)}")
-        
-        # Statistiques des produits d'assurance
-        try:
-            if hasattr(models, 'InsuranceProduct'):
-                total_insurance_products = db.query(models.InsuranceProduct).filter(
-                    models.InsuranceProduct.is_active == True
-                ).count()
-                stats["products"]["insurance"] = total_insurance_products
-        except Exception as e:
-            logger.warning(f"Error getting insurance product stats: {str(e)}")
-        
-        # Statistiques des simulations
-        try:
-            if hasattr(models, 'CreditSimulation'):
-                total_credit_simulations = db.query(models.CreditSimulation).count()
-                stats["simulations"]["credit"] = total_credit_simulations
-        except Exception as e:
-            logger.warning(f"Error getting credit simulation stats: {str(e)}")
-        
-        try:
-            if hasattr(models, 'SavingsSimulation'):
-                total_savings_simulations = db.query(models.SavingsSimulation).count()
-                stats["simulations"]["savings"] = total_savings_simulations
-        except Exception as e:
-            logger.warning(f"Error getting savings simulation stats: {str(e)}")
+            logger.warning(f"Error getting counters: {str(e)}")
         
         # Calcul des totaux
         stats["products"]["total"] = (
@@ -794,102 +930,138 @@ async def get_api_stats(db: Session = Depends(get_db)):
         logger.error(f"Error getting stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur lors de la récupération des statistiques")
 
+@app.get("/api/search/suggest")
+async def search_suggest(
+    q: str,
+    limit: int = 8
+):
+    """Autocomplétion des noms de produits, banques et assureurs (index de préfixes en mémoire,
+    sans session SQL : la reconstruction ouvre la sienne dans le pool de threads)"""
+    if not suggest_index_available:
+        raise HTTPException(status_code=503, detail="Autocomplétion indisponible")
+
+    try:
+        return {
+            "query": q,
+            "suggestions": await suggest_index.suggest(q, limit=min(max(limit, 1), 20))
+        }
+    except Exception as e:
+        logger.error(f"Suggest error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur lors de l'autocomplétion")
+
+def _search_products_ilike(db: Session, q: str, product_type: Optional[str], limit: int):
+    """Recherche de repli (ILIKE) quand l'index plein texte est absent, périmé ou en échec"""
+    pattern = f"%{q.strip()}%"
+    catalogs = (
+        ("credit", models.CreditProduct, models.Bank, models.CreditProduct.bank_id),
+        ("savings", models.SavingsProduct, models.Bank, models.SavingsProduct.bank_id),
+        ("insurance", models.InsuranceProduct, models.InsuranceCompany, models.InsuranceProduct.insurance_company_id),
+    )
+    hits = []
+    for catalog_type, product_model, institution_model, institution_id in catalogs:
+        if product_type and product_type != catalog_type:
+            continue
+        ids = db.query(product_model.id).join(institution_model, institution_model.id == institution_id).filter(
+            product_model.is_active == True,
+            institution_model.is_active == True,
+            product_model.name.ilike(pattern) |
+            product_model.description.ilike(pattern) |
+            product_model.type.ilike(pattern)
+        ).order_by(product_model.name).limit(limit).all()
+        hits.extend({"product_type": catalog_type, "product_id": row.id, "score": 0.0} for row in ids)
+    return hits[:limit]
+
 @app.get("/api/search")
 async def search_products(
     q: str,
+    background_tasks: BackgroundTasks,
     type: str = None,
+    limit: int = 20,
     db: Session = Depends(get_db)
 ):
-    """Recherche globale de produits financiers"""
+    """Recherche globale de produits financiers (index plein texte classé, repli ILIKE)"""
     results = {"credit": [], "savings": [], "insurance": []}
+
+    if type and type not in results:
+        raise HTTPException(status_code=400, detail=f"Type invalide: {type}")
+
+    limit = min(max(limit, 1), 50)
     
     try:
-        # Recherche dans les produits de crédit si disponible
-        if hasattr(models, 'Bank') and hasattr(models, 'CreditProduct'):
-            if not type or type == "credit":
-                try:
-                    credit_query = db.query(models.CreditProduct).join(models.Bank).filter(
-                        models.CreditProduct.is_active == True,
-                        models.Bank.is_active == True
-                    )
-                    
-                    credit_products = credit_query.filter(
-                        models.CreditProduct.name.ilike(f"%{q}%") |
-                        models.CreditProduct.description.ilike(f"%{q}%") |
-                        models.CreditProduct.type.ilike(f"%{q}%")
-                    ).limit(10).all()
-                    
-                    results["credit"] = [
-                        {
-                            "id": p.id,
-                            "name": p.name,
-                            "type": p.type,
-                            "bank_name": p.bank.name if p.bank else "N/A",
-                            "average_rate": float(p.average_rate),
-                            "min_amount": float(p.min_amount),
-                            "max_amount": float(p.max_amount)
-                        } for p in credit_products
-                    ]
-                except Exception as e:
-                    logger.warning(f"Credit search failed: {str(e)}")
+        hits = None
+        if search_index_available and search_index.is_available():
+            try:
+                hits = search_index.search_products(db, q, product_type=type, limit=limit)
+            except Exception as e:
+                # pg_trgm retiré, table corrompue... : la recherche reste servie par ILIKE
+                logger.warning(f"Index de recherche en échec, repli ILIKE: {str(e)}")
+                db.rollback()
+        elif search_index_available and search_index.is_stale():
+            background_tasks.add_task(search_index.refresh_if_stale)
+        ranked = hits is not None
+        if not ranked:
+            hits = _search_products_ilike(db, q, type, limit) if q.strip() else []
+        
+        # Chargement groupé des produits trouvés, par catalogue
+        ids_by_type = {product_type: [] for product_type in results}
+        for hit in hits:
+            ids_by_type[hit["product_type"]].append(hit["product_id"])
         
-        # Recherche dans les produits d'épargne
-        if hasattr(models, 'SavingsProduct'):
-            if not type or type == "savings":
-                try:
-                    savings_products = db.query(models.SavingsProduct).join(models.Bank).filter(
-                        models.SavingsProduct.is_active == True,
-                        models.Bank.is_active == True,
-                        models.SavingsProduct.name.ilike(f"%{q}%") |
-                        models.SavingsProduct.description.ilike(f"%{q}%") |
-                        models.SavingsProduct.type.ilike(f"%{q}%")
-                    ).limit(10).all()
-                    
-                    results["savings"] = [
-                        {
-                            "id": p.id,
-                            "name": p.name,
-                            "type": p.type,
-                            "bank_name": p.bank.name if p.bank else "N/A",
-                            "interest_rate": float(p.interest_rate),
-                            "minimum_deposit": float(p.minimum_deposit)
-                        } for p in savings_products
-                    ]
-                except Exception as e:
-                    logger.warning(f"Savings search failed: {str(e)}")
+        products = {}
+        if ids_by_type["credit"]:
+            for p in db.query(models.CreditProduct).options(
+                joinedload(models.CreditProduct.bank).load_only(models.Bank.name)
+            ).filter(models.CreditProduct.id.in_(ids_by_type["credit"])):
+                products[("credit", p.id)] = {
+                    "id": p.id,
+                    "name": p.name,
+                    "type": p.type,
+                    "bank_name": p.bank.name if p.bank else "N/A",
+                    "average_rate": float(p.average_rate),
+                    "min_amount": float(p.min_amount),
+                    "max_amount": float(p.max_amount)
+                }
+        if ids_by_type["savings"]:
+            for p in db.query(models.SavingsProduct).options(
+                joinedload(models.SavingsProduct.bank).load_only(models.Bank.name)
+            ).filter(models.SavingsProduct.id.in_(ids_by_type["savings"])):
+                products[("savings", p.id)] = {
+                    "id": p.id,
+                    "name": p.name,
+                    "type": p.type,
+                    "bank_name": p.bank.name if p.bank else "N/A",
+                    "interest_rate": float(p.interest_rate),
+                    "minimum_deposit": float(p.minimum_deposit)
+                }
+        if ids_by_type["insurance"]:
+            for p in db.query(models.InsuranceProduct).options(
+                joinedload(models.InsuranceProduct.insurance_company).load_only(models.InsuranceCompany.name)
+            ).filter(models.InsuranceProduct.id.in_(ids_by_type["insurance"])):
+                products[("insurance", p.id)] = {
+                    "id": p.id,
+                    "name": p.name,
+                    "type": p.type,
+                    "company_name": p.insurance_company.name if p.insurance_company else "N/A",
+                    "base_premium": float(p.base_premium) if p.base_premium else 0
+                }
         
-        # Recherche dans les produits d'assurance
-        if hasattr(models, 'InsuranceProduct'):
-            if not type or type == "insurance":
-                try:
-                    insurance_products = db.query(models.InsuranceProduct).filter(
-                        models.InsuranceProduct.is_active == True,
-                        models.InsuranceProduct.name.ilike(f"%{q}%") |
-                        models.InsuranceProduct.description.ilike(f"%{q}%") |
-                        models.InsuranceProduct.type.ilike(f"%{q}%")
-                    ).limit(10).all()
-                    
-                    results["insurance"] = [
-                        {
-                            "id": p.id,
-                            "name": p.name,
-                            "type": p.type,
-                            "company_name": p.insurance_company.name if hasattr(p, 'insurance_company') and p.insurance_company else "N/A",
-                            "base_premium": float(p.base_premium) if p.base_premium else 0
-                        } for p in insurance_products
-                    ]
-                except Exception as e:
-                    logger.warning(f"Insurance search failed: {str(e)}")
+        # Liste unifiée, dans l'ordre de pertinence de l'index
+        items = []
+        for hit in hits:
+            product = products.get((hit["product_type"], hit["product_id"]))
+            if not product:
+                continue
+            product = {**product, "score": round(float(hit["score"]), 4)}
+            results[hit["product_type"]].append(product)
+            items.append({"product_type": hit["product_type"], **product})
         
         return {
             "query": q,
             "results": results,
-            "total_found": len(results["credit"]) + len(results["savings"]) + len(results["insurance"]),
-            "available_types": [
-                "credit" if hasattr(models, 'CreditProduct') else None,
-                "savings" if hasattr(models, 'SavingsProduct') else None,
-                "insurance" if hasattr(models, 'InsuranceProduct') else None
-            ]
+            "items": items,
+            "total_found": len(items),
+            "available_types": list(results),
+            "ranked": ranked
         }
         
     except Exception as e:
@@ -948,6 +1120,10 @@ async def startup_event():
     logger.info("Démarrage de l'API Bamboo Financial")
     logger.info(f"Modules disponibles - Banks: {banks_available}, Bank Admin: {bank_admin_available}, Credits: {credits_available}, Insurance: {insurance_available}, Simulations: {simulations_available}, Savings: {savings_available}")
     logger.info("Routes d'authentification admin intégrées et disponibles")
+
+    # Journal d'audit : démarré même si la base est indisponible (les événements débordent sur disque)
+    if audit_log_available:
+        audit_log.start()
     
     # Test de connexion à la base de données
     try:
@@ -955,6 +1131,12 @@ async def startup_event():
         db.execute(text("SELECT 1"))
         db.close()
         logger.info("Connexion à la base de données réussie")
+
+        # Routes asynchrones et idempotence : le pilote asynchrone doit accepter l'URL configurée
+        if await test_async_connection():
+            logger.info("Connexion asynchrone à la base de données réussie")
+        else:
+            logger.error("Connexion asynchrone impossible : routes asynchrones et idempotence indisponibles")
         
         # Optionnel : Créer les tables si elles n'existent pas
         try:
@@ -963,6 +1145,41 @@ async def startup_event():
                 logger.info("Tables vérifiées/créées")
         except Exception as e:
             logger.warning(f"Erreur création tables: {str(e)}")
+        
+        if search_index_available and search_index.init_search_index():
+            logger.info("Index de recherche prêt")
+
+        if rollups_available and rollups.init_rollups():
+            logger.info("Agrégats de simulations prêts")
+
+        if counters_available:
+            counters.start(float(os.getenv("COUNTERS_RECONCILE_SECONDS", "300")))
+            logger.info("Compteurs globaux chargés")
+
+        if sketches_available and sketches.init_sketches():
+            sketches.start(float(os.getenv("SKETCHES_FLUSH_SECONDS", "60")))
+            logger.info("Esquisses de distribution chargées")
+
+        # Invalidation du cache de sessions entre workers
+        if session_cache_available:
+            session_cache.start()
+
+        # Index d'autocomplétion invalidé quand un autre worker modifie le catalogue
+        if suggest_index_available:
+            suggest_index.start()
+
+        # Purge par lots des sessions expirées ou désactivées
+        if session_purge_available:
+            session_purge.start()
+
+        # Notifications créées par les autres workers, poussées aux flux SSE de ce worker
+        if notifications_available:
+            notifications.start()
+
+        # Surveillance du retard des réplicas en lecture
+        if replica_set:
+            replica_set.start()
+            logger.info(f"{len(replica_set.replicas)} réplica(s) en lecture configuré(s)")
             
     except Exception as e:
         logger.error(f"Erreur lors de la connexion à la base de données: {str(e)}")
@@ -971,6 +1188,27 @@ async def startup_event():
 async def shutdown_event():
     """Nettoyage à l'arrêt"""
     logger.info("Arrêt de l'API Bamboo Financial")
+    replica_set.stop()
+    if counters_available:
+        counters.stop()
+    if sketches_available:
+        sketches.stop()
+    if session_cache_available:
+        session_cache.stop()
+    if suggest_index_available:
+        suggest_index.stop()
+    if session_purge_available:
+        session_purge.stop()
+    if audit_log_available:
+        audit_log.stop()
+    if notifications_available:
+        notifications.stop()
+    if password_hashing_available:
+        password_hashing.hasher.shutdown()
+    await async_engine.dispose()
+    for replica in replica_set.replicas:
+        replica.engine.dispose()
+        await replica.async_engine.dispose()
 
 # ==================== INFORMATIONS DE VERSION ====================
 
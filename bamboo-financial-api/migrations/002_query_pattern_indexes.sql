@@ -0,0 +1,97 @@
+-- 002_query_pattern_indexes.sql - Index dérivés des requêtes réelles des routers
+-- Composites pour (filtre, tri) et partiels sur les lignes actives.
+-- Écrit en SQL portable PostgreSQL / SQLite (pas de USING ni de CONCURRENTLY).
+
+-- ==================== PRODUITS ====================
+
+-- banks.get_bank_credit_products : produits actifs d'une banque
+CREATE INDEX IF NOT EXISTS idx_credit_products_bank_active
+    ON credit_products (bank_id) WHERE is_active = TRUE;
+
+-- analytics.get_market_statistics : meilleur taux parmi les produits actifs
+CREATE INDEX IF NOT EXISTS idx_credit_products_rate_active
+    ON credit_products (average_rate) WHERE is_active = TRUE;
+
+-- credit_product_admin.get_credit_products : ORDER BY created_at DESC
+CREATE INDEX IF NOT EXISTS idx_credit_products_created
+    ON credit_products (created_at DESC);
+
+-- savings.get_savings_products : actifs triés par taux décroissant
+CREATE INDEX IF NOT EXISTS idx_savings_products_rate_active
+    ON savings_products (interest_rate DESC) WHERE is_active = TRUE;
+
+-- banks.get_bank_savings_products
+CREATE INDEX IF NOT EXISTS idx_savings_products_bank_active
+    ON savings_products (bank_id) WHERE is_active = TRUE;
+
+-- savings_admin.get_savings_products : ORDER BY created_at DESC
+CREATE INDEX IF NOT EXISTS idx_savings_products_created
+    ON savings_products (created_at DESC);
+
+-- insurance.get_insurance_products : produits actifs d'une compagnie / d'un type
+CREATE INDEX IF NOT EXISTS idx_insurance_products_company_active
+    ON insurance_products (insurance_company_id) WHERE is_active = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_insurance_products_type_active
+    ON insurance_products (type, base_premium) WHERE is_active = TRUE;
+
+-- ==================== SIMULATIONS ET DEVIS ====================
+
+-- bank_admin (dernière simulation, historique paginé), simulations par produit
+CREATE INDEX IF NOT EXISTS idx_credit_simulations_product_created
+    ON credit_simulations (credit_product_id, created_at DESC);
+
+-- analytics.get_trends, bank_admin.get_banks_stats : fenêtres temporelles
+CREATE INDEX IF NOT EXISTS idx_credit_simulations_created
+    ON credit_simulations (created_at);
+
+-- Historique d'une session anonyme
+CREATE INDEX IF NOT EXISTS idx_credit_simulations_session_created
+    ON credit_simulations (session_id, created_at DESC) WHERE session_id IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_savings_simulations_product_created
+    ON savings_simulations (savings_product_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_savings_simulations_created
+    ON savings_simulations (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_savings_simulations_session_created
+    ON savings_simulations (session_id, created_at DESC) WHERE session_id IS NOT NULL;
+
+-- insurance_admin : nombre de devis et dernier devis par produit
+CREATE INDEX IF NOT EXISTS idx_insurance_quotes_product_created
+    ON insurance_quotes (insurance_product_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_insurance_quotes_created
+    ON insurance_quotes (created_at);
+
+-- ==================== AUDIT ====================
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created_desc
+    ON audit_logs (created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_admin_created
+    ON audit_logs (admin_user_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_entity_created
+    ON audit_logs (entity_type, entity_id, created_at DESC);
+
+-- ==================== UTILISATEURS ====================
+
+-- auth_router.get_current_user : index unique sur l'empreinte du jeton, voir 005_hashed_session_tokens
+
+-- auth_router.get_user_sessions : sessions actives d'un utilisateur, plus récentes d'abord
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user_active
+    ON user_sessions (user_id, created_at DESC) WHERE is_active = TRUE;
+
+-- Notifications non lues d'un utilisateur
+CREATE INDEX IF NOT EXISTS idx_user_notifications_user_unread
+    ON user_notifications (user_id, created_at DESC) WHERE is_read = FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_user_notifications_user_created
+    ON user_notifications (user_id, created_at DESC);
+
+-- ==================== INDEX REMPLACÉS ====================
+
+-- Booléen seul : non sélectif, remplacé par les index partiels ci-dessus
+DROP INDEX IF EXISTS idx_credit_products_active;
@@ -0,0 +1,19 @@
+-- 003_simulation_rollups.sql - Agrégats journaliers des simulations (voir rollups.py)
+-- Remplissage initial : python -m rollups (ou automatiquement au démarrage si la table est vide).
+
+CREATE TABLE IF NOT EXISTS simulation_daily_rollups (
+    day DATE NOT NULL,
+    simulation_type VARCHAR(10) NOT NULL,
+    product_id VARCHAR(50) NOT NULL,
+    bank_id VARCHAR(50),
+    product_type VARCHAR(50),
+    simulation_count BIGINT NOT NULL DEFAULT 0,
+    amount_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    duration_sum BIGINT NOT NULL DEFAULT 0,
+    eligible_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, simulation_type, product_id)
+);
+
+-- bank_admin.get_bank_performance : agrégats d'une banque sur une période
+CREATE INDEX IF NOT EXISTS idx_simulation_rollups_bank_day
+    ON simulation_daily_rollups (bank_id, day);
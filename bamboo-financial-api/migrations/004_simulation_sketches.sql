@@ -0,0 +1,14 @@
+-- 004_simulation_sketches.sql - Esquisses de distribution des simulations (voir sketches.py)
+-- Construction initiale : python -m sketches (ou automatiquement au démarrage si la table est vide).
+
+CREATE TABLE IF NOT EXISTS simulation_sketches (
+    simulation_type VARCHAR(10) NOT NULL,
+    scope VARCHAR(10) NOT NULL,
+    scope_key VARCHAR(50) NOT NULL,
+    metric VARCHAR(50) NOT NULL,
+    kind VARCHAR(10) NOT NULL,
+    observations BIGINT NOT NULL DEFAULT 0,
+    payload JSON NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (simulation_type, scope, scope_key, metric)
+);
@@ -0,0 +1,34 @@
+-- 005_hashed_session_tokens.postgresql.sql - Sessions indexées par l'empreinte SHA-256 du token (voir user_models.hash_session_token)
+-- Le JWT complet (jusqu'à 500 caractères, index unique) est remplacé par 64 caractères hexadécimaux :
+-- index plus petit, sondes à largeur fixe, et plus aucun token utilisable stocké en base.
+-- À appliquer avec le déploiement du code correspondant (l'ancien code écrit encore la colonne token).
+-- Sur une base créée après ce changement (create_all), la colonne token n'existe pas : seul l'index est vérifié.
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+         WHERE table_schema = current_schema() AND table_name = 'user_sessions' AND column_name = 'token'
+    ) THEN
+        ALTER TABLE user_sessions ADD COLUMN IF NOT EXISTS token_hash VARCHAR(64);
+
+        -- Sessions existantes : même empreinte que celle calculée par l'application
+        UPDATE user_sessions
+           SET token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex')
+         WHERE token_hash IS NULL;
+
+        ALTER TABLE user_sessions ALTER COLUMN token_hash SET NOT NULL;
+
+        -- Anciens index sur le token en clair, puis la colonne (et sa contrainte unique)
+        DROP INDEX IF EXISTS idx_user_sessions_token_active;
+        DROP INDEX IF EXISTS idx_user_sessions_token;
+        ALTER TABLE user_sessions DROP COLUMN token;
+    END IF;
+END $$;
+
+-- Même nom que l'index créé par le modèle (token_hash unique + index) : pas de doublon sur une base neuve
+CREATE UNIQUE INDEX IF NOT EXISTS ix_user_sessions_token_hash ON user_sessions (token_hash);
+
+-- session_purge.purge_sessions : sessions expirées ou désactivées, supprimées par lots
+CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at ON user_sessions (expires_at);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_inactive ON user_sessions (id) WHERE is_active = FALSE;
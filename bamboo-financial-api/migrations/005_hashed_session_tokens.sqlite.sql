@@ -0,0 +1,34 @@
+-- 005_hashed_session_tokens.sqlite.sql - Variante SQLite de 005_hashed_session_tokens.postgresql.sql
+-- SQLite ne calcule pas de SHA-256 en SQL et ne supprime pas une colonne indexée : la table est reconstruite
+-- au schéma de user_models.UserSession. Les sessions existantes sont abandonnées (nouvelle connexion requise).
+
+DROP TABLE IF EXISTS user_sessions_new;
+
+CREATE TABLE user_sessions_new (
+    id VARCHAR(50) NOT NULL,
+    user_id VARCHAR(50) NOT NULL,
+    token_hash VARCHAR(64) NOT NULL,
+    device_info JSON NOT NULL,
+    ip_address VARCHAR(45),
+    user_agent TEXT,
+    expires_at DATETIME NOT NULL,
+    is_active BOOLEAN NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+DROP TABLE user_sessions;
+ALTER TABLE user_sessions_new RENAME TO user_sessions;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_user_sessions_token_hash ON user_sessions (token_hash);
+CREATE INDEX IF NOT EXISTS ix_user_sessions_user_id ON user_sessions (user_id);
+
+-- Index de 002, supprimés avec l'ancienne table
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user_active
+    ON user_sessions (user_id, created_at DESC) WHERE is_active = TRUE;
+
+-- session_purge.purge_sessions : sessions expirées ou désactivées, supprimées par lots
+CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at ON user_sessions (expires_at);
+-- Index complet : SQLite n'utilise pas d'index partiel dans un OR (plan MULTI-INDEX OR)
+CREATE INDEX IF NOT EXISTS idx_user_sessions_inactive ON user_sessions (is_active);
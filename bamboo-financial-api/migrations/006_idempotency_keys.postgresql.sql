@@ -0,0 +1,15 @@
+-- 006_idempotency_keys.postgresql.sql - Clés Idempotency-Key des POST de simulation et de devis (voir idempotency.py)
+-- Les clés expirées (IDEMPOTENCY_TTL_SECONDS, 24 h par défaut) sont supprimées par lots par l'API.
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key VARCHAR(64) PRIMARY KEY,
+    fingerprint VARCHAR(64) NOT NULL,
+    status VARCHAR(12) NOT NULL,
+    response_status INTEGER,
+    response_headers JSON,
+    response_body BYTEA,
+    created_at TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys (expires_at);
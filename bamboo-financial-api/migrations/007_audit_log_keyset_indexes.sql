@@ -0,0 +1,22 @@
+-- 007_audit_log_keyset_indexes.sql - Index du journal d'audit pour la pagination par curseur (voir routers/audit_logs.py)
+-- Tri (created_at DESC, id DESC) : id départage les événements écrits dans le même lot (même horodatage possible).
+-- Chaque filtre de GET /api/admin/audit-logs dispose d'un index qui fournit directement l'ordre de parcours.
+
+DROP INDEX IF EXISTS idx_audit_logs_created_desc;
+DROP INDEX IF EXISTS idx_audit_logs_admin_created;
+DROP INDEX IF EXISTS idx_audit_logs_entity_created;
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created_id
+    ON audit_logs (created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_admin_created_id
+    ON audit_logs (admin_user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_entity_type_created_id
+    ON audit_logs (entity_type, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_entity_created_id
+    ON audit_logs (entity_type, entity_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_action_created_id
+    ON audit_logs (action, created_at DESC, id DESC);
@@ -0,0 +1,6 @@
+-- 008_active_product_indexes.postgresql.sql - Produits de crédit actifs d'un type (voir routers/credits.py)
+-- credits.compare_credit_offers et credits.get_credit_products filtrent sur le code de type des produits actifs ;
+-- average_rate en second : le meilleur taux d'un type se lit dans l'index.
+
+CREATE INDEX IF NOT EXISTS idx_credit_products_type_active
+    ON credit_products (type, average_rate) WHERE is_active = TRUE;
@@ -0,0 +1,40 @@
+-- 008_active_product_indexes.sqlite.sql - Produits de crédit actifs d'un type, index partiels utilisables par SQLite
+-- SQLite n'emploie un index partiel que si la requête reprend son prédicat à l'identique ; SQLAlchemy écrit
+-- les booléens 1 / 0 (is_active = 1) : les index partiels « = TRUE / = FALSE » de 002 et 005 n'étaient jamais choisis.
+-- Ils sont recréés ici avec les mêmes colonnes et le prédicat tel que les routers l'émettent.
+
+-- credits.compare_credit_offers, credits.get_credit_products : code de type des produits actifs
+CREATE INDEX IF NOT EXISTS idx_credit_products_type_active
+    ON credit_products (type, average_rate) WHERE is_active = 1;
+
+DROP INDEX IF EXISTS idx_credit_products_bank_active;
+CREATE INDEX idx_credit_products_bank_active
+    ON credit_products (bank_id) WHERE is_active = 1;
+
+DROP INDEX IF EXISTS idx_credit_products_rate_active;
+CREATE INDEX idx_credit_products_rate_active
+    ON credit_products (average_rate) WHERE is_active = 1;
+
+DROP INDEX IF EXISTS idx_savings_products_rate_active;
+CREATE INDEX idx_savings_products_rate_active
+    ON savings_products (interest_rate DESC) WHERE is_active = 1;
+
+DROP INDEX IF EXISTS idx_savings_products_bank_active;
+CREATE INDEX idx_savings_products_bank_active
+    ON savings_products (bank_id) WHERE is_active = 1;
+
+DROP INDEX IF EXISTS idx_insurance_products_company_active;
+CREATE INDEX idx_insurance_products_company_active
+    ON insurance_products (insurance_company_id) WHERE is_active = 1;
+
+DROP INDEX IF EXISTS idx_insurance_products_type_active;
+CREATE INDEX idx_insurance_products_type_active
+    ON insurance_products (type, base_premium) WHERE is_active = 1;
+
+DROP INDEX IF EXISTS idx_user_sessions_user_active;
+CREATE INDEX idx_user_sessions_user_active
+    ON user_sessions (user_id, created_at DESC) WHERE is_active = 1;
+
+DROP INDEX IF EXISTS idx_user_notifications_user_unread;
+CREATE INDEX idx_user_notifications_user_unread
+    ON user_notifications (user_id, created_at DESC) WHERE is_read = 0;
@@ -0,0 +1,247 @@
+# Migration script - explain_check.py
+# Vérifie par EXPLAIN que les requêtes des routers utilisent les index créés par les migrations versionnées.
+# Les requêtes ne sont pas recopiées ici : chaque route est appelée sur l'application (GET en lecture seule)
+# et les instructions SQL réellement émises par ses handlers (et par entity_stats, rollups, etc.) sont capturées.
+# Échoue (code 1) si une migration n'est pas appliquée ou si un parcours séquentiel apparaît sur une des
+# grandes tables, ou sur une table dont la route doit être servie par un index.
+# Usage (depuis la racine de l'API) : python -m migrations.explain_check
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import json
+import sys
+
+from database import engine, SessionLocal
+import models
+import notifications
+import rollups
+import session_purge
+from migrations.migrate import pending_migrations
+
+# Tables qui grossissent avec le trafic : un Seq Scan y est un échec
+LARGE_TABLES = {
+    "credit_simulations",
+    "savings_simulations",
+    "insurance_quotes",
+    "audit_logs",
+    "user_sessions",
+    "user_notifications",
+}
+
+CHECK_USER_ID = "explain-check-user"
+
+# ==================== CAPTURE DES REQUÊTES ====================
+
+class QueryRecorder:
+    """Collecte les SELECT exécutés par les sessions ORM (synchrones et asynchrones) pendant un scénario"""
+
+    def __init__(self):
+        self.statements: Optional[list] = None
+
+    def __call__(self, state):
+        # Chargements de relations (clé primaire / étrangère) : émis par l'ORM, pas par le handler
+        if self.statements is None or not state.is_select or state.is_relationship_load:
+            return
+        statement = state.statement
+        if isinstance(state.parameters, dict) and state.parameters:
+            statement = statement.params(state.parameters)
+        self.statements.append(statement)
+
+    @contextmanager
+    def recording(self):
+        self.statements = []
+        try:
+            yield self.statements
+        finally:
+            self.statements = None
+
+def _sample_ids() -> Dict[str, str]:
+    """Identifiants existants : sans eux certaines routes s'arrêtent sur un 404 avant leurs requêtes"""
+    db = SessionLocal()
+    try:
+        return {
+            "bank": db.execute(select(models.Bank.id).limit(1)).scalar() or "bgfi",
+            "insurer": db.execute(select(models.InsuranceCompany.id).limit(1)).scalar() or "ogar",
+        }
+    finally:
+        db.close()
+
+def route_scenarios(ids: Dict[str, str]) -> List[Tuple[str, str, Set[str]]]:
+    """(nom, chemin, tables qui doivent être lues par index en plus des grandes tables)"""
+    from routers.audit_logs import encode_cursor
+
+    cursor = encode_cursor(datetime.utcnow() - timedelta(days=30), "0")
+    bank, insurer = ids["bank"], ids["insurer"]
+    return [
+        ("banks.get_bank_credit_products", f"/api/banks/{bank}/credit-products", {"credit_products"}),
+        ("banks.get_bank_savings_products", f"/api/banks/{bank}/savings-products", {"savings_products"}),
+        ("credits.get_credit_products (type)", "/api/credits/products?credit_type=immobilier", {"credit_products"}),
+        ("credits.compare_credit_offers", "/api/credits/compare?credit_type=immobilier&amount=10000000"
+                                          "&duration=120&monthly_income=1500000", {"credit_products"}),
+        ("savings.get_savings_products", "/api/savings/products", set()),
+        ("insurance.get_insurance_products (compagnie)", f"/api/insurance/products?company_id={insurer}",
+         {"insurance_products"}),
+        ("analytics.get_market_statistics", "/api/analytics/market-statistics", set()),
+        ("analytics.get_trends", "/api/analytics/trends?period_days=30", set()),
+        ("bank_admin.get_banks_admin", "/api/admin/banks", set()),
+        ("bank_admin.get_banks_stats", "/api/admin/banks/stats", set()),
+        ("bank_admin.get_bank_simulations", f"/api/admin/banks/{bank}/simulations", set()),
+        ("insurance_admin.get_insurance_products_admin", "/api/admin/insurance/products", set()),
+        ("audit_logs.get_audit_logs (plus récents)", "/api/admin/audit-logs", set()),
+        ("audit_logs.get_audit_logs (page suivante)", f"/api/admin/audit-logs?cursor={cursor}", set()),
+        ("audit_logs.get_audit_logs (par administrateur)", "/api/admin/audit-logs?admin_user_id=admin-1", set()),
+        ("audit_logs.get_audit_logs (par action)", "/api/admin/audit-logs?action=UPDATE", set()),
+        ("audit_logs.get_audit_logs (par type d'entité)", "/api/admin/audit-logs?entity_type=bank", set()),
+        ("audit_logs.get_audit_logs (par entité)", f"/api/admin/audit-logs?entity_type=bank&entity_id={bank}", set()),
+        ("auth_router.get_user_sessions", "/api/auth/sessions", set()),
+    ]
+
+async def _run_routes(recorder: QueryRecorder, scenarios) -> Dict[str, Tuple[List, int]]:
+    """Appelle chaque route sur l'application ; authentification remplacée par un utilisateur de test"""
+    import httpx
+    import main
+    from routers.auth_router import get_current_user
+
+    overrides = {
+        main.get_current_admin_user: lambda: SimpleNamespace(id="admin-1", role="super_admin"),
+        get_current_user: lambda: SimpleNamespace(id=CHECK_USER_ID),
+    }
+    main.app.dependency_overrides.update(overrides)
+    results = {}
+    try:
+        async with httpx.AsyncClient(app=main.app, base_url="http://explain-check") as client:
+            for name, path, _ in scenarios:
+                with recorder.recording() as statements:
+                    response = await client.get(path)
+                results[name] = (list(statements), response.status_code)
+    finally:
+        for dependency in overrides:
+            main.app.dependency_overrides.pop(dependency, None)
+    return results
+
+def _run_functions(recorder: QueryRecorder) -> Dict[str, Tuple[List, int]]:
+    """Requêtes émises hors des routes (authentification, notifications, tâches de fond)"""
+    from fastapi.security import HTTPAuthorizationCredentials
+    from routers.auth_router import create_access_token, get_current_user
+
+    results = {}
+    db = SessionLocal()
+    try:
+        token = create_access_token({"sub": CHECK_USER_ID})
+        with recorder.recording() as statements:
+            asyncio.run(get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db))
+        results["auth_router.get_current_user"] = (list(statements), 200)
+
+        with recorder.recording() as statements:
+            notifications.unread_count(db, CHECK_USER_ID)
+        results["notifications.unread_count"] = (list(statements), 200)
+    finally:
+        db.rollback()
+        db.close()
+
+    # Constructeurs utilisés tels quels par les tâches de fond
+    credit_source, created_at = rollups._credit_source()
+    results["rollups.backfill_rollups (depuis une date)"] = (
+        [credit_source.where(created_at >= datetime.utcnow() - timedelta(days=30))], 200
+    )
+    results["session_purge.purge_sessions (lot)"] = ([session_purge.purgeable_sessions(datetime.utcnow(), 1000)], 200)
+    return results
+
+def router_queries() -> Dict[str, Tuple[List, int, Set[str]]]:
+    """Requêtes réellement émises par chaque route ou fonction : nom -> (instructions, statut HTTP, tables indexées)"""
+    recorder = QueryRecorder()
+    event.listen(Session, "do_orm_execute", recorder)
+    try:
+        scenarios = route_scenarios(_sample_ids())
+        captured = asyncio.run(_run_routes(recorder, scenarios))
+        captured.update(_run_functions(recorder))
+    finally:
+        event.remove(Session, "do_orm_execute", recorder)
+
+    required = {name: tables for name, _, tables in scenarios}
+    return {name: (statements, status, required.get(name, set())) for name, (statements, status) in captured.items()}
+
+# ==================== PLANS D'EXÉCUTION ====================
+
+def _postgresql_seq_scans(connection, sql: str) -> List[str]:
+    """Tables parcourues séquentiellement d'après EXPLAIN (FORMAT JSON)"""
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    tables = []
+    pending = [plan[0]["Plan"]]
+    while pending:
+        node = pending.pop()
+        if node.get("Node Type") == "Seq Scan":
+            tables.append(node.get("Relation Name"))
+        pending.extend(node.get("Plans", []))
+    return tables
+
+def _sqlite_seq_scans(connection, sql: str) -> List[str]:
+    """Tables parcourues sans index d'après EXPLAIN QUERY PLAN"""
+    tables = []
+    for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall():
+        detail = row[-1]
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            tables.append(detail.split()[1])
+    return tables
+
+def check_query_plans(bind: Engine = engine) -> List[str]:
+    """Exécute EXPLAIN sur chaque requête capturée et retourne la liste des échecs"""
+    failures = []
+    dialect = bind.dialect.name
+
+    # Sans les index des migrations, les Seq Scan signalés ne diraient rien des requêtes
+    pending = [path.name for _, path in pending_migrations(bind)]
+    if pending:
+        print(f"❌ Migrations non appliquées : {', '.join(pending)} (python -m migrations.migrate)")
+        return [f"migrations non appliquées: {', '.join(pending)}"]
+
+    if dialect == "postgresql":
+        find_seq_scans = _postgresql_seq_scans
+    elif dialect == "sqlite":
+        find_seq_scans = _sqlite_seq_scans
+    else:
+        raise RuntimeError(f"Dialecte non supporté pour la vérification: {dialect}")
+
+    queries = router_queries()
+
+    with bind.connect() as connection:
+        if dialect == "postgresql":
+            # Sur une base peu remplie le planificateur préfère le Seq Scan :
+            # on le pénalise pour vérifier qu'un index utilisable existe
+            connection.exec_driver_sql("SET enable_seqscan = off")
+
+        for name, (statements, status, indexed_tables) in queries.items():
+            if status >= 400:
+                # Route arrêtée avant ses requêtes (données absentes) : rien de vérifiable, pas un échec
+                print(f"⚠️  {name}: réponse {status}, {len(statements)} requête(s) vérifiée(s)")
+            checked_tables = LARGE_TABLES | indexed_tables
+            scanned = set()
+            seen = set()
+            for statement in statements:
+                sql = str(statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+                if sql in seen:
+                    continue
+                seen.add(sql)
+                scanned.update(table for table in find_seq_scans(connection, sql) if table in checked_tables)
+            if scanned:
+                failures.append(f"{name}: parcours séquentiel sur {', '.join(sorted(scanned))}")
+                print(f"❌ {name}: Seq Scan sur {', '.join(sorted(scanned))}")
+            elif status < 400:
+                print(f"✅ {name} ({len(seen)} requête(s))")
+
+    return failures
+
+if __name__ == "__main__":
+    failures = check_query_plans()
+    if failures:
+        print(f"\n{len(failures)} requête(s) sans index adapté")
+        sys.exit(1)
+    print("\nToutes les requêtes utilisent un index")
@@ -0,0 +1,150 @@
+# Migration script - migrate.py
+# Applique dans l'ordre les migrations SQL versionnées (NNN_nom.sql) de ce dossier.
+# Une migration non portable fournit une variante par dialecte (NNN_nom.postgresql.sql, NNN_nom.sqlite.sql),
+# choisie à la place du fichier générique ; sans variante applicable, le runner s'arrête avant d'écrire.
+# Usage (depuis la racine de l'API) : python -m migrations.migrate [--list]
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import re
+import sys
+
+from database import engine
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent
+VERSION_TABLE = "schema_migrations"
+_FILE_RE = re.compile(r"^(\d{3})_[\w-]+?(?:\.(postgresql|sqlite))?\.sql$")
+
+def discover_migrations(dialect: Optional[str] = None) -> List[Tuple[str, Path]]:
+    """Liste triée des migrations (version, chemin) ; avec dialect, la variante à appliquer pour chaque version"""
+    variants: Dict[str, Dict[Optional[str], Path]] = {}
+    for path in MIGRATIONS_DIR.iterdir():
+        match = _FILE_RE.match(path.name)
+        if match:
+            variants.setdefault(match.group(1), {})[match.group(2)] = path
+
+    migrations = []
+    for version, files in sorted(variants.items()):
+        path = files.get(dialect) or files.get(None)
+        if dialect is None:
+            path = path or sorted(files.values())[0]
+        elif path is None:
+            names = ", ".join(sorted(file.name for file in files.values()))
+            raise RuntimeError(f"Migration {version} ({names}) : aucune variante pour le dialecte {dialect}")
+        migrations.append((version, path))
+    return migrations
+
+_DOLLAR_QUOTE_RE = re.compile(r"\$[A-Za-z_]*\$")
+_WORD_RE = re.compile(r"[A-Za-z_]+")
+_TRIGGER_RE = re.compile(r"^\s*CREATE\s+(?:TEMP\s+|TEMPORARY\s+)?TRIGGER\b", re.IGNORECASE)
+
+def split_statements(sql: str, dialect: str = "postgresql") -> List[str]:
+    """
+    Découpe un script en instructions sur les ';' de premier niveau (commentaires retirés).
+    Ignore les ';' des chaînes, des identifiants entre guillemets, des corps $tag$...$tag$
+    (PostgreSQL : DO, fonctions) et des blocs BEGIN ... END des triggers SQLite.
+    """
+    statements = []
+    current = []
+    depth = 0  # BEGIN/CASE ... END ouverts dans un trigger SQLite
+    i, length = 0, len(sql)
+
+    while i < length:
+        char = sql[i]
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = length if end < 0 else end
+            continue
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = length if end < 0 else end + 2
+            continue
+        if char in ("'", '"'):
+            # '' (ou "") à l'intérieur : guillemet échappé, la boucle continue sur la suite
+            end = sql.find(char, i + 1)
+            end = length if end < 0 else end + 1
+            current.append(sql[i:end])
+            i = end
+            continue
+        if char == "$" and dialect == "postgresql":
+            match = _DOLLAR_QUOTE_RE.match(sql, i)
+            if match:
+                tag = match.group(0)
+                end = sql.find(tag, match.end())
+                end = length if end < 0 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+                continue
+        if dialect == "sqlite" and (char.isalpha() or char == "_"):
+            match = _WORD_RE.match(sql, i)
+            word = match.group(0).upper()
+            if _TRIGGER_RE.match("".join(current)):
+                if word in ("BEGIN", "CASE"):
+                    depth += 1
+                elif word == "END":
+                    depth = max(0, depth - 1)
+            current.append(match.group(0))
+            i = match.end()
+            continue
+        if char == ";" and depth == 0:
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(char)
+        i += 1
+
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def _ensure_version_table(connection):
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+        "version VARCHAR(10) PRIMARY KEY, "
+        "name VARCHAR(200) NOT NULL, "
+        "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+
+def applied_versions(bind: Engine = engine) -> set:
+    """Versions déjà appliquées"""
+    with bind.begin() as connection:
+        _ensure_version_table(connection)
+        rows = connection.execute(text(f"SELECT version FROM {VERSION_TABLE}")).fetchall()
+    return {row[0] for row in rows}
+
+def pending_migrations(bind: Engine = engine) -> List[Tuple[str, Path]]:
+    """Migrations du dialecte de la base pas encore appliquées"""
+    done = applied_versions(bind)
+    return [(version, path) for version, path in discover_migrations(bind.dialect.name) if version not in done]
+
+def apply_migrations(bind: Engine = engine) -> List[str]:
+    """Applique les migrations en attente, chacune dans sa propre transaction"""
+    applied = []
+
+    for version, path in pending_migrations(bind):
+        statements = split_statements(path.read_text(encoding="utf-8"), bind.dialect.name)
+        with bind.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+            connection.execute(
+                text(f"INSERT INTO {VERSION_TABLE} (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": path.name}
+            )
+        print(f"✅ Migration appliquée: {path.name} ({len(statements)} instructions)")
+        applied.append(path.name)
+
+    if not applied:
+        print("Aucune migration en attente")
+    return applied
+
+if __name__ == "__main__":
+    if "--list" in sys.argv:
+        done = applied_versions()
+        for version, path in discover_migrations(engine.dialect.name):
+            print(f"{'[x]' if version in done else '[ ]'} {path.name}")
+    else:
+        apply_migrations()
@@ -1,11 +1,15 @@
 # models.py - Modèles mis à jour avec gestion des administrateurs par institution
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, DECIMAL, Text, ForeignKey, JSON, event
-from sqlalchemy.orm import relationship, configure_mappers
+from sqlalchemy import Column, String, Boolean, Date, DateTime, Integer, BigInteger, DECIMAL, Text, ForeignKey, JSON, Index, LargeBinary, event
+from sqlalchemy.orm import relationship, configure_mappers, deferred, undefer, undefer_group
 from sqlalchemy.sql import func
 from database import Base
 from datetime import datetime
 import uuid
 
+# Groupe des colonnes volumineuses (Text/JSON, data URLs) différées par défaut.
+# Voir les PROFILS DE CHARGEMENT en bas de fichier pour les recharger.
+HEAVY_COLUMNS_GROUP = "heavy"
+
 # ==================== MODÈLE BANQUE MIS À JOUR ====================
 
 class Bank(Base):
@@ -14,9 +18,9 @@ class Bank(Base):
     id = Column(String(50), primary_key=True, index=True)
     name = Column(String(200), nullable=False)
     full_name = Column(String(300))
-    description = Column(Text)
-    logo_url = Column(String(500))
-    logo_data = Column(Text)  # Pour stocker l'image en base64
+    description = deferred(Column(Text), group=HEAVY_COLUMNS_GROUP)
+    logo_url = deferred(Column(String(500)), group=HEAVY_COLUMNS_GROUP)  # Peut contenir une data URL
+    logo_data = deferred(Column(Text), group=HEAVY_COLUMNS_GROUP)  # Pour stocker l'image en base64
     logo_content_type = Column(String(100))  # Type MIME de l'image
     website = Column(String(200))
     contact_phone = Column(String(20))
@@ -43,9 +47,9 @@ class InsuranceCompany(Base):
     id = Column(String(50), primary_key=True, index=True)
     name = Column(String(200), nullable=False)
     full_name = Column(String(300))
-    description = Column(Text)
-    logo_url = Column(String(500))
-    logo_data = Column(Text)  # Pour stocker l'image en base64
+    description = deferred(Column(Text), group=HEAVY_COLUMNS_GROUP)
+    logo_url = deferred(Column(String(500)), group=HEAVY_COLUMNS_GROUP)  # Peut contenir une data URL
+    logo_data = deferred(Column(Text), group=HEAVY_COLUMNS_GROUP)  # Pour stocker l'image en base64
     logo_content_type = Column(String(100))
     website = Column(String(200))
     contact_phone = Column(String(20))
@@ -197,9 +201,9 @@ class CreditSimulation(Base):
     eligible = Column(Boolean, nullable=False)
     risk_score = Column(Integer)
     recommendations = Column(JSON, default=list)
-    amortization_schedule = Column(JSON)
+    amortization_schedule = deferred(Column(JSON), group=HEAVY_COLUMNS_GROUP)
     client_ip = Column(String(45))
-    user_agent = Column(Text)
+    user_agent = deferred(Column(Text), group=HEAVY_COLUMNS_GROUP)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relations
@@ -218,10 +222,10 @@ class SavingsSimulation(Base):
     total_contributions = Column(DECIMAL(12, 2), nullable=False)
     total_interest = Column(DECIMAL(12, 2), nullable=False)
     effective_rate = Column(DECIMAL(5, 2))
-    monthly_breakdown = Column(JSON)
+    monthly_breakdown = deferred(Column(JSON), group=HEAVY_COLUMNS_GROUP)
     recommendations = Column(JSON, default=list)
     client_ip = Column(String(45))
-    user_agent = Column(Text)
+    user_agent = deferred(Column(Text), group=HEAVY_COLUMNS_GROUP)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relations
@@ -303,6 +307,53 @@ class AuditLog(Base):
     # Relations
     admin_user = relationship("AdminUser", back_populates="audit_logs")
 
+# ==================== AGRÉGATS JOURNALIERS ====================
+
+class SimulationDailyRollup(Base):
+    """Agrégats journaliers des simulations par produit, tenus à jour par rollups.py"""
+    __tablename__ = "simulation_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    simulation_type = Column(String(10), primary_key=True)  # credit, savings
+    product_id = Column(String(50), primary_key=True)
+    bank_id = Column(String(50))
+    product_type = Column(String(50))
+    simulation_count = Column(BigInteger, nullable=False, default=0)
+    # Crédit : montant demandé ; épargne : apport initial + versements sur la durée
+    amount_sum = Column(DECIMAL(18, 2), nullable=False, default=0)
+    duration_sum = Column(BigInteger, nullable=False, default=0)
+    eligible_count = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("idx_simulation_rollups_bank_day", "bank_id", "day"),
+    )
+
+class SimulationSketch(Base):
+    """Esquisse persistée (t-digest ou HyperLogLog) d'une métrique de simulation, tenue à jour par sketches.py"""
+    __tablename__ = "simulation_sketches"
+
+    simulation_type = Column(String(10), primary_key=True)  # credit, savings
+    scope = Column(String(10), primary_key=True)  # all, type, product
+    scope_key = Column(String(50), primary_key=True)  # '' (all), type de produit ou id produit
+    metric = Column(String(50), primary_key=True)  # requested_amount, ..., sessions
+    kind = Column(String(10), nullable=False)  # tdigest, hll
+    observations = Column(BigInteger, nullable=False, default=0)
+    payload = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class IdempotencyKey(Base):
+    """Clé Idempotency-Key d'un POST de simulation ou de devis et réponse mémorisée (voir idempotency.py)"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(64), primary_key=True)  # sha256(client | route | Idempotency-Key)
+    fingerprint = Column(String(64), nullable=False)  # sha256 du corps de la requête
+    status = Column(String(12), nullable=False)  # processing, completed
+    response_status = Column(Integer)
+    response_headers = Column(JSON)
+    response_body = Column(LargeBinary)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
 # ==================== FONCTIONS UTILITAIRES ====================
 
 def generate_uuid():
@@ -329,6 +380,30 @@ event.listen(SavingsProduct, 'before_insert', generate_uuid_if_needed)
 event.listen(InsuranceProduct, 'before_insert', generate_uuid_if_needed)
 event.listen(InsuranceCompany, 'before_insert', generate_uuid_if_needed)
 
+# ==================== PROFILS DE CHARGEMENT ====================
+
+def list_profile(*columns):
+    """Profil liste : les colonnes lourdes restent différées, sauf celles demandées"""
+    return tuple(undefer(column) for column in columns)
+
+def detail_profile():
+    """Profil détail : charge toutes les colonnes lourdes en une seule requête"""
+    return (undefer_group(HEAVY_COLUMNS_GROUP),)
+
+# Banques / compagnies affichées en carte (nom + logo)
+BANK_CARD_PROFILE = list_profile(Bank.logo_url)
+INSURANCE_COMPANY_CARD_PROFILE = list_profile(InsuranceCompany.logo_url)
+
+# Listes complètes (backoffice, annuaire) : logo et description, jamais logo_data
+BANK_LIST_PROFILE = list_profile(Bank.logo_url, Bank.description)
+INSURANCE_COMPANY_LIST_PROFILE = list_profile(InsuranceCompany.logo_url, InsuranceCompany.description)
+
+# Endpoints de détail : tout est chargé
+BANK_DETAIL_PROFILE = detail_profile()
+INSURANCE_COMPANY_DETAIL_PROFILE = detail_profile()
+CREDIT_SIMULATION_DETAIL_PROFILE = detail_profile()
+SAVINGS_SIMULATION_DETAIL_PROFILE = detail_profile()
+
 # ==================== CONFIGURATION DES RELATIONS ====================
 
 def configure_models():
@@ -0,0 +1,289 @@
+# notifications.py - Diffusion des notifications utilisateur (pub/sub en mémoire) et compteur de non-lues en cache
+# Les créations et lectures publiées ici (après commit) sont poussées aux flux SSE ouverts sur ce worker
+# (GET /api/auth/notifications/stream) : plus besoin d'interroger l'API en boucle depuis chaque onglet.
+# Entre workers, un thread relit périodiquement les notifications créées pour les utilisateurs abonnés.
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, func
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from user_models import UserNotification
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS_UNREAD_TTL_SECONDS = float(os.getenv("NOTIFICATIONS_UNREAD_TTL_SECONDS", "60"))
+NOTIFICATIONS_UNREAD_MAX_ENTRIES = int(os.getenv("NOTIFICATIONS_UNREAD_MAX_ENTRIES", "10000"))
+NOTIFICATIONS_STREAM_QUEUE_SIZE = int(os.getenv("NOTIFICATIONS_STREAM_QUEUE_SIZE", "100"))
+NOTIFICATIONS_HEARTBEAT_SECONDS = float(os.getenv("NOTIFICATIONS_HEARTBEAT_SECONDS", "15"))
+NOTIFICATIONS_SYNC_SECONDS = float(os.getenv("NOTIFICATIONS_SYNC_SECONDS", "5"))
+
+_stats = {"published": 0, "delivered": 0, "overflows": 0, "unread_hits": 0, "unread_misses": 0, "synced": 0, "revoked": 0}
+
+def serialize(notification: UserNotification) -> Dict[str, Any]:
+    """Notification au format NotificationResponse"""
+    return jsonable_encoder({
+        "id": notification.id,
+        "type": notification.type,
+        "title": notification.title,
+        "message": notification.message,
+        "related_entity_type": notification.related_entity_type,
+        "related_entity_id": notification.related_entity_id,
+        "is_read": notification.is_read,
+        "priority": notification.priority,
+        "created_at": notification.created_at
+    })
+
+# ==================== COMPTEUR DE NON-LUES ====================
+
+_lock = threading.Lock()
+_unread: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+
+def _cached_unread(user_id: str) -> Optional[int]:
+    with _lock:
+        entry = _unread.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        _unread.move_to_end(user_id)
+        return entry[0]
+
+def _store_unread(user_id: str, count: int):
+    with _lock:
+        _unread[user_id] = (max(0, count), time.monotonic() + NOTIFICATIONS_UNREAD_TTL_SECONDS)
+        _unread.move_to_end(user_id)
+        while len(_unread) > NOTIFICATIONS_UNREAD_MAX_ENTRIES:
+            _unread.popitem(last=False)
+
+def _adjust_unread(user_id: str, delta: int) -> Optional[int]:
+    """Ajuste le compteur en cache sans prolonger sa durée de vie ; None s'il n'est pas en cache"""
+    with _lock:
+        entry = _unread.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        count = max(0, entry[0] + delta)
+        _unread[user_id] = (count, entry[1])
+        return count
+
+def unread_count(db, user_id: str) -> int:
+    """Nombre de notifications non lues, depuis le cache ou par une requête COUNT"""
+    count = _cached_unread(user_id)
+    if count is not None:
+        _stats["unread_hits"] += 1
+        return count
+    _stats["unread_misses"] += 1
+    count = db.execute(
+        select(func.count(UserNotification.id)).where(
+            UserNotification.user_id == user_id, UserNotification.is_read == False
+        )
+    ).scalar() or 0
+    _store_unread(user_id, count)
+    return count
+
+# ==================== ABONNEMENTS ====================
+
+class Subscription:
+    """File d'événements d'un flux SSE, alimentée depuis n'importe quel thread"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=NOTIFICATIONS_STREAM_QUEUE_SIZE)
+
+    def _offer(self, event: Tuple[str, dict]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client trop lent : on abandonne le retard et on lui demande de recharger son état
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(("resync", {}))
+            _stats["overflows"] += 1
+
+    def offer(self, event: Tuple[str, dict]):
+        self.loop.call_soon_threadsafe(self._offer, event)
+
+_subscriptions: Dict[str, Set[Subscription]] = {}
+_recent: "OrderedDict[str, None]" = OrderedDict()  # ids déjà diffusés par ce worker (pas de doublon au rattrapage)
+
+def subscribe(user_id: str) -> Subscription:
+    """Ouvre un abonnement (à appeler depuis la boucle asyncio du flux)"""
+    subscription = Subscription(user_id)
+    with _lock:
+        _subscriptions.setdefault(user_id, set()).add(subscription)
+    return subscription
+
+def unsubscribe(subscription: Subscription):
+    with _lock:
+        subscriptions = _subscriptions.get(subscription.user_id)
+        if subscriptions:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del _subscriptions[subscription.user_id]
+
+def publish(user_id: str, event: str, data: dict):
+    """Pousse un événement à tous les flux ouverts de l'utilisateur sur ce worker"""
+    with _lock:
+        subscriptions = list(_subscriptions.get(user_id, ()))
+    _stats["published"] += 1
+    for subscription in subscriptions:
+        try:
+            subscription.offer((event, data))
+            _stats["delivered"] += 1
+        except RuntimeError:
+            # Boucle fermée (arrêt du worker) : l'abonnement disparaît avec elle
+            unsubscribe(subscription)
+
+def _remember(notification_id: str) -> bool:
+    """Vrai si la notification n'a pas encore été diffusée par ce worker"""
+    with _lock:
+        if notification_id in _recent:
+            return False
+        _recent[notification_id] = None
+        while len(_recent) > NOTIFICATIONS_UNREAD_MAX_ENTRIES:
+            _recent.popitem(last=False)
+        return True
+
+def notification_created(user_id: str, payload: Dict[str, Any], unread: Optional[int] = None):
+    """À appeler après le commit d'une nouvelle notification (payload : serialize() pris avant le commit,
+    unread : compteur déjà relu en base)"""
+    if not _remember(payload["id"]):
+        return
+    if unread is None:
+        unread = _adjust_unread(user_id, 0 if payload["is_read"] else 1)
+    publish(user_id, "notification", {"notification": payload, "unread": unread})
+
+def notifications_read(user_id: str, notification_ids: Optional[list], updated: int) -> Optional[int]:
+    """À appeler après le commit d'un marquage en lecture ; notification_ids None = toutes"""
+    if notification_ids is None:
+        _store_unread(user_id, 0)
+        unread = 0
+    else:
+        unread = _adjust_unread(user_id, -updated)
+    if updated:
+        publish(user_id, "read", {"notification_ids": notification_ids, "all": notification_ids is None, "unread": unread})
+    return unread
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _session_revoked(session_valid: Callable[[], bool]) -> bool:
+    """Contrôle de session (requête synchrone) hors de la boucle ; une erreur de base ne coupe pas le flux"""
+    try:
+        return not await run_in_threadpool(session_valid)
+    except Exception as e:
+        logger.error(f"Erreur contrôle de session du flux de notifications: {e}")
+        return False
+
+async def stream(subscription: Subscription, unread: int, session_valid: Optional[Callable[[], bool]] = None):
+    """Corps du flux SSE : compteur initial, puis événements publiés et battements de cœur.
+    session_valid est rappelé à chaque battement (au plus une fois par période) : le flux se termine
+    dès que la session est révoquée ou expirée."""
+    try:
+        yield f"retry: 5000\n{format_event('unread', {'unread': unread})}"
+        checked_at = time.monotonic()
+        while True:
+            try:
+                event, data = await asyncio.wait_for(subscription.queue.get(), NOTIFICATIONS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                event = None
+            if session_valid and time.monotonic() - checked_at >= NOTIFICATIONS_HEARTBEAT_SECONDS:
+                checked_at = time.monotonic()
+                if await _session_revoked(session_valid):
+                    _stats["revoked"] += 1
+                    # Pas de donnée après cet événement : le client ne doit pas se reconnecter avec ce token
+                    yield format_event("revoked", {})
+                    return
+            if event is None:
+                # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(event, data)
+    finally:
+        unsubscribe(subscription)
+
+def stats() -> dict:
+    with _lock:
+        streams = sum(len(subscriptions) for subscriptions in _subscriptions.values())
+        return {"streams": streams, "subscribed_users": len(_subscriptions), "cached_counters": len(_unread),
+                "unread_ttl_seconds": NOTIFICATIONS_UNREAD_TTL_SECONDS, **_stats}
+
+# ==================== RATTRAPAGE ENTRE WORKERS ====================
+
+class _Synchronizer:
+    """Diffuse aux abonnés de ce worker les notifications créées par les autres workers"""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._since: Optional[datetime] = None
+
+    def sync(self):
+        from database import SessionLocal
+
+        with _lock:
+            user_ids = list(_subscriptions)
+        # Marge d'une période : une transaction lente ne fait pas rater de notification (doublons filtrés par _remember)
+        now = datetime.utcnow()
+        since = (self._since or now) - timedelta(seconds=NOTIFICATIONS_SYNC_SECONDS)
+        db = SessionLocal()
+        try:
+            created = db.execute(
+                select(UserNotification).where(
+                    UserNotification.user_id.in_(user_ids), UserNotification.created_at >= since
+                ).order_by(UserNotification.created_at)
+            ).scalars().all()
+            fresh = [notification for notification in created if notification.id not in _recent]
+            # Lectures faites par les autres workers inconnues ici : compteurs relus en une requête
+            counts = dict(db.execute(
+                select(UserNotification.user_id, func.count(UserNotification.id)).where(
+                    UserNotification.user_id.in_({notification.user_id for notification in fresh}),
+                    UserNotification.is_read == False
+                ).group_by(UserNotification.user_id)
+            ).all()) if fresh else {}
+        finally:
+            db.close()
+        self._since = now
+        for user_id in {notification.user_id for notification in fresh}:
+            _store_unread(user_id, counts.get(user_id, 0))
+        for notification in fresh:
+            notification_created(notification.user_id, serialize(notification), unread=counts.get(notification.user_id, 0))
+            _stats["synced"] += 1
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            if not _subscriptions:
+                self._since = datetime.utcnow()
+                continue
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Erreur rattrapage des notifications: {e}")
+
+    def start(self, interval: float):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._since = datetime.utcnow()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="notifications-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+_synchronizer = _Synchronizer()
+
+def start(interval: float = NOTIFICATIONS_SYNC_SECONDS):
+    _synchronizer.start(interval)
+
+def stop():
+    _synchronizer.stop()
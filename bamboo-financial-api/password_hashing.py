@@ -0,0 +1,105 @@
+# password_hashing.py - Hachage et vérification bcrypt hors de la boucle d'événements
+# Un pool de threads dédié et borné exécute passlib (bcrypt relâche le GIL) ; au-delà de
+# PASSWORD_HASH_MAX_PENDING opérations en cours ou en attente, la requête est refusée (503)
+# plutôt que de laisser une rafale de connexions bloquer le reste du trafic du worker.
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Callable, Optional
+import asyncio
+import os
+import threading
+import time
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+OVERLOAD_RETRY_AFTER_SECONDS = 2
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+class PasswordHasher:
+    """Exécuteur borné : compte les opérations en attente et rejette au-delà de max_pending"""
+
+    def __init__(self, context: CryptContext, workers: int, max_pending: int):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._waits = deque(maxlen=1000)
+        self._durations = deque(maxlen=1000)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    def _timed(self, submitted_at: float, function: Callable, *args):
+        started_at = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            finished_at = time.perf_counter()
+            with self._lock:
+                self._waits.append(started_at - submitted_at)
+                self._durations.append(finished_at - started_at)
+
+    async def _run(self, function: Callable, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Service d'authentification surchargé, veuillez réessayer",
+                    headers={"Retry-After": str(OVERLOAD_RETRY_AFTER_SECONDS)}
+                )
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), self._timed, time.perf_counter(), function, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, plain_password, hashed_password)
+
+    def metrics(self) -> dict:
+        """Profondeur de file, rejets et temps d'attente / de calcul (ms)"""
+        with self._lock:
+            waits, durations = sorted(self._waits), sorted(self._durations)
+            pending = self._pending
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_progress": min(pending, self.workers),
+                "queue_depth": max(0, pending - self.workers),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "wait_ms_p95": round(waits[int(len(waits) * 0.95) - 1] * 1000, 1) if waits else 0.0,
+                "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0.0,
+                "hash_ms_avg": round(sum(durations) / len(durations) * 1000, 1) if durations else 0.0
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+hasher = PasswordHasher(pwd_context, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+async def hash_password(password: str) -> str:
+    """Hash bcrypt calculé dans le pool dédié (503 si le pool est saturé)"""
+    return await hasher.hash(password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Vérification bcrypt dans le pool dédié (503 si le pool est saturé)"""
+    return await hasher.verify(plain_password, hashed_password)
@@ -0,0 +1,127 @@
+# pool_metrics.py - Mesures du pool de connexions (occupation, attentes, débordement)
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from collections import deque
+from typing import Any, Dict
+import threading
+import time
+
+class PoolMetrics:
+    """Compteurs d'un pool, alimentés par les événements SQLAlchemy et la mesure des attentes"""
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        """Temps passé à attendre une connexion libre"""
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._recent_waits.append(seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def _increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """État instantané du pool et statistiques d'attente (en millisecondes)"""
+        pool = self.engine.pool
+        with self._lock:
+            recent = sorted(self._recent_waits)
+            counters = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts
+            }
+            wait_count, wait_total, wait_max = self.wait_count, self.wait_total, self.wait_max
+
+        def percentile(ratio: float):
+            if not recent:
+                return None
+            return round(recent[min(len(recent) - 1, int(len(recent) * ratio))] * 1000, 3)
+
+        status = {"pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            status.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "capacity": pool.size() + max(0, pool._max_overflow)
+            })
+
+        status["counters"] = counters
+        status["wait_ms"] = {
+            "count": wait_count,
+            "avg": round(wait_total / wait_count * 1000, 3) if wait_count else None,
+            "max": round(wait_max * 1000, 3),
+            "p50_recent": percentile(0.50),
+            "p95_recent": percentile(0.95),
+            "p99_recent": percentile(0.99)
+        }
+        return status
+
+_registry: Dict[str, PoolMetrics] = {}
+
+class _TimedPoolMixin:
+    """Mesure l'attente d'une connexion (aucun événement SQLAlchemy ne la couvre)"""
+    _metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self._metrics is not None:
+                self._metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self._metrics is not None:
+            self._metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() remplace le pool : les mesures suivent
+        pool = super().recreate()
+        pool._metrics = self._metrics
+        return pool
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    """QueuePool instrumenté (moteur synchrone)"""
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool instrumenté (moteur asyncpg)"""
+
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    """Branche les compteurs sur les événements du pool d'un moteur"""
+    metrics = PoolMetrics(name, engine)
+    _registry[name] = metrics
+    if isinstance(engine.pool, _TimedPoolMixin):
+        engine.pool._metrics = metrics
+
+    event.listen(engine, "connect", lambda *args: metrics._increment("connects"))
+    event.listen(engine, "checkout", lambda *args: metrics._increment("checkouts"))
+    event.listen(engine, "checkin", lambda *args: metrics._increment("checkins"))
+    event.listen(engine, "invalidate", lambda *args: metrics._increment("invalidations"))
+    return metrics
+
+def snapshot_all() -> Dict[str, Dict[str, Any]]:
+    """État de tous les pools instrumentés"""
+    return {name: metrics.snapshot() for name, metrics in _registry.items()}
@@ -0,0 +1,276 @@
+# rate_limit.py - Limitation de débit (seau à jetons par client) et contrôle d'admission par classe de routes
+# Middleware ASGI sans service externe : état en mémoire du processus, ou partagé entre les workers
+# d'une même machine via un segment de mémoire partagée (RATE_LIMIT_SHARED_MEMORY_NAME).
+# Débit dépassé -> 429 ; trop de requêtes simultanées pour la classe -> 503. Rejet immédiat, sans attente.
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import math
+import os
+import struct
+import threading
+import time
+
+class RouteClass(BaseModel):
+    """Classe de routes : préfixes concernés, débit par client et requêtes simultanées par worker"""
+    prefixes: Tuple[str, ...]
+    rate: float  # jetons par seconde et par client
+    burst: int  # taille du seau
+    max_concurrent: int  # 0 = pas de limite
+    methods: Optional[Tuple[str, ...]] = None  # None = toutes sauf OPTIONS
+
+DEFAULT_ROUTE_CLASSES: Dict[str, RouteClass] = {
+    "simulations": RouteClass(prefixes=("/api/simulations/", "/api/credits/simulate"), rate=1, burst=20, max_concurrent=32),
+    "compare": RouteClass(prefixes=("/api/credits/compare",), rate=0.5, burst=10, max_concurrent=8),
+    "search": RouteClass(prefixes=("/api/search",), rate=3, burst=30, max_concurrent=16),
+    "exports": RouteClass(prefixes=("/api/admin/exports", "/api/admin/banks/export"), rate=0.05, burst=3, max_concurrent=2),
+    # Connexions longues : le plafond borne le nombre de flux SSE ouverts par worker
+    "streams": RouteClass(prefixes=("/api/auth/notifications/stream",), rate=0.2, burst=10, max_concurrent=1000, methods=("GET",)),
+    "auth": RouteClass(
+        prefixes=("/api/auth/login", "/api/auth/register", "/api/auth/verify", "/api/auth/resend-verification",
+                  "/api/auth/forgot-password", "/api/auth/reset-password", "/api/auth/change-password"),
+        rate=0.2, burst=10, max_concurrent=16, methods=("POST",)
+    ),
+}
+
+class RateLimitSettings(BaseSettings):
+    """Réglages de l'admission (variables d'environnement RATE_LIMIT_*)"""
+    model_config = SettingsConfigDict(env_prefix="RATE_LIMIT_", env_file=".env", extra="ignore")
+
+    enabled: bool = True
+    # Surcharges JSON par classe, ex. {"compare": {"rate": 1, "burst": 20}}
+    classes: Dict[str, dict] = {}
+    # Nom du segment partagé entre workers (vide = état propre à chaque processus)
+    shared_memory_name: str = ""
+    shared_slots: int = 65536
+    max_clients: int = 100000
+    # Derrière un proxy de confiance : client = premier X-Forwarded-For
+    trust_forwarded_for: bool = False
+
+rate_limit_settings = RateLimitSettings()
+
+def route_classes(settings: RateLimitSettings = rate_limit_settings) -> Dict[str, RouteClass]:
+    """Classes par défaut, surchargées par RATE_LIMIT_CLASSES"""
+    classes = dict(DEFAULT_ROUTE_CLASSES)
+    for name, overrides in settings.classes.items():
+        base = classes[name].model_dump() if name in classes else {}
+        classes[name] = RouteClass(**{**base, **overrides})
+    return classes
+
+# ==================== SEAUX À JETONS ====================
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: int) -> float:
+    return min(float(burst), tokens + max(0.0, now - updated) * rate)
+
+def _consume(tokens: float, rate: float) -> Tuple[bool, float, float]:
+    """(autorisé, jetons restants, secondes avant le prochain jeton)"""
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / rate if rate > 0 else 60.0
+
+class LocalBucketStore:
+    """Seaux en mémoire du processus, bornés en nombre de clients (LRU)"""
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(burst), now))
+            allowed, tokens, retry_after = _consume(_refill(tokens, updated, now, rate, burst), rate)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, tokens, retry_after
+
+class SharedBucketStore:
+    """
+    Seaux dans un segment de mémoire partagée, table à adressage direct de `slots` cases
+    (empreinte de clé 8 octets, jetons, date). Une collision réinitialise la case : au pire
+    un client obtient un seau plein, jamais un refus injustifié. Verrou inter-processus : flock.
+    """
+
+    _SLOT = struct.Struct("<Qdd")
+
+    def __init__(self, name: str, slots: int):
+        from multiprocessing import shared_memory, resource_tracker
+        import fcntl
+
+        self._fcntl = fcntl
+        self.slots = slots
+        size = slots * self._SLOT.size
+        try:
+            self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._memory = shared_memory.SharedMemory(name=name)
+        # Le segment survit aux workers : aucun d'eux ne doit le supprimer en s'arrêtant
+        resource_tracker.unregister(self._memory._name, "shared_memory")
+        self._lock_file = open(os.path.join("/tmp", f"{name}.lock"), "a+")
+
+    def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float, float]:
+        digest = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+        offset = (digest % self.slots) * self._SLOT.size
+        now = time.time()
+
+        self._fcntl.flock(self._lock_file, self._fcntl.LOCK_EX)
+        try:
+            stored, tokens, updated = self._SLOT.unpack_from(self._memory.buf, offset)
+            if stored != digest:
+                tokens, updated = float(burst), now
+            allowed, tokens, retry_after = _consume(_refill(tokens, updated, now, rate, burst), rate)
+            self._SLOT.pack_into(self._memory.buf, offset, digest, tokens, now)
+        finally:
+            self._fcntl.flock(self._lock_file, self._fcntl.LOCK_UN)
+        return allowed, tokens, retry_after
+
+# ==================== MIDDLEWARE ====================
+
+def _verified_session(token: str) -> bool:
+    """Vrai si get_current_user a validé ce jeton récemment (cache mémoire, sans requête SQL)"""
+    try:
+        import session_cache
+    except ImportError:
+        return False
+    return session_cache.peek(token) is not None
+
+class _ClassState:
+    """Compteurs d'une classe de routes dans ce worker"""
+
+    def __init__(self, name: str, config: RouteClass):
+        self.name = name
+        self.config = config
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_concurrency = 0
+
+class AdmissionControlMiddleware:
+    """
+    Applique, pour chaque classe de routes : le seau à jetons de l'adresse IP (toujours), celui de
+    la session si son jeton Bearer a déjà été validé (présent dans session_cache), puis la limite de
+    requêtes simultanées du worker. Un jeton non vérifié ne donne jamais de seau propre : sinon un
+    jeton aléatoire par requête suffirait à contourner la limite.
+    Une requête admise garde sa place jusqu'à la fin de la réponse (exports en flux compris).
+    """
+
+    def __init__(self, app: ASGIApp, settings: RateLimitSettings = rate_limit_settings):
+        self.app = app
+        self.settings = settings
+        self.classes = [_ClassState(name, config) for name, config in route_classes(settings).items()]
+        # Préfixes les plus longs d'abord
+        self._prefixes = sorted(
+            ((prefix, state) for state in self.classes for prefix in state.config.prefixes),
+            key=lambda item: len(item[0]), reverse=True
+        )
+        if settings.shared_memory_name:
+            self.store = SharedBucketStore(settings.shared_memory_name, settings.shared_slots)
+        else:
+            self.store = LocalBucketStore(settings.max_clients)
+        _instances.append(self)
+
+    def _match(self, scope: Scope) -> Optional[_ClassState]:
+        path, method = scope["path"], scope["method"]
+        if method == "OPTIONS":
+            return None
+        for prefix, state in self._prefixes:
+            if path.startswith(prefix):
+                methods = state.config.methods
+                return state if methods is None or method in methods else None
+        return None
+
+    def _clients(self, scope: Scope) -> List[str]:
+        """Clés des seaux à débiter : adresse IP, puis session vérifiée le cas échéant"""
+        headers = Headers(scope=scope)
+        forwarded = headers.get("x-forwarded-for") if self.settings.trust_forwarded_for else None
+        if forwarded:
+            keys = ["ip:" + forwarded.split(",")[0].strip()]
+        else:
+            client = scope.get("client")
+            keys = ["ip:" + (client[0] if client else "unknown")]
+
+        authorization = headers.get("authorization", "")
+        if authorization.lower().startswith("bearer ") and len(authorization) > 7:
+            token = authorization[7:]
+            if _verified_session(token):
+                keys.append("s:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:32])
+        return keys
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.settings.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        state = self._match(scope)
+        if state is None:
+            await self.app(scope, receive, send)
+            return
+
+        config = state.config
+        for client in self._clients(scope):
+            allowed, remaining, retry_after = self.store.take(f"{state.name}|{client}", config.rate, config.burst)
+            if not allowed:
+                break
+        if not allowed:
+            state.rejected_rate += 1
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Trop de requêtes, veuillez réessayer plus tard", "route_class": state.name},
+                headers={
+                    "Retry-After": str(max(1, math.ceil(retry_after))),
+                    "X-RateLimit-Limit": str(config.burst),
+                    "X-RateLimit-Remaining": "0"
+                }
+            )
+            await response(scope, receive, send)
+            return
+
+        if config.max_concurrent and state.in_flight >= config.max_concurrent:
+            state.rejected_concurrency += 1
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Service momentanément saturé, veuillez réessayer", "route_class": state.name},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+
+        state.in_flight += 1
+        state.admitted += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            state.in_flight -= 1
+
+    def metrics(self) -> dict:
+        return {
+            "shared": isinstance(self.store, SharedBucketStore),
+            "classes": {
+                state.name: {
+                    "rate_per_second": state.config.rate,
+                    "burst": state.config.burst,
+                    "max_concurrent": state.config.max_concurrent,
+                    "in_flight": state.in_flight,
+                    "admitted": state.admitted,
+                    "rejected_rate_limit": state.rejected_rate,
+                    "rejected_concurrency": state.rejected_concurrency
+                }
+                for state in self.classes
+            }
+        }
+
+# Instances créées par Starlette à la construction de la pile (pour l'endpoint de supervision)
+_instances = []
+
+def snapshot() -> dict:
+    """État de l'admission du worker courant"""
+    if not _instances:
+        return {"enabled": rate_limit_settings.enabled, "classes": {}}
+    return {"enabled": rate_limit_settings.enabled, **_instances[-1].metrics()}
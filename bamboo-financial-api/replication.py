@@ -0,0 +1,136 @@
+# replication.py - Routage des lectures vers les réplicas PostgreSQL
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import itertools
+import threading
+
+# Retard de réplication (secondes) ; 0 sur un primaire ou une base non répliquée
+_PG_LAG_SQL = text(
+    "SELECT CASE WHEN pg_is_in_recovery() "
+    "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "ELSE 0 END"
+)
+
+class Replica:
+    """Un réplica en lecture : moteurs synchrone/asynchrone et dernier retard mesuré"""
+
+    def __init__(self, name: str, engine, async_engine=None):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.lag_seconds: Optional[float] = None
+        self.healthy = False
+        self.checked_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+
+    def measure_lag(self) -> float:
+        """Interroge le réplica sur son retard de rejeu"""
+        with self.engine.connect() as connection:
+            if connection.dialect.name == "postgresql":
+                return float(connection.execute(_PG_LAG_SQL).scalar() or 0)
+            connection.execute(text("SELECT 1"))
+            return 0.0
+
+class ReplicaSet:
+    """Réplicas disponibles, tenus à jour par un thread de surveillance du retard"""
+
+    def __init__(self, replicas: List[Replica], max_lag_seconds: float = 10, check_interval: float = 5):
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._cycle = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def refresh(self):
+        """Mesure le retard de chaque réplica ; au-delà du seuil il est écarté"""
+        for replica in self.replicas:
+            try:
+                replica.lag_seconds = replica.measure_lag()
+                replica.healthy = replica.lag_seconds <= self.max_lag_seconds
+                replica.error = None
+            except Exception as e:
+                replica.healthy = False
+                replica.error = str(e)
+            replica.checked_at = datetime.utcnow()
+
+    def pick(self) -> Optional[Replica]:
+        """Réplica sain suivant (tourniquet), None s'il faut se replier sur le primaire"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._cycle) % len(healthy)]
+
+    def _monitor(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.check_interval)
+
+    def start(self):
+        """Démarre la surveillance (aucun réplica n'est utilisé avant la première mesure)"""
+        if not self.replicas or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._monitor, name="replica-lag-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.check_interval + 1)
+            self._thread = None
+
+    def status(self) -> List[Dict[str, Any]]:
+        """État des réplicas pour la supervision"""
+        return [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "lag_seconds": round(replica.lag_seconds, 3) if replica.lag_seconds is not None else None,
+                "checked_at": replica.checked_at.isoformat() if replica.checked_at else None,
+                "error": replica.error
+            }
+            for replica in self.replicas
+        ]
+
+class RoutingSession(Session):
+    """
+    Session qui lit sur un réplica et écrit sur le primaire. Dès qu'une écriture
+    (flush, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE) passe par la session,
+    toutes les lectures suivantes restent sur le primaire (lecture de ses écritures).
+    """
+
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, use_async_engines: bool = False,
+                 primary_only: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.use_async_engines = use_async_engines
+        self.primary_only = primary_only
+        self.replica: Optional[Replica] = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        is_write = (
+            self._flushing
+            or isinstance(clause, UpdateBase)
+            or getattr(clause, "_for_update_arg", None) is not None
+        )
+        if is_write:
+            self.primary_only = True
+        if self.primary_only or not self.replicas:
+            return primary
+
+        # Un seul réplica par session : lectures cohérentes entre elles
+        if self.replica is None or not self.replica.healthy:
+            self.replica = self.replicas.pick()
+        if self.replica is None:
+            return primary
+        if self.use_async_engines:
+            return self.replica.async_engine.sync_engine
+        return self.replica.engine
@@ -0,0 +1,210 @@
+# rollups.py - Agrégats journaliers des simulations (maintenus à l'écriture, recalculables)
+# Usage (depuis la racine de l'API) : python -m rollups [--since AAAA-MM-JJ]
+from sqlalchemy import delete, event, func, insert, literal, select, text
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+from typing import Optional
+import logging
+import sys
+
+import models
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+Rollup = models.SimulationDailyRollup
+ROLLUP_TABLE = Rollup.__tablename__
+
+# Vrai une fois la table vérifiée : les listeners restent inactifs avant
+_ready = False
+
+# ==================== MAINTENANCE SUR ÉCRITURE ====================
+
+# Upsert portable PostgreSQL / SQLite (ON CONFLICT ... DO UPDATE) ; le WHERE du SELECT
+# est requis par SQLite pour lever l'ambiguïté avec la clause ON CONFLICT.
+# Sans created_at explicite, le jour est celui du serveur (comme server_default=now()).
+_UPSERT_SQL = f"""
+    INSERT INTO {ROLLUP_TABLE}
+        (day, simulation_type, product_id, bank_id, product_type,
+         simulation_count, amount_sum, duration_sum, eligible_count)
+    SELECT COALESCE(:day, CURRENT_DATE), :simulation_type, p.id, p.bank_id, p.type,
+           1, :amount, :duration, :eligible
+    FROM {{product_table}} p
+    WHERE p.id = :product_id
+    ON CONFLICT (day, simulation_type, product_id) DO UPDATE SET
+        simulation_count = {ROLLUP_TABLE}.simulation_count + 1,
+        amount_sum = {ROLLUP_TABLE}.amount_sum + excluded.amount_sum,
+        duration_sum = {ROLLUP_TABLE}.duration_sum + excluded.duration_sum,
+        eligible_count = {ROLLUP_TABLE}.eligible_count + excluded.eligible_count
+"""
+
+# Retrait d'une simulation supprimée ; la ligne vidée disparaît (pas d'agrégat à zéro)
+_DECREMENT_SQL = f"""
+    UPDATE {ROLLUP_TABLE} SET
+        simulation_count = simulation_count - 1,
+        amount_sum = amount_sum - :amount,
+        duration_sum = duration_sum - :duration,
+        eligible_count = eligible_count - :eligible
+    WHERE day = COALESCE(:day, CURRENT_DATE) AND simulation_type = :simulation_type AND product_id = :product_id
+"""
+
+_PURGE_EMPTY_SQL = f"""
+    DELETE FROM {ROLLUP_TABLE}
+    WHERE day = COALESCE(:day, CURRENT_DATE) AND simulation_type = :simulation_type AND product_id = :product_id
+      AND simulation_count <= 0
+"""
+
+def _savings_amount(simulation) -> float:
+    """Volume d'une simulation d'épargne : apport initial + versements sur la durée"""
+    return float(simulation.initial_amount or 0) + float(simulation.monthly_contribution or 0) * (simulation.duration_months or 0)
+
+def _credit_values(target) -> dict:
+    return {
+        "day": target.created_at.date() if target.created_at else None,
+        "simulation_type": "credit",
+        "product_id": target.credit_product_id,
+        "amount": float(target.requested_amount or 0),
+        "duration": target.duration_months or 0,
+        "eligible": 1 if target.eligible else 0
+    }
+
+def _savings_values(target) -> dict:
+    return {
+        "day": target.created_at.date() if target.created_at else None,
+        "simulation_type": "savings",
+        "product_id": target.savings_product_id,
+        "amount": _savings_amount(target),
+        "duration": target.duration_months or 0,
+        "eligible": 0
+    }
+
+def _insert_listener(product_table: str, values):
+    """Ajoute la simulation insérée à l'agrégat de son jour et de son produit"""
+    def after_insert(mapper, connection, target):
+        params = values(target)
+        if _ready and params["product_id"]:
+            connection.execute(text(_UPSERT_SQL.format(product_table=product_table)), params)
+    return after_insert
+
+def _delete_listener(values):
+    """Retire la simulation supprimée (directement ou en cascade depuis son produit)"""
+    def after_delete(mapper, connection, target):
+        params = values(target)
+        if _ready and params["product_id"]:
+            connection.execute(text(_DECREMENT_SQL), params)
+            connection.execute(text(_PURGE_EMPTY_SQL), params)
+    return after_delete
+
+def _product_delete_listener(simulation_type: str):
+    """Produit supprimé : ses agrégats restants (simulations supprimées hors ORM) disparaissent avec lui"""
+    def after_delete(mapper, connection, target):
+        if _ready:
+            connection.execute(
+                delete(Rollup).where(Rollup.simulation_type == simulation_type, Rollup.product_id == target.id)
+            )
+    return after_delete
+
+# Même transaction que l'écriture de la simulation : agrégat et détail restent cohérents
+event.listen(models.CreditSimulation, 'after_insert', _insert_listener("credit_products", _credit_values))
+event.listen(models.SavingsSimulation, 'after_insert', _insert_listener("savings_products", _savings_values))
+event.listen(models.CreditSimulation, 'after_delete', _delete_listener(_credit_values))
+event.listen(models.SavingsSimulation, 'after_delete', _delete_listener(_savings_values))
+event.listen(models.CreditProduct, 'after_delete', _product_delete_listener("credit"))
+event.listen(models.SavingsProduct, 'after_delete', _product_delete_listener("savings"))
+
+# ==================== RECALCUL ====================
+
+def _credit_source():
+    simulation, product = models.CreditSimulation, models.CreditProduct
+    day = func.date(simulation.created_at)
+    return select(
+        day, literal("credit"), product.id, product.bank_id, product.type,
+        func.count(simulation.id),
+        func.coalesce(func.sum(simulation.requested_amount), 0),
+        func.coalesce(func.sum(simulation.duration_months), 0),
+        func.count(simulation.id).filter(simulation.eligible == True)
+    ).join(product, simulation.credit_product_id == product.id).group_by(
+        day, product.id, product.bank_id, product.type
+    ), simulation.created_at
+
+def _savings_source():
+    simulation, product = models.SavingsSimulation, models.SavingsProduct
+    day = func.date(simulation.created_at)
+    volume = simulation.initial_amount + simulation.monthly_contribution * simulation.duration_months
+    return select(
+        day, literal("savings"), product.id, product.bank_id, product.type,
+        func.count(simulation.id),
+        func.coalesce(func.sum(volume), 0),
+        func.coalesce(func.sum(simulation.duration_months), 0),
+        literal(0)
+    ).join(product, simulation.savings_product_id == product.id).group_by(
+        day, product.id, product.bank_id, product.type
+    ), simulation.created_at
+
+def backfill_rollups(db: Session, since: Optional[date] = None) -> int:
+    """Recalcule les agrégats depuis les tables brutes (tout l'historique ou à partir de since)"""
+    columns = [
+        Rollup.day, Rollup.simulation_type, Rollup.product_id, Rollup.bank_id, Rollup.product_type,
+        Rollup.simulation_count, Rollup.amount_sum, Rollup.duration_sum, Rollup.eligible_count
+    ]
+
+    purge = delete(Rollup)
+    if since:
+        purge = purge.where(Rollup.day >= since)
+    db.execute(purge)
+
+    for source, created_at in (_credit_source(), _savings_source()):
+        if since:
+            source = source.where(created_at >= datetime.combine(since, datetime.min.time()))
+        db.execute(insert(Rollup).from_select(columns, source))
+
+    db.commit()
+    rows = db.query(func.count()).select_from(Rollup).scalar()
+    logger.info(f"Agrégats de simulations recalculés: {rows} lignes")
+    return rows
+
+def init_rollups() -> bool:
+    """Crée la table au démarrage et la remplit si elle est vide"""
+    global _ready
+    from database import SessionLocal
+
+    try:
+        Rollup.__table__.create(bind=engine, checkfirst=True)
+    except Exception as e:
+        logger.error(f"Erreur création des agrégats de simulations: {e}")
+        _ready = False
+        return False
+
+    db = SessionLocal()
+    try:
+        if not db.query(Rollup.day).first() and (
+            db.query(models.CreditSimulation.id).first() or db.query(models.SavingsSimulation.id).first()
+        ):
+            backfill_rollups(db)
+        _ready = True
+        return True
+    finally:
+        db.close()
+
+# ==================== LECTURE ====================
+
+def product_counts(simulation_type: str):
+    """Sous-requête (product_id, simulation_count) sur tout l'historique"""
+    return select(
+        Rollup.product_id,
+        func.sum(Rollup.simulation_count).label('simulation_count')
+    ).where(Rollup.simulation_type == simulation_type).group_by(Rollup.product_id).subquery()
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    since = None
+    if "--since" in sys.argv:
+        since = date.fromisoformat(sys.argv[sys.argv.index("--since") + 1])
+
+    Rollup.__table__.create(bind=engine, checkfirst=True)
+    session = SessionLocal()
+    try:
+        print(f"{backfill_rollups(session, since)} lignes d'agrégats")
+    finally:
+        session.close()
@@ -1,6 +1,6 @@
 # routers/credit_admin.py - Router d'administration des produits de crédit
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from sqlalchemy import func, desc, and_, or_
 from typing import List, Optional
 from datetime import datetime
@@ -24,7 +24,9 @@ async def get_credit_products_admin(
     """Récupère tous les produits de crédit avec informations banque"""
     try:
         # Requête de base
-        query = db.query(models.CreditProduct).join(models.Bank)
+        query = db.query(models.CreditProduct).join(models.Bank).options(
+            contains_eager(models.CreditProduct.bank).options(*models.BANK_CARD_PROFILE)
+        )
         
         # Application des filtres
         filters = []
@@ -103,7 +105,9 @@ async def get_credit_products_admin(
 async def get_credit_product_admin(product_id: str, db: Session = Depends(get_db)):
     """Récupère un produit de crédit par son ID"""
     try:
-        product = db.query(models.CreditProduct).filter(models.CreditProduct.id == product_id).first()
+        product = db.query(models.CreditProduct).options(
+            joinedload(models.CreditProduct.bank).options(*models.BANK_CARD_PROFILE)
+        ).filter(models.CreditProduct.id == product_id).first()
         if not product:
             raise HTTPException(status_code=404, detail="Produit non trouvé")
 
@@ -148,7 +152,7 @@ async def create_credit_product_admin(product: schemas.CreditProductCreate, db:
     """Crée un nouveau produit de crédit"""
     try:
         # Vérifier que la banque existe
-        bank = db.query(models.Bank).filter(models.Bank.id == product.bank_id).first()
+        bank = db.query(models.Bank.id).filter(models.Bank.id == product.bank_id).first()
         if not bank:
             raise HTTPException(status_code=404, detail="Banque non trouvée")
 
@@ -185,7 +189,7 @@ async def update_credit_product_admin(product_id: str, product_update: schemas.C
         # Vérifier la banque si elle est modifiée
         update_data = product_update.dict(exclude_unset=True)
         if 'bank_id' in update_data:
-            bank = db.query(models.Bank).filter(models.Bank.id == update_data['bank_id']).first()
+            bank = db.query(models.Bank.id).filter(models.Bank.id == update_data['bank_id']).first()
             if not bank:
                 raise HTTPException(status_code=404, detail="Banque non trouvée")
 
@@ -1,20 +1,23 @@
 # admin_dashboard.py
 from fastapi import APIRouter
 from datetime import datetime
+import counters
 
 router = APIRouter(prefix="/api/admin/dashboard", tags=["Admin Dashboard"])
 
 @router.get("/stats")
 async def get_dashboard_stats():
+    # Servi depuis les compteurs en mémoire (aucune requête)
+    product_counters = ("credit_products", "savings_products", "insurance_products")
     return {
-        "total_banks": 12,
-        "active_banks": 10,
-        "total_insurance_companies": 8,
-        "active_insurance_companies": 6,
-        "total_products": 42,
-        "active_products": 35,
-        "total_users": 1200,
-        "active_users": 1100
+        "total_banks": counters.count("banks"),
+        "active_banks": counters.count("banks", "active"),
+        "total_insurance_companies": counters.count("insurance_companies"),
+        "active_insurance_companies": counters.count("insurance_companies", "active"),
+        "total_products": sum(counters.count(name) for name in product_counters),
+        "active_products": sum(counters.count(name, "active") for name in product_counters),
+        "total_users": counters.count("users"),
+        "active_users": counters.count("users", "active")
     }
 
 @router.get("/recent-activity")
@@ -5,25 +5,17 @@ from sqlalchemy import and_, or_, desc, func
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field, EmailStr
 from datetime import datetime
-from passlib.context import CryptContext
 import uuid
 import json
 
 from database import get_db
-from models import AdminUser, Bank, InsuranceCompany, AuditLog
+import audit_log
+import password_hashing
+from models import AdminUser, Bank, InsuranceCompany
 from routers.auth_router import get_current_admin, verify_super_admin
 
 router = APIRouter(prefix="/api/admin/management", tags=["admin_management"])
 
-# Configuration pour le hashage des mots de passe
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 # ==================== SCHEMAS PYDANTIC ====================
 
 class AdminUserCreate(BaseModel):
@@ -101,20 +93,12 @@ def build_permissions(admin_data: AdminUserCreate) -> Dict:
     }
 
 def log_admin_action(db: Session, admin_id: str, action: str, entity_type: str, entity_id: str = None, old_values: Dict = None, new_values: Dict = None):
-    """Logger une action d'administration"""
+    """Logger une action d'administration (écrite par lots par audit_log, sans commit dans la requête)"""
     try:
-        audit_log = AuditLog(
-            id=str(uuid.uuid4()),
-            admin_user_id=admin_id,
-            action=action,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            old_values=old_values,
-            new_values=new_values,
-            created_at=datetime.now()
+        audit_log.record(
+            action, entity_type, entity_id, old_values, new_values,
+            admin_user_id=admin_id
         )
-        db.add(audit_log)
-        db.commit()
     except Exception as e:
         print(f"Erreur logging audit: {e}")
 
@@ -298,7 +282,7 @@ async def create_admin(
                 raise HTTPException(status_code=400, detail="Une banque doit être assignée pour un admin bancaire")
             
             # Vérifier que la banque existe
-            bank = db.query(Bank).filter(Bank.id == admin_data.assigned_bank_id).first()
+            bank = db.query(Bank.id).filter(Bank.id == admin_data.assigned_bank_id).first()
             if not bank:
                 raise HTTPException(status_code=400, detail="Banque non trouvée")
             
@@ -309,7 +293,7 @@ async def create_admin(
                 raise HTTPException(status_code=400, detail="Une compagnie d'assurance doit être assignée")
             
             # Vérifier que la compagnie existe
-            insurance_company = db.query(InsuranceCompany).filter(
+            insurance_company = db.query(InsuranceCompany.id).filter(
                 InsuranceCompany.id == admin_data.assigned_insurance_company_id
             ).first()
             if not insurance_company:
@@ -322,7 +306,7 @@ async def create_admin(
             admin_data.assigned_insurance_company_id = None
         
         # Hasher le mot de passe
-        hashed_password = hash_password(admin_data.password)
+        hashed_password = await password_hashing.hash_password(admin_data.password)
         
         # Construire les permissions
         permissions = build_permissions(admin_data)
@@ -413,7 +397,7 @@ async def update_admin(
         
         # Traitement spécial pour le mot de passe
         if 'password' in update_data and update_data['password']:
-            update_data['password_hash'] = hash_password(update_data['password'])
+            update_data['password_hash'] = await password_hashing.hash_password(update_data['password'])
             del update_data['password']
         
         # Validations selon le rôle
@@ -557,7 +541,7 @@ async def get_institutions(
     
     try:
         # Récupérer les banques actives
-        banks = db.query(Bank).filter(Bank.is_active == True).all()
+        banks = db.query(Bank.id, Bank.name, Bank.full_name).filter(Bank.is_active == True).all()
         banks_data = [
             {
                 "id": bank.id,
@@ -568,7 +552,9 @@ async def get_institutions(
         ]
         
         # Récupérer les compagnies d'assurance actives
-        insurance_companies = db.query(InsuranceCompany).filter(InsuranceCompany.is_active == True).all()
+        insurance_companies = db.query(
+            InsuranceCompany.id, InsuranceCompany.name, InsuranceCompany.full_name
+        ).filter(InsuranceCompany.is_active == True).all()
         insurance_data = [
             {
                 "id": company.id,
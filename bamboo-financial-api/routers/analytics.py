@@ -0,0 +1,363 @@
+# routers/analytics.py - Version corrigée
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from sqlalchemy import Integer, cast, func, desc, and_
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import models
+import rollups
+import entity_stats
+import timeseries
+import sketches
+import os
+from database import get_read_db, wants_primary, ReadSessionLocal
+from single_flight import SingleFlight, normalize_key
+
+router = APIRouter()
+
+# Requêtes identiques simultanées regroupées, puis résultat servi ANALYTICS_CACHE_TTL_SECONDS (0 = sans cache)
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "30"))
+market_statistics_flight = SingleFlight("market_statistics", ttl=ANALYTICS_CACHE_TTL_SECONDS)
+banks_comparison_flight = SingleFlight("banks_comparison", ttl=ANALYTICS_CACHE_TTL_SECONDS)
+
+async def _run_with_read_session(function, primary_only: bool):
+    """Exécute function(db) dans le pool de threads avec sa propre session de lecture"""
+    def run():
+        db = ReadSessionLocal(primary_only=primary_only)
+        try:
+            return function(db)
+        finally:
+            db.close()
+    return await run_in_threadpool(run)
+
+def _market_statistics(db: Session) -> Dict[str, Any]:
+    """Statistiques du marché (exécuté hors de la boucle d'événements, une fois par groupe de requêtes)"""
+    # Statistiques des produits de crédit
+    credit_stats = db.query(
+        func.avg(models.CreditProduct.average_rate).label('avg_rate'),
+        func.min(models.CreditProduct.average_rate).label('min_rate'),
+        func.max(models.CreditProduct.average_rate).label('max_rate'),
+        func.count(models.CreditProduct.id).label('total_products')
+    ).filter(models.CreditProduct.is_active == True).first()
+    
+    # Trouver la banque avec le meilleur taux
+    best_rate_product = db.query(models.CreditProduct).join(models.Bank).filter(
+        models.CreditProduct.is_active == True,
+        models.Bank.is_active == True
+    ).order_by(models.CreditProduct.average_rate.asc()).first()
+    
+    # Temps de traitement moyen
+    avg_processing_time = db.query(
+        func.avg(models.CreditProduct.processing_time_hours).label('avg_time')
+    ).filter(models.CreditProduct.is_active == True).scalar() or 72
+    
+    # Nombre de banques actives
+    active_banks_count = db.query(models.Bank).filter(models.Bank.is_active == True).count()
+    
+    # Simulations récentes (7 derniers jours)
+    recent_date = datetime.now() - timedelta(days=7)
+    recent_simulations = db.query(models.CreditSimulation).filter(
+        models.CreditSimulation.created_at >= recent_date
+    ).count()
+    
+    # Construction de la réponse avec conversion des types
+    response_data = {
+        "average_rate": float(credit_stats.avg_rate) if credit_stats.avg_rate else 0.0,
+        "trend": -0.2,  # Simulation d'une tendance
+        "best_rate": float(credit_stats.min_rate) if credit_stats.min_rate else 0.0,
+        "best_rate_bank": best_rate_product.bank.name if best_rate_product and best_rate_product.bank else "N/A",
+        "worst_rate": float(credit_stats.max_rate) if credit_stats.max_rate else 0.0,
+        "average_processing_time": int(avg_processing_time),
+        "total_products": int(credit_stats.total_products) if credit_stats.total_products else 0,
+        "active_banks": active_banks_count,
+        "recent_simulations": recent_simulations,
+        "last_updated": datetime.now().isoformat(),
+        "market_health": "stable",
+        "recommendations": [
+            "Les taux sont stables",
+            "Bonne diversité d'offres disponibles",
+            "Temps de traitement dans la moyenne"
+        ]
+    }
+    
+    return response_data
+
+@router.get("/market-statistics")
+async def get_market_statistics(request: Request):
+    """Récupère les statistiques du marché financier"""
+    primary_only = wants_primary(request)
+    try:
+        # Une erreur est transmise à toutes les requêtes regroupées et n'est jamais mise en cache
+        return await market_statistics_flight.do(
+            normalize_key(primary_only), lambda: _run_with_read_session(_market_statistics, primary_only)
+        )
+        
+    except Exception as e:
+        print(f"Erreur dans get_market_statistics: {str(e)}")
+        # Retour de données par défaut en cas d'erreur
+        return {
+            "average_rate": 8.5,
+            "trend": 0.0,
+            "best_rate": 6.5,
+            "best_rate_bank": "BGFI Bank",
+            "worst_rate": 12.0,
+            "average_processing_time": 72,
+            "total_products": 10,
+            "active_banks": 5,
+            "recent_simulations": 0,
+            "last_updated": datetime.now().isoformat(),
+            "market_health": "stable",
+            "recommendations": ["Données par défaut - Erreur API"]
+        }
+
+def _banks_comparison(db: Session) -> Dict[str, Any]:
+    """Comparaison des banques (exécutée hors de la boucle d'événements, une fois par groupe de requêtes)"""
+    try:
+        banks_data = []
+        
+        banks = db.query(models.Bank).options(*models.BANK_CARD_PROFILE).filter(
+            models.Bank.is_active == True
+        ).all()
+        
+        # Compteurs et moyennes de toutes les banques en requêtes groupées
+        bank_ids = [bank.id for bank in banks]
+        averages = entity_stats.bank_product_averages(db, bank_ids)
+        recent = entity_stats.bank_simulation_counts(db, bank_ids, since=(datetime.now() - timedelta(days=30)).date())
+        total_credit_products = db.query(models.CreditProduct).filter(models.CreditProduct.is_active == True).count()
+        
+        for bank in banks:
+            stats = averages[bank.id]
+            avg_processing_time = stats["average_processing_time"]
+            
+            bank_data = {
+                "id": bank.id,
+                "name": bank.name,
+                "logo_url": bank.logo_url,
+                "credit_products_count": stats["credit_products_count"],
+                "savings_products_count": stats["savings_products_count"],
+                "average_credit_rate": round(stats["average_credit_rate"], 2),
+                "average_savings_rate": round(stats["average_savings_rate"], 2),
+                "average_processing_time": int(avg_processing_time) if avg_processing_time is not None else 72,
+                "recent_simulations": recent.get(bank.id, {}).get("credit", 0),
+                "market_share": round(stats["credit_products_count"] / max(1, total_credit_products) * 100, 1),
+                "rating": bank.rating or "N/A"
+            }
+            banks_data.append(bank_data)
+        
+        # Tri par nombre de produits
+        banks_data.sort(key=lambda x: x["credit_products_count"] + x["savings_products_count"], reverse=True)
+        
+        return {
+            "banks": banks_data,
+            "total_banks": len(banks_data),
+            "last_updated": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        print(f"Erreur dans get_banks_comparison: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la comparaison des banques: {str(e)}")
+
+@router.get("/banks-comparison")
+async def get_banks_comparison(request: Request):
+    """Compare les performances des banques"""
+    primary_only = wants_primary(request)
+    return await banks_comparison_flight.do(
+        normalize_key(primary_only), lambda: _run_with_read_session(_banks_comparison, primary_only)
+    )
+
+@router.get("/products-performance")
+async def get_products_performance(product_type: str = None, db: Session = Depends(get_read_db)):
+    """Analyse des performances des produits"""
+    try:
+        performance_data = []
+        
+        if not product_type or product_type == "credit":
+            # Produits de crédit les plus populaires (compteurs lus dans les agrégats)
+            credit_counts = rollups.product_counts("credit")
+            credit_query = db.query(
+                models.CreditProduct.id,
+                models.CreditProduct.name,
+                models.CreditProduct.type,
+                models.CreditProduct.average_rate,
+                models.Bank.name.label('bank_name'),
+                func.coalesce(credit_counts.c.simulation_count, 0).label('simulation_count')
+            ).join(models.Bank).outerjoin(
+                credit_counts, credit_counts.c.product_id == models.CreditProduct.id
+            ).filter(
+                models.CreditProduct.is_active == True
+            ).order_by(desc('simulation_count')).limit(10)
+            
+            for row in credit_query.all():
+                performance_data.append({
+                    "id": row.id,
+                    "name": row.name,
+                    "type": row.type,
+                    "category": "credit",
+                    "rate": float(row.average_rate),
+                    "bank_name": row.bank_name,
+                    "popularity_score": int(row.simulation_count) if row.simulation_count else 0,
+                    "performance_indicator": "simulations"
+                })
+        
+        if not product_type or product_type == "savings":
+            # Produits d'épargne
+            savings_counts = rollups.product_counts("savings")
+            savings_query = db.query(
+                models.SavingsProduct.id,
+                models.SavingsProduct.name,
+                models.SavingsProduct.type,
+                models.SavingsProduct.interest_rate,
+                models.Bank.name.label('bank_name'),
+                func.coalesce(savings_counts.c.simulation_count, 0).label('simulation_count')
+            ).join(models.Bank).outerjoin(
+                savings_counts, savings_counts.c.product_id == models.SavingsProduct.id
+            ).filter(
+                models.SavingsProduct.is_active == True
+            ).order_by(desc('simulation_count')).limit(10)
+            
+            for row in savings_query.all():
+                performance_data.append({
+                    "id": row.id,
+                    "name": row.name,
+                    "type": row.type,
+                    "category": "savings",
+                    "rate": float(row.interest_rate),
+                    "bank_name": row.bank_name,
+                    "popularity_score": int(row.simulation_count) if row.simulation_count else 0,
+                    "performance_indicator": "simulations"
+                })
+        
+        return {
+            "products": performance_data,
+            "total_products": len(performance_data),
+            "filter_applied": product_type or "all",
+            "last_updated": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        print(f"Erreur dans get_products_performance: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse des performances: {str(e)}")
+
+@router.get("/trends")
+async def get_trends(
+    period_days: int = Query(30, ge=1, le=3650),
+    granularity: Optional[str] = Query(None, regex=timeseries.GRANULARITY_PATTERN),
+    max_points: int = Query(timeseries.DEFAULT_MAX_POINTS, ge=2, le=366),
+    db: Session = Depends(get_read_db)
+):
+    """Analyse des tendances sur une période donnée"""
+    try:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=period_days)
+        Rollup = models.SimulationDailyRollup
+        
+        # Tendances des simulations : un point par créneau (vides inclus), au plus max_points
+        granularity, simulations_by_day = timeseries.series(
+            db, Rollup.day, {"count": cast(func.sum(Rollup.simulation_count), Integer)},
+            start_date, end_date, granularity=granularity, max_points=max_points,
+            filters=(Rollup.simulation_type == "credit",)
+        )
+        total_simulations = sum(point["count"] for point in simulations_by_day)
+        
+        # Types de crédit les plus demandés et montants moyens demandés
+        by_type = db.query(
+            Rollup.product_type.label('type'),
+            func.sum(Rollup.simulation_count).label('count'),
+            func.sum(Rollup.amount_sum).label('amount_sum')
+        ).filter(
+            Rollup.simulation_type == "credit",
+            Rollup.day >= start_date.date()
+        ).group_by(Rollup.product_type).order_by(desc('count')).all()
+        
+        popular_types = by_type[:5]
+        avg_amounts = [
+            {"type": row.type, "avg_amount": float(row.amount_sum or 0) / row.count if row.count else 0}
+            for row in by_type
+        ]
+        
+        trends_data = {
+            "period_days": period_days,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "granularity": granularity,
+            "simulations_trend": [
+                {
+                    "date": point["bucket"].isoformat(),
+                    "count": point["count"]
+                }
+                for point in simulations_by_day
+            ],
+            "popular_credit_types": [
+                {
+                    "type": row.type,
+                    "requests_count": int(row.count)
+                }
+                for row in popular_types
+            ],
+            "average_amounts_by_type": [
+                {
+                    "type": row["type"],
+                    "average_amount": row["avg_amount"]
+                }
+                for row in avg_amounts
+            ],
+            "total_simulations": total_simulations,
+            "insights": [
+                f"Total de {total_simulations} simulations sur {period_days} jours",
+                f"Type le plus demandé: {popular_types[0].type if popular_types else 'N/A'}",
+                f"Activité quotidienne moyenne: {round(total_simulations / max(1, period_days), 1)} simulations"
+            ]
+        }
+        
+        return trends_data
+        
+    except Exception as e:
+        print(f"Erreur dans get_trends: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse des tendances: {str(e)}")
+
+@router.get("/demand-distribution")
+async def get_demand_distribution(
+    simulation_type: str = Query("credit", regex="^(credit|savings)$"),
+    product_id: Optional[str] = Query(None),
+    product_type: Optional[str] = Query(None)
+):
+    """Médiane / p90 des montants, durées et revenus simulés, et visiteurs uniques (esquisses, temps constant)"""
+    try:
+        if product_id:
+            scope, scope_key = "product", product_id
+        elif product_type:
+            scope, scope_key = "type", product_type
+        else:
+            scope, scope_key = "all", ""
+
+        distribution = sketches.distribution(simulation_type, scope, scope_key)
+        return {
+            "simulation_type": simulation_type,
+            "scope": scope,
+            "scope_key": scope_key or None,
+            "metrics": distribution["metrics"],
+            "unique_visitors": distribution["unique_sessions"],
+            "approximate": True,
+            "last_updated": distribution["loaded_at"]
+        }
+
+    except Exception as e:
+        print(f"Erreur dans get_demand_distribution: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse de la demande: {str(e)}")
+
+@router.get("/test")
+async def test_analytics_endpoint():
+    """Test de fonctionnement du router analytics"""
+    return {
+        "status": "OK", 
+        "message": "Analytics router fonctionne correctement",
+        "timestamp": datetime.now().isoformat(),
+        "available_endpoints": [
+            "/market-statistics",
+            "/banks-comparison", 
+            "/products-performance",
+            "/trends",
+            "/demand-distribution"
+        ]
+    }
\ No newline at end of file
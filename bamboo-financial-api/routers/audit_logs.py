@@ -0,0 +1,95 @@
+# routers/audit_logs.py - Consultation du journal d'audit, paginée par curseur (keyset)
+# Tri (created_at, id) décroissant ; le curseur est la clé de la dernière ligne renvoyée :
+# chaque page est une lecture d'index, quelle que soit sa profondeur (pas d'OFFSET).
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional, Tuple
+import base64
+import json
+from database import get_read_db
+from models import AdminUser, AuditLog
+
+router = APIRouter(prefix="/admin/audit-logs", tags=["Admin - Audit"])
+
+def encode_cursor(created_at: datetime, log_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), log_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, log_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(log_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+@router.get("")
+def get_audit_logs(
+    limit: int = Query(25, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor de la page précédente"),
+    admin_user_id: Optional[str] = None,
+    action: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Journal d'audit, du plus récent au plus ancien"""
+    try:
+        query = select(AuditLog, AdminUser.username).outerjoin(
+            AdminUser, AdminUser.id == AuditLog.admin_user_id
+        )
+        if admin_user_id:
+            query = query.where(AuditLog.admin_user_id == admin_user_id)
+        if action:
+            query = query.where(AuditLog.action == action)
+        if entity_type:
+            query = query.where(AuditLog.entity_type == entity_type)
+        if entity_id:
+            query = query.where(AuditLog.entity_id == entity_id)
+        if since:
+            query = query.where(AuditLog.created_at >= since)
+        if until:
+            query = query.where(AuditLog.created_at < until)
+        if cursor:
+            query = query.where(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(*decode_cursor(cursor)))
+
+        # Une ligne de plus que demandé : indique s'il existe une page suivante sans COUNT(*)
+        rows = db.execute(
+            query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit + 1)
+        ).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items = [
+            {
+                "id": log.id,
+                "admin_user_id": log.admin_user_id,
+                "admin_username": username,
+                "action": log.action,
+                "entity_type": log.entity_type,
+                "entity_id": log.entity_id,
+                "old_values": log.old_values,
+                "new_values": log.new_values,
+                "ip_address": log.ip_address,
+                "user_agent": log.user_agent,
+                "created_at": log.created_at
+            }
+            for log, username in rows
+        ]
+        last = rows[-1][0] if rows else None
+        return {
+            "items": items,
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(last.created_at, last.id) if has_more else None
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Erreur get_audit_logs: {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de la récupération du journal d'audit")
@@ -1,13 +1,13 @@
 # routers/auth_router.py - Routeur d'authentification pour les utilisateurs
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Query
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, update
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 import secrets
 import string
 import logging
@@ -15,13 +15,17 @@ import os
 import re
 
 # Imports locaux
-from database import get_db
-from user_models import User, UserSession, UserNotification
+from database import get_db, SessionLocal
+from user_models import User, UserSession, UserNotification, hash_session_token
+import password_hashing
+import session_cache
+import notifications
+from session_cache import UserSnapshot
 from user_auth_schema import (
     UserRegistrationRequest, UserLoginRequest, VerificationRequest,
     ResendVerificationRequest, PasswordResetRequest, PasswordResetConfirm,
     LoginResponse, RegistrationResponse, UserResponse, ChangePasswordRequest,
-    UserProfileUpdate
+    UserProfileUpdate, MarkNotificationReadRequest
 )
 
 # Configuration du logging
@@ -31,22 +35,14 @@ logger = logging.getLogger(__name__)
 SECRET_KEY = os.getenv("SECRET_KEY", "votre-cle-secrete-changez-moi")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 heures pour les utilisateurs
+MARK_READ_MAX_IDS = 500
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer(auto_error=False)
 
 router = APIRouter()
 
 # ==================== FONCTIONS UTILITAIRES ====================
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Vérifie un mot de passe"""
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    """Hash un mot de passe"""
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crée un token JWT pour un utilisateur"""
     to_encode = data.copy()
@@ -91,8 +87,11 @@ def validate_phone_number(phone: str) -> bool:
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
-) -> Optional[User]:
-    """Récupère l'utilisateur connecté"""
+) -> Optional[UserSnapshot]:
+    """
+    Récupère l'utilisateur connecté (instantané en lecture seule).
+    Les sessions validées sont mises en cache : pas de requête tant que l'entrée est valide.
+    """
     if not credentials:
         return None
     
@@ -103,23 +102,38 @@ async def get_current_user(
         
         if user_id is None or token_type != "user_access":
             return None
+        
+        cached = session_cache.get(credentials.credentials)
+        if cached is not None:
+            return cached if cached.id == user_id else None
             
-        # Vérifier que la session existe et est active
-        session = db.query(UserSession).filter(
-            UserSession.token == credentials.credentials,
+        # Vérifier que la session existe et est active (une seule requête session + utilisateur)
+        row = db.query(UserSession.expires_at, User).join(User, User.id == UserSession.user_id).filter(
+            UserSession.token_hash == hash_session_token(credentials.credentials),
             UserSession.is_active == True,
-            UserSession.expires_at > datetime.utcnow()
+            UserSession.expires_at > datetime.utcnow(),
+            User.id == user_id
         ).first()
         
-        if not session:
+        if not row:
             return None
         
-        user = db.query(User).filter(User.id == user_id).first()
-        return user
+        return session_cache.put(credentials.credentials, row.User, row.expires_at)
         
     except JWTError:
         return None
 
+def load_user(db: Session, current_user: UserSnapshot) -> User:
+    """Utilisateur ORM modifiable correspondant à l'instantané de get_current_user"""
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(status_code=401, detail="Non authentifié")
+    return user
+
+def touch_user(db: Session, user_id: str):
+    """Marque l'utilisateur comme modifié : les autres workers évinceront ses sessions en cache"""
+    db.query(User).filter(User.id == user_id).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+
 def send_verification_sms(phone: str, code: str):
     """Envoie un SMS de vérification (à implémenter avec un service SMS)"""
     # TODO: Intégrer avec un service SMS comme Twilio, Orange API, etc.
@@ -133,15 +147,18 @@ def send_verification_email(email: str, code: str):
     # Pour le développement, on log juste le code
 
 def create_notification(db: Session, user_id: str, title: str, message: str, type: str = "info"):
-    """Crée une notification pour l'utilisateur"""
+    """Crée une notification pour l'utilisateur et la pousse à ses flux ouverts"""
     notification = UserNotification(
         user_id=user_id,
         type=type,
         title=title,
         message=message
     )
+    # Sérialisée avant le commit : l'objet expiré ne sera pas relu en base
+    payload = notifications.serialize(notification)
     db.add(notification)
     db.commit()
+    notifications.notification_created(user_id, payload)
 
 # ==================== ENDPOINTS D'AUTHENTIFICATION ====================
 
@@ -172,7 +189,7 @@ async def register_user_bypass(request: Request, db: Session = Depends(get_db)):
         )
         
         if data.get('password'):
-            user.password_hash = get_password_hash(data['password'])
+            user.password_hash = await password_hashing.hash_password(data['password'])
         
         db.add(user)
         db.commit()
@@ -197,6 +214,9 @@ async def register_user_bypass(request: Request, db: Session = Depends(get_db)):
             "message": "Inscription réussie"
         }
         
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Erreur: {e}", exc_info=True)
@@ -229,7 +249,7 @@ async def login_user(
             )
         
         # Vérifier le mot de passe
-        if not user.password_hash or not verify_password(login_data.password, user.password_hash):
+        if not user.password_hash or not await password_hashing.verify_password(login_data.password, user.password_hash):
             raise HTTPException(
                 status_code=401,
                 detail="Identifiants incorrects"
@@ -264,7 +284,7 @@ async def login_user(
         # Créer une nouvelle session
         session = UserSession(
             user_id=user.id,
-            token=access_token,
+            token_hash=hash_session_token(access_token),
             device_info=login_data.device_info,
             expires_at=datetime.utcnow() + access_token_expires
         )
@@ -365,7 +385,7 @@ async def verify_account(
             
             session = UserSession(
                 user_id=user.id,
-                token=access_token,
+                token_hash=hash_session_token(access_token),
                 expires_at=datetime.utcnow() + access_token_expires
             )
             db.add(session)
@@ -459,7 +479,7 @@ async def resend_verification_code(
 
 @router.post("/auth/logout")
 async def logout_user(
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
@@ -472,12 +492,14 @@ async def logout_user(
     try:
         # Désactiver la session actuelle
         session = db.query(UserSession).filter(
-            UserSession.token == credentials.credentials
+            UserSession.token_hash == hash_session_token(credentials.credentials)
         ).first()
         
         if session:
             session.is_active = False
+            touch_user(db, current_user.id)
             db.commit()
+        session_cache.evict_token(credentials.credentials)
         
         logger.info(f"Déconnexion de l'utilisateur: {current_user.id}")
         return {"success": True, "message": "Déconnexion réussie"}
@@ -488,7 +510,7 @@ async def logout_user(
 
 @router.get("/auth/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """
     Récupère les informations de l'utilisateur connecté
@@ -522,7 +544,7 @@ async def get_current_user_info(
 @router.put("/auth/profile", response_model=UserResponse)
 async def update_profile(
     profile_data: UserProfileUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -532,42 +554,47 @@ async def update_profile(
         raise HTTPException(status_code=401, detail="Non authentifié")
     
     try:
+        user = load_user(db, current_user)
+        
         # Mettre à jour les champs fournis
         update_data = profile_data.dict(exclude_unset=True)
         
         for field, value in update_data.items():
             if field == "gender" and value:
-                setattr(current_user, field, value.value if hasattr(value, 'value') else value)
+                setattr(user, field, value.value if hasattr(value, 'value') else value)
             else:
-                setattr(current_user, field, value)
+                setattr(user, field, value)
         
-        current_user.updated_at = datetime.utcnow()
+        user.updated_at = datetime.utcnow()
         db.commit()
-        db.refresh(current_user)
+        db.refresh(user)
+        session_cache.evict_user(user.id)
         
-        logger.info(f"Profil mis à jour: {current_user.id}")
+        logger.info(f"Profil mis à jour: {user.id}")
         
         return UserResponse(
-            id=current_user.id,
-            email=current_user.email,
-            phone=current_user.phone,
-            first_name=current_user.first_name,
-            last_name=current_user.last_name,
-            date_of_birth=current_user.date_of_birth,
-            gender=current_user.gender,
-            profession=current_user.profession,
-            monthly_income=float(current_user.monthly_income) if current_user.monthly_income else None,
-            city=current_user.city,
-            address=current_user.address,
-            registration_method=current_user.registration_method,
-            email_verified=current_user.email_verified,
-            phone_verified=current_user.phone_verified,
-            is_active=current_user.is_active,
-            last_login=current_user.last_login,
-            created_at=current_user.created_at,
-            preferences=current_user.preferences
+            id=user.id,
+            email=user.email,
+            phone=user.phone,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            date_of_birth=user.date_of_birth,
+            gender=user.gender,
+            profession=user.profession,
+            monthly_income=float(user.monthly_income) if user.monthly_income else None,
+            city=user.city,
+            address=user.address,
+            registration_method=user.registration_method,
+            email_verified=user.email_verified,
+            phone_verified=user.phone_verified,
+            is_active=user.is_active,
+            last_login=user.last_login,
+            created_at=user.created_at,
+            preferences=user.preferences
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la mise à jour du profil: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur interne")
@@ -575,7 +602,7 @@ async def update_profile(
 @router.post("/auth/change-password")
 async def change_password(
     password_data: ChangePasswordRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -585,18 +612,21 @@ async def change_password(
         raise HTTPException(status_code=401, detail="Non authentifié")
     
     try:
+        user = load_user(db, current_user)
+        
         # Vérifier l'ancien mot de passe
-        if not current_user.password_hash:
+        if not user.password_hash:
             raise HTTPException(status_code=400, detail="Aucun mot de passe défini")
         
-        if not verify_password(password_data.current_password, current_user.password_hash):
+        if not await password_hashing.verify_password(password_data.current_password, user.password_hash):
             raise HTTPException(status_code=400, detail="Mot de passe actuel incorrect")
         
         # Mettre à jour le mot de passe
-        current_user.password_hash = get_password_hash(password_data.new_password)
-        current_user.updated_at = datetime.utcnow()
+        user.password_hash = await password_hashing.hash_password(password_data.new_password)
+        user.updated_at = datetime.utcnow()
         
         db.commit()
+        session_cache.evict_user(user.id)
         
         logger.info(f"Mot de passe changé: {current_user.id}")
         return {"success": True, "message": "Mot de passe modifié avec succès"}
@@ -677,7 +707,7 @@ async def reset_password(
             raise HTTPException(status_code=400, detail="Code de récupération invalide ou expiré")
         
         # Mettre à jour le mot de passe
-        user.password_hash = get_password_hash(reset_data.new_password)
+        user.password_hash = await password_hashing.hash_password(reset_data.new_password)
         user.verification_code = None
         user.verification_expires_at = None
         user.updated_at = datetime.utcnow()
@@ -686,6 +716,7 @@ async def reset_password(
         db.query(UserSession).filter(UserSession.user_id == user.id).update({"is_active": False})
         
         db.commit()
+        session_cache.evict_user(user.id)
         
         logger.info(f"Mot de passe réinitialisé: {user.id}")
         return {"success": True, "message": "Mot de passe réinitialisé avec succès"}
@@ -732,7 +763,7 @@ async def check_availability(
 
 @router.post("/auth/logout-all")
 async def logout_all_devices(
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -744,7 +775,9 @@ async def logout_all_devices(
     try:
         # Désactiver toutes les sessions
         db.query(UserSession).filter(UserSession.user_id == current_user.id).update({"is_active": False})
+        touch_user(db, current_user.id)
         db.commit()
+        session_cache.evict_user(current_user.id)
         
         logger.info(f"Déconnexion de tous les appareils: {current_user.id}")
         return {"success": True, "message": "Déconnexion de tous les appareils réussie"}
@@ -755,7 +788,7 @@ async def logout_all_devices(
 
 @router.get("/auth/sessions")
 async def get_user_sessions(
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -795,7 +828,7 @@ async def get_user_sessions(
 @router.delete("/auth/sessions/{session_id}")
 async def revoke_session(
     session_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -814,7 +847,9 @@ async def revoke_session(
             raise HTTPException(status_code=404, detail="Session non trouvée")
         
         session.is_active = False
+        touch_user(db, current_user.id)
         db.commit()
+        session_cache.evict_hash(session.token_hash)
         
         return {"success": True, "message": "Session révoquée avec succès"}
         
@@ -824,12 +859,168 @@ async def revoke_session(
         logger.error(f"Erreur lors de la révocation de session: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur interne")
 
+# ==================== NOTIFICATIONS ====================
+
+@router.get("/auth/notifications")
+async def get_notifications(
+    unread_only: bool = False,
+    limit: int = Query(50, ge=1, le=100),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Dernières notifications de l'utilisateur
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Non authentifié")
+    
+    try:
+        query = db.query(UserNotification).filter(UserNotification.user_id == current_user.id)
+        if unread_only:
+            query = query.filter(UserNotification.is_read == False)
+        rows = query.order_by(UserNotification.created_at.desc()).limit(limit).all()
+        return [notifications.serialize(notification) for notification in rows]
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des notifications: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur interne")
+
+@router.get("/auth/notifications/unread-count")
+async def get_unread_count(
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Nombre de notifications non lues (compteur en cache)
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Non authentifié")
+    
+    try:
+        return {"unread": notifications.unread_count(db, current_user.id)}
+        
+    except Exception as e:
+        logger.error(f"Erreur lors du comptage des notifications: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur interne")
+
+@router.post("/auth/notifications/mark-read")
+async def mark_notifications_read(
+    request_data: MarkNotificationReadRequest,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Marque un lot de notifications comme lues (une seule requête UPDATE)
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Non authentifié")
+    
+    notification_ids = list(dict.fromkeys(request_data.notification_ids))
+    if len(notification_ids) > MARK_READ_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Au plus {MARK_READ_MAX_IDS} notifications par requête")
+    
+    try:
+        updated = 0
+        if notification_ids:
+            updated = db.execute(
+                update(UserNotification).where(
+                    UserNotification.user_id == current_user.id,
+                    UserNotification.id.in_(notification_ids),
+                    UserNotification.is_read == False
+                ).values(is_read=True)
+            ).rowcount
+            db.commit()
+        
+        unread = notifications.notifications_read(current_user.id, notification_ids, updated)
+        if unread is None:
+            unread = notifications.unread_count(db, current_user.id)
+        return {"success": True, "updated": updated, "unread": unread}
+        
+    except Exception as e:
+        logger.error(f"Erreur lors du marquage des notifications: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur interne")
+
+@router.post("/auth/notifications/mark-all-read")
+async def mark_all_notifications_read(
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Marque toutes les notifications de l'utilisateur comme lues
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Non authentifié")
+    
+    try:
+        updated = db.execute(
+            update(UserNotification).where(
+                UserNotification.user_id == current_user.id,
+                UserNotification.is_read == False
+            ).values(is_read=True)
+        ).rowcount
+        db.commit()
+        
+        notifications.notifications_read(current_user.id, None, updated)
+        return {"success": True, "updated": updated, "unread": 0}
+        
+    except Exception as e:
+        logger.error(f"Erreur lors du marquage des notifications: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur interne")
+
+def session_still_valid(token: str, user_id: str) -> bool:
+    """Session toujours active (flux longs) : cache d'abord, sinon une requête sur l'index token_hash"""
+    cached = session_cache.peek(token)
+    if cached is not None:
+        return cached.id == user_id
+    db = SessionLocal()
+    try:
+        return db.query(UserSession.id).filter(
+            UserSession.token_hash == hash_session_token(token),
+            UserSession.user_id == user_id,
+            UserSession.is_active == True,
+            UserSession.expires_at > datetime.utcnow()
+        ).first() is not None
+    finally:
+        db.close()
+
+@router.get("/auth/notifications/stream")
+async def stream_notifications(
+    current_user: UserSnapshot = Depends(get_current_user),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """
+    Flux SSE des notifications : compteur de non-lues, nouvelles notifications et lectures
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Non authentifié")
+    
+    # Abonnement avant le comptage : aucune notification créée entre les deux n'est perdue
+    subscription = notifications.subscribe(current_user.id)
+    try:
+        unread = notifications.unread_count(db, current_user.id)
+        # Le flux peut durer des heures : la connexion retourne au pool dès maintenant
+        db.close()
+    except Exception as e:
+        notifications.unsubscribe(subscription)
+        logger.error(f"Erreur lors de l'ouverture du flux de notifications: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erreur interne")
+    
+    return StreamingResponse(
+        notifications.stream(
+            subscription, unread,
+            session_valid=lambda: session_still_valid(credentials.credentials, current_user.id)
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ==================== ENDPOINTS DE PRÉFÉRENCES ====================
 
 @router.put("/auth/preferences")
 async def update_preferences(
     preferences: Dict[str, Any],
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -839,29 +1030,34 @@ async def update_preferences(
         raise HTTPException(status_code=401, detail="Non authentifié")
     
     try:
+        user = load_user(db, current_user)
+        
         # Fusionner avec les préférences existantes
-        current_preferences = current_user.preferences or {}
+        current_preferences = dict(user.preferences or {})
         current_preferences.update(preferences)
         
-        current_user.preferences = current_preferences
-        current_user.updated_at = datetime.utcnow()
+        user.preferences = current_preferences
+        user.updated_at = datetime.utcnow()
         
         db.commit()
+        session_cache.evict_user(user.id)
         
-        logger.info(f"Préférences mises à jour: {current_user.id}")
+        logger.info(f"Préférences mises à jour: {user.id}")
         return {
             "success": True,
             "message": "Préférences mises à jour avec succès",
             "preferences": current_preferences
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la mise à jour des préférences: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur interne")
 
 @router.get("/auth/preferences")
 async def get_preferences(
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """
     Récupère les préférences utilisateur
@@ -885,7 +1081,7 @@ async def get_preferences(
 @router.delete("/auth/account")
 async def delete_account(
     password: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -895,19 +1091,23 @@ async def delete_account(
         raise HTTPException(status_code=401, detail="Non authentifié")
     
     try:
+        user = load_user(db, current_user)
+        
         # Vérifier le mot de passe
-        if not current_user.password_hash or not verify_password(password, current_user.password_hash):
+        if not user.password_hash or not await password_hashing.verify_password(password, user.password_hash):
             raise HTTPException(status_code=400, detail="Mot de passe incorrect")
         
         # Désactiver le compte au lieu de le supprimer (soft delete)
-        current_user.is_active = False
-        current_user.email = f"deleted_{current_user.id}_{current_user.email}" if current_user.email else None
-        current_user.phone = f"deleted_{current_user.id}_{current_user.phone}" if current_user.phone else None
+        user.is_active = False
+        user.email = f"deleted_{user.id}_{user.email}" if user.email else None
+        user.phone = f"deleted_{user.id}_{user.phone}" if user.phone else None
+        user.updated_at = datetime.utcnow()
         
         # Désactiver toutes les sessions
-        db.query(UserSession).filter(UserSession.user_id == current_user.id).update({"is_active": False})
+        db.query(UserSession).filter(UserSession.user_id == user.id).update({"is_active": False})
         
         db.commit()
+        session_cache.evict_user(user.id)
         
         logger.info(f"Compte désactivé: {current_user.id}")
         return {"success": True, "message": "Compte supprimé avec succès"}
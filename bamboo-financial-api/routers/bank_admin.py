@@ -1,8 +1,10 @@
 # routers/bank_admin.py - Router d'administration des banques
-from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile
-from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, File, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, or_, case, text
+from sqlalchemy import Integer, cast, func, desc, and_, or_, case, text, select
 from typing import List, Optional
 from datetime import datetime, timedelta
 import uuid
@@ -12,27 +14,43 @@ import os
 import shutil
 import base64
 import sqlalchemy
-import csv
-import io
 from pathlib import Path
-from database import get_db
+from database import get_db, get_async_db, get_read_db
+from fieldsets import parse_fields, query_options, serialize
+import audit_log
+import entity_stats
+import timeseries
+from streaming_export import EXPORT_FORMAT_PATTERN
+from routers.exports import build_export
 
 router = APIRouter(tags=["bank_admin"]) 
 UPLOAD_DIR = Path("uploads/banks")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Champs calculés disponibles via ?fields= et champs de la vue compacte
+BANK_ADMIN_EXTRA_FIELDS = ("credit_products_count", "savings_products_count", "total_simulations", "last_simulation_date")
+BANK_ADMIN_COMPACT_FIELDS = ("id", "name", "logo_url", "rating", "is_active", "credit_products_count", "savings_products_count")
+
 # ==================== CRUD OPERATIONS ====================
+# Les handlers sur session synchrone sont des `def` : FastAPI les exécute dans le pool de threads
+# au lieu de bloquer la boucle d'événements. L'upload (lecture async du fichier) utilise AsyncSession.
 
 @router.get("", response_model=schemas.BankListResponse)
-async def get_banks_admin(
+def get_banks_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     search: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
     rating: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Champs à retourner (ex: id,name,total_simulations)"),
+    view: Optional[str] = Query(None, description="Vue: full ou compact"),
     db: Session = Depends(get_db)
 ):
     """Récupère toutes les banques avec statistiques pour l'admin"""
+    selection = parse_fields(
+        models.Bank, fields, view,
+        compact=BANK_ADMIN_COMPACT_FIELDS, extras=BANK_ADMIN_EXTRA_FIELDS
+    )
     try:
         # Requête de base avec les statistiques
         base_query = db.query(models.Bank)
@@ -62,50 +80,32 @@ async def get_banks_admin(
         total = base_query.count()
 
         # Récupérer les banques avec pagination
-        banks_query = base_query.order_by(desc(models.Bank.created_at)).offset(skip).limit(limit)
+        loader_options = query_options(models.Bank, selection) if selection else models.BANK_LIST_PROFILE
+        banks_query = base_query.options(*loader_options).order_by(
+            desc(models.Bank.created_at)
+        ).offset(skip).limit(limit)
         banks = banks_query.all()
 
-        # Pour chaque banque, calculer les statistiques
+        if selection:
+            activity = entity_stats.bank_activity(db, [bank.id for bank in banks]) if selection.extras else {}
+            items = []
+            for bank in banks:
+                item = serialize(bank, selection)
+                if selection.extras:
+                    item.update({name: activity[bank.id][name] for name in selection.extras})
+                items.append(item)
+            # Réponse partielle : hors du schéma BankListResponse
+            return JSONResponse(content=jsonable_encoder({
+                "banks": items,
+                "total": total,
+                "skip": skip,
+                "limit": limit
+            }))
+
+        # Statistiques de toute la page en requêtes groupées
+        activity = entity_stats.bank_activity(db, [bank.id for bank in banks])
         result_banks = []
         for bank in banks:
-            # Compter les produits de crédit
-            credit_products_count = db.query(models.CreditProduct).filter(
-                models.CreditProduct.bank_id == bank.id,
-                models.CreditProduct.is_active == True
-            ).count()
-
-            # Compter les produits d'épargne
-            savings_products_count = db.query(models.SavingsProduct).filter(
-                models.SavingsProduct.bank_id == bank.id,
-                models.SavingsProduct.is_active == True
-            ).count()
-
-            # Compter les simulations de crédit
-            credit_simulations_count = db.query(models.CreditSimulation).join(
-                models.CreditProduct, models.CreditSimulation.credit_product_id == models.CreditProduct.id
-            ).filter(models.CreditProduct.bank_id == bank.id).count()
-
-            # Compter les simulations d'épargne
-            savings_simulations_count = db.query(models.SavingsSimulation).join(
-                models.SavingsProduct, models.SavingsSimulation.savings_product_id == models.SavingsProduct.id
-            ).filter(models.SavingsProduct.bank_id == bank.id).count()
-
-            # Dernière simulation
-            last_credit_sim = db.query(func.max(models.CreditSimulation.created_at)).join(
-                models.CreditProduct, models.CreditSimulation.credit_product_id == models.CreditProduct.id
-            ).filter(models.CreditProduct.bank_id == bank.id).scalar()
-
-            last_savings_sim = db.query(func.max(models.SavingsSimulation.created_at)).join(
-                models.SavingsProduct, models.SavingsSimulation.savings_product_id == models.SavingsProduct.id
-            ).filter(models.SavingsProduct.bank_id == bank.id).scalar()
-
-            last_simulation_date = None
-            if last_credit_sim and last_savings_sim:
-                last_simulation_date = max(last_credit_sim, last_savings_sim)
-            elif last_credit_sim:
-                last_simulation_date = last_credit_sim
-            elif last_savings_sim:
-                last_simulation_date = last_savings_sim
 
             # Créer l'objet bank avec statistiques
             bank_data = {
@@ -126,10 +126,7 @@ async def get_banks_admin(
                 "is_active": bank.is_active,
                 "created_at": bank.created_at,
                 "updated_at": bank.updated_at,
-                "credit_products_count": credit_products_count,
-                "savings_products_count": savings_products_count,
-                "total_simulations": credit_simulations_count + savings_simulations_count,
-                "last_simulation_date": last_simulation_date
+                **activity[bank.id]
             }
             
             result_banks.append(bank_data)
@@ -148,7 +145,7 @@ async def get_banks_admin(
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des banques: {str(e)}")
 
 @router.get("/stats")
-async def get_banks_stats(db: Session = Depends(get_db)):
+def get_banks_stats(db: Session = Depends(get_read_db)):
     """Récupère les statistiques globales des banques"""
     try:
         # Statistiques des banques
@@ -159,44 +156,33 @@ async def get_banks_stats(db: Session = Depends(get_db)):
         total_credit_products = db.query(models.CreditProduct).filter(models.CreditProduct.is_active == True).count()
         total_savings_products = db.query(models.SavingsProduct).filter(models.SavingsProduct.is_active == True).count()
         
-        # Statistiques des simulations
-        total_credit_simulations = db.query(models.CreditSimulation).count()
-        total_savings_simulations = db.query(models.SavingsSimulation).count()
-        total_simulations = total_credit_simulations + total_savings_simulations
+        # Statistiques des simulations par banque (agrégats journaliers, une requête groupée)
+        simulations_by_bank = entity_stats.bank_simulation_counts(db)
+        total_simulations = sum(counts["credit"] + counts["savings"] for counts in simulations_by_bank.values())
         
         # Simulations ce mois-ci
-        current_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        credit_simulations_month = db.query(models.CreditSimulation).filter(
-            models.CreditSimulation.created_at >= current_month
-        ).count()
-        savings_simulations_month = db.query(models.SavingsSimulation).filter(
-            models.SavingsSimulation.created_at >= current_month
-        ).count()
-        simulations_month = credit_simulations_month + savings_simulations_month
-        
-        # Top banques par simulations (calcul simplifié)
-        top_banks = []
-        banks = db.query(models.Bank).limit(10).all()
-        for bank in banks:
-            # Compter toutes les simulations pour cette banque
-            credit_sims = db.query(models.CreditSimulation).join(
-                models.CreditProduct, models.CreditSimulation.credit_product_id == models.CreditProduct.id
-            ).filter(models.CreditProduct.bank_id == bank.id).count()
-            
-            savings_sims = db.query(models.SavingsSimulation).join(
-                models.SavingsProduct, models.SavingsSimulation.savings_product_id == models.SavingsProduct.id
-            ).filter(models.SavingsProduct.bank_id == bank.id).count()
-            
-            total_bank_sims = credit_sims + savings_sims
-            if total_bank_sims > 0:
-                top_banks.append({
-                    "bank_id": bank.id,
-                    "bank_name": bank.name,
-                    "simulations_count": total_bank_sims
-                })
-        
-        # Trier les top banques
-        top_banks = sorted(top_banks, key=lambda x: x['simulations_count'], reverse=True)[:5]
+        current_month = datetime.now().date().replace(day=1)
+        simulations_month = sum(
+            counts["credit"] + counts["savings"]
+            for counts in entity_stats.bank_simulation_counts(db, since=current_month).values()
+        )
+        
+        # Top banques par simulations
+        top_counts = sorted(
+            ((bank_id, counts["credit"] + counts["savings"]) for bank_id, counts in simulations_by_bank.items()),
+            key=lambda item: item[1], reverse=True
+        )[:5]
+        bank_names = dict(db.query(models.Bank.id, models.Bank.name).filter(
+            models.Bank.id.in_([bank_id for bank_id, _ in top_counts])
+        ).all()) if top_counts else {}
+        top_banks = [
+            {
+                "bank_id": bank_id,
+                "bank_name": bank_names.get(bank_id),
+                "simulations_count": count
+            }
+            for bank_id, count in top_counts if count > 0 and bank_id in bank_names
+        ]
 
         result = {
             "banks": {
@@ -225,20 +211,36 @@ async def get_banks_stats(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des statistiques: {str(e)}")
 
 @router.get("/validate-id")
-async def validate_bank_id(id: str = Query(...), db: Session = Depends(get_db)):
+def validate_bank_id(id: str = Query(...), db: Session = Depends(get_db)):
     """Valide la disponibilité d'un ID de banque"""
     try:
-        existing_bank = db.query(models.Bank).filter(models.Bank.id == id).first()
+        existing_bank = db.query(models.Bank.id).filter(models.Bank.id == id).first()
         return {"available": existing_bank is None}
     except Exception as e:
         print(f"Erreur validate_bank_id: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de la validation")
 
+# Déclaré avant /{bank_id}, qui capturerait sinon "export" comme identifiant de banque
+@router.get("/export")
+def export_banks(
+    format: str = Query("csv", regex=EXPORT_FORMAT_PATTERN)
+):
+    """Exporte la liste des banques (flux, mémoire constante)"""
+    try:
+        return build_export("banks", format)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Erreur export_banks: {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de l'export")
+
 @router.get("/{bank_id}")
-async def get_bank_admin(bank_id: str, db: Session = Depends(get_db)):
+def get_bank_admin(bank_id: str, db: Session = Depends(get_db)):
     """Récupère une banque par son ID avec statistiques"""
     try:
-        bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
+        bank = db.query(models.Bank).options(*models.BANK_DETAIL_PROFILE).filter(
+            models.Bank.id == bank_id
+        ).first()
         if not bank:
             raise HTTPException(status_code=404, detail="Banque non trouvée")
 
@@ -291,11 +293,11 @@ async def get_bank_admin(bank_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Erreur lors de la récupération de la banque")
 
 @router.post("")
-async def create_bank_admin(bank: schemas.BankCreate, db: Session = Depends(get_db)):
+def create_bank_admin(bank: schemas.BankCreate, request: Request, db: Session = Depends(get_db)):
     """Crée une nouvelle banque"""
     try:
         # Vérifier si l'ID existe déjà 
-        existing_bank = db.query(models.Bank).filter(models.Bank.id == bank.id).first()
+        existing_bank = db.query(models.Bank.id).filter(models.Bank.id == bank.id).first()
         if existing_bank:
             raise HTTPException(status_code=409, detail="Une banque avec cet ID existe déjà")
 
@@ -305,6 +307,7 @@ async def create_bank_admin(bank: schemas.BankCreate, db: Session = Depends(get_
         db.add(db_bank)
         db.commit()
         db.refresh(db_bank)
+        audit_log.record_request(request, "CREATE", "bank", db_bank.id, None, bank_data)
 
         # Retourner la banque créée avec statistiques
         return {
@@ -340,20 +343,26 @@ async def create_bank_admin(bank: schemas.BankCreate, db: Session = Depends(get_
         raise HTTPException(status_code=500, detail="Erreur lors de la création de la banque")
 
 @router.put("/{bank_id}")
-async def update_bank_admin(bank_id: str, bank_update: schemas.BankUpdate, db: Session = Depends(get_db)):
+def update_bank_admin(bank_id: str, bank_update: schemas.BankUpdate, request: Request, db: Session = Depends(get_db)):
     """Met à jour une banque"""
     try:
-        db_bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
+        db_bank = db.query(models.Bank).options(*models.BANK_LIST_PROFILE).filter(
+            models.Bank.id == bank_id
+        ).first()
         if not db_bank:
             raise HTTPException(status_code=404, detail="Banque non trouvée")
 
         # Mettre à jour les champs
         update_data = bank_update.dict(exclude_unset=True)
+        before = audit_log.snapshot(db_bank, update_data)
         for field, value in update_data.items():
             setattr(db_bank, field, value)
 
         db.commit()
         db.refresh(db_bank)
+        old_values, new_values = audit_log.changes(before, db_bank)
+        if new_values:
+            audit_log.record_request(request, "UPDATE", "bank", bank_id, old_values, new_values)
 
         # Calculer les statistiques pour la réponse
         credit_products_count = db.query(models.CreditProduct).filter(
@@ -407,7 +416,7 @@ async def update_bank_admin(bank_id: str, bank_update: schemas.BankUpdate, db: S
         raise HTTPException(status_code=500, detail="Erreur lors de la mise à jour de la banque")
 
 @router.delete("/{bank_id}")
-async def delete_bank_admin(bank_id: str, db: Session = Depends(get_db)):
+def delete_bank_admin(bank_id: str, request: Request, db: Session = Depends(get_db)):
     """Supprime une banque"""
     try:
         db_bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
@@ -427,6 +436,7 @@ async def delete_bank_admin(bank_id: str, db: Session = Depends(get_db)):
         bank_name = db_bank.name
         db.delete(db_bank)
         db.commit()
+        audit_log.record_request(request, "DELETE", "bank", bank_id, {"name": bank_name}, None)
 
         return {"message": f"Banque '{bank_name}' supprimée avec succès"}
 
@@ -442,11 +452,11 @@ async def delete_bank_admin(bank_id: str, db: Session = Depends(get_db)):
 # ==================== ENDPOINTS SUPPLÉMENTAIRES ====================
 
 @router.get("/{bank_id}/products")
-async def get_bank_products(bank_id: str, db: Session = Depends(get_db)):
+def get_bank_products(bank_id: str, db: Session = Depends(get_db)):
     """Récupère les produits d'une banque"""
     try:
         # Vérifier que la banque existe
-        bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
+        bank = db.query(models.Bank.id, models.Bank.name).filter(models.Bank.id == bank_id).first()
         if not bank:
             raise HTTPException(status_code=404, detail="Banque non trouvée")
 
@@ -494,7 +504,7 @@ async def get_bank_products(bank_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Erreur lors de la récupération des produits")
 
 @router.get("/{bank_id}/simulations")
-async def get_bank_simulations(
+def get_bank_simulations(
     bank_id: str,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
@@ -503,7 +513,7 @@ async def get_bank_simulations(
     """Récupère les simulations d'une banque"""
     try:
         # Vérifier que la banque existe
-        bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
+        bank = db.query(models.Bank.id, models.Bank.name).filter(models.Bank.id == bank_id).first()
         if not bank:
             raise HTTPException(status_code=404, detail="Banque non trouvée")
 
@@ -565,15 +575,17 @@ async def get_bank_simulations(
         raise HTTPException(status_code=500, detail="Erreur lors de la récupération des simulations")
 
 @router.get("/{bank_id}/performance")
-async def get_bank_performance(
+def get_bank_performance(
     bank_id: str,
     period: str = Query("6m", regex="^(1m|3m|6m|1y|2y)$"),
-    db: Session = Depends(get_db)
+    granularity: str = Query("month", regex=timeseries.GRANULARITY_PATTERN),
+    max_points: int = Query(timeseries.DEFAULT_MAX_POINTS, ge=2, le=366),
+    db: Session = Depends(get_read_db)
 ):
     """Récupère les performances d'une banque sur une période"""
     try:
         # Vérifier que la banque existe
-        bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
+        bank = db.query(models.Bank.id, models.Bank.name).filter(models.Bank.id == bank_id).first()
         if not bank:
             raise HTTPException(status_code=404, detail="Banque non trouvée")
 
@@ -588,51 +600,42 @@ async def get_bank_performance(
         months = period_map.get(period, 6)
         start_date = datetime.now() - timedelta(days=months * 30)
 
-        # Statistiques par mois pour les crédits
-        credit_monthly = db.query(
-            func.date_trunc('month', models.CreditSimulation.created_at).label('month'),
-            func.count(models.CreditSimulation.id).label('count'),
-            func.sum(models.CreditSimulation.requested_amount).label('volume')
-        ).join(
-            models.CreditProduct, models.CreditSimulation.credit_product_id == models.CreditProduct.id
-        ).filter(
-            models.CreditProduct.bank_id == bank_id,
-            models.CreditSimulation.created_at >= start_date
-        ).group_by('month').order_by('month').all()
-
-        # Statistiques par mois pour l'épargne
-        savings_monthly = db.query(
-            func.date_trunc('month', models.SavingsSimulation.created_at).label('month'),
-            func.count(models.SavingsSimulation.id).label('count'),
-            func.sum(models.SavingsSimulation.initial_amount + models.SavingsSimulation.monthly_contribution * models.SavingsSimulation.duration_months).label('volume')
-        ).join(
-            models.SavingsProduct, models.SavingsSimulation.savings_product_id == models.SavingsProduct.id
-        ).filter(
-            models.SavingsProduct.bank_id == bank_id,
-            models.SavingsSimulation.created_at >= start_date
-        ).group_by('month').order_by('month').all()
+        # Série par créneau depuis les agrégats journaliers, créneaux vides inclus
+        Rollup = models.SimulationDailyRollup
+        end_date = datetime.now()
+        metrics = {
+            "count": cast(func.sum(Rollup.simulation_count), Integer),
+            "volume": func.sum(Rollup.amount_sum)
+        }
+        simulations = {}
+        for simulation_type in ("credit", "savings"):
+            granularity, simulations[simulation_type] = timeseries.series(
+                db, Rollup.day, metrics, start_date, end_date,
+                granularity=granularity, max_points=max_points,
+                filters=(Rollup.bank_id == bank_id, Rollup.simulation_type == simulation_type)
+            )
+
+        def label(bucket):
+            return bucket.strftime("%Y-%m") if granularity == "month" else bucket.isoformat()
 
         # Volumes totaux
-        total_credit_volume = sum(float(row.volume or 0) for row in credit_monthly)
-        total_savings_volume = sum(float(row.volume or 0) for row in savings_monthly)
+        total_credit_volume = sum(point["volume"] for point in simulations["credit"])
+        total_savings_volume = sum(point["volume"] for point in simulations["savings"])
 
         return {
             "bank_id": bank_id,
             "bank_name": bank.name,
             "period": period,
+            "granularity": granularity,
             "monthly_simulations": {
-                "credit": [
-                    {
-                        "month": row.month.strftime("%Y-%m"),
-                        "count": row.count
-                    } for row in credit_monthly
-                ],
-                "savings": [
+                simulation_type: [
                     {
-                        "month": row.month.strftime("%Y-%m"),
-                        "count": row.count
-                    } for row in savings_monthly
+                        "month": label(point["bucket"]),
+                        "count": point["count"],
+                        "volume": point["volume"]
+                    } for point in points
                 ]
+                for simulation_type, points in simulations.items()
             },
             "volumes": {
                 "total_credit_volume": total_credit_volume,
@@ -652,13 +655,14 @@ async def get_bank_performance(
 @router.post("/{bank_id}/upload-logo")
 async def upload_bank_logo(
     bank_id: str,
+    request: Request,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Upload un logo pour une banque et l'enregistre en base de données"""
     try:
         # Vérifier que la banque existe
-        db_bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
+        db_bank = (await db.execute(select(models.Bank).where(models.Bank.id == bank_id))).scalars().first()
         if not db_bank:
             raise HTTPException(status_code=404, detail="Banque non trouvée")
         
@@ -681,8 +685,13 @@ async def upload_bank_logo(
         db_bank.logo_content_type = file.content_type
         db_bank.logo_url = data_url  # Stocker l'URL data complète
         
-        db.commit()
-        db.refresh(db_bank)
+        await db.commit()
+        await db.refresh(db_bank)
+        # Jamais l'image elle-même dans le journal
+        audit_log.record_request(
+            request, "UPDATE", "bank_logo", bank_id, None,
+            {"content_type": file.content_type, "file_size": len(file_content)}
+        )
         
         return {
             "message": "Logo uploadé avec succès",
@@ -694,18 +703,20 @@ async def upload_bank_logo(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Erreur upload_logo: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'upload du logo: {str(e)}")
 
 @router.get("/{bank_id}/logo")
-async def get_bank_logo(bank_id: str, db: Session = Depends(get_db)):
+def get_bank_logo(bank_id: str, db: Session = Depends(get_db)):
     """Récupère le logo d'une banque depuis la base de données"""
     try:
         # Récupérer la banque avec son logo
-        db_bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
+        db_bank = db.query(models.Bank).options(*models.BANK_CARD_PROFILE).filter(
+            models.Bank.id == bank_id
+        ).first()
         if not db_bank:
             raise HTTPException(status_code=404, detail="Banque non trouvée")
         
@@ -736,7 +747,7 @@ async def get_bank_logo(bank_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du logo: {str(e)}")
 
 @router.delete("/{bank_id}/logo")
-async def delete_bank_logo(bank_id: str, db: Session = Depends(get_db)):
+def delete_bank_logo(bank_id: str, request: Request, db: Session = Depends(get_db)):
     """Supprime le logo d'une banque de la base de données"""
     try:
         # Vérifier que la banque existe
@@ -750,6 +761,7 @@ async def delete_bank_logo(bank_id: str, db: Session = Depends(get_db)):
         db_bank.logo_url = None
         
         db.commit()
+        audit_log.record_request(request, "DELETE", "bank_logo", bank_id)
         
         return {"message": "Logo supprimé avec succès"}
         
@@ -763,10 +775,12 @@ async def delete_bank_logo(bank_id: str, db: Session = Depends(get_db)):
 # ==================== ENDPOINTS POUR RÉCUPÉRER TOUTES LES BANQUES AVEC LOGOS ====================
 
 @router.get("/")
-async def get_banks_with_logos(db: Session = Depends(get_db)):
+def get_banks_with_logos(db: Session = Depends(get_db)):
     """Récupère toutes les banques avec leurs logos"""
     try:
-        banks = db.query(models.Bank).filter(models.Bank.is_active == True).all()
+        banks = db.query(models.Bank).options(*models.BANK_LIST_PROFILE).filter(
+            models.Bank.is_active == True
+        ).all()
         
         result = []
         for bank in banks:
@@ -790,7 +804,7 @@ async def get_banks_with_logos(db: Session = Depends(get_db)):
 # ==================== ACTIONS RAPIDES ====================
 
 @router.patch("/{bank_id}/toggle-status")
-async def toggle_bank_status(bank_id: str, db: Session = Depends(get_db)):
+def toggle_bank_status(bank_id: str, request: Request, db: Session = Depends(get_db)):
     """Active/désactive une banque"""
     try:
         db_bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
@@ -801,6 +815,10 @@ async def toggle_bank_status(bank_id: str, db: Session = Depends(get_db)):
         db_bank.is_active = not db_bank.is_active
         db.commit()
         db.refresh(db_bank)
+        audit_log.record_request(
+            request, "UPDATE", "bank", bank_id,
+            {"is_active": not db_bank.is_active}, {"is_active": db_bank.is_active}
+        )
 
         return {
             "message": f"Banque {'activée' if db_bank.is_active else 'désactivée'} avec succès",
@@ -814,60 +832,10 @@ async def toggle_bank_status(bank_id: str, db: Session = Depends(get_db)):
         print(f"Erreur toggle_bank_status: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors du changement de statut")
 
-@router.get("/export")
-async def export_banks(
-    format: str = Query("csv", regex="^(csv|excel)$"),
-    db: Session = Depends(get_db)
-):
-    """Exporte la liste des banques"""
-    try:
-        # Récupérer toutes les banques avec statistiques
-        banks = db.query(models.Bank).all()
-        
-        if format == "csv":
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # En-têtes
-            writer.writerow([
-                'ID', 'Nom', 'Nom complet', 'Description', 'Téléphone', 'Email', 
-                'Site web', 'Adresse', 'Code SWIFT', 'Licence', 'Année création',
-                'Total actifs', 'Notation', 'Actif', 'Date création', 'Dernière MAJ'
-            ])
-            
-            # Données
-            for bank in banks:
-                writer.writerow([
-                    bank.id, bank.name, bank.full_name or '', bank.description or '',
-                    bank.contact_phone or '', bank.contact_email or '', bank.website or '',
-                    bank.address or '', bank.swift_code or '', bank.license_number or '',
-                    bank.established_year or '', bank.total_assets or '', bank.rating or '',
-                    'Oui' if bank.is_active else 'Non',
-                    bank.created_at.strftime('%Y-%m-%d'),
-                    bank.updated_at.strftime('%Y-%m-%d')
-                ])
-            
-            output.seek(0)
-            
-            return StreamingResponse(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                media_type="text/csv",
-                headers={"Content-Disposition": "attachment; filename=banques.csv"}
-            )
-        
-        # Format Excel non implémenté pour simplifier
-        raise HTTPException(status_code=501, detail="Export Excel non disponible")
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Erreur export_banks: {e}")
-        raise HTTPException(status_code=500, detail="Erreur lors de l'export")
-
 # ==================== ENDPOINTS DE DEBUG (TEMPORAIRES) ====================
 
 @router.get("/debug/test-db")
-async def test_db_connection(db: Session = Depends(get_db)):
+def test_db_connection(db: Session = Depends(get_db)):
     """Test de connexion à la base de données"""
     try:
         result = db.execute(text("SELECT version()")).fetchone()
@@ -892,7 +860,7 @@ async def debug_environment():
     }
 
 @router.get("/debug/bank/{bank_id}")
-async def debug_bank_update(bank_id: str, db: Session = Depends(get_db)):
+def debug_bank_update(bank_id: str, db: Session = Depends(get_db)):
     """Test de mise à jour d'une banque"""
     try:
         db_bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
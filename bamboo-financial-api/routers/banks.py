@@ -1,18 +1,20 @@
 # routers/banks.py - Version corrigée
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from typing import List
 import models
 import schemas
-from database import get_db
+from database import get_read_db
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Bank])
-async def get_all_banks(db: Session = Depends(get_db)):
+async def get_all_banks(db: Session = Depends(get_read_db)):
     """Récupère toutes les banques actives"""
     try:
-        banks = db.query(models.Bank).filter(models.Bank.is_active == True).all()
+        banks = db.query(models.Bank).options(*models.BANK_LIST_PROFILE).filter(
+            models.Bank.is_active == True
+        ).all()
         
         # Conversion explicite en dictionnaires
         banks_data = []
@@ -45,10 +47,12 @@ async def get_all_banks(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des banques: {str(e)}")
 
 @router.get("/{bank_id}", response_model=schemas.Bank)
-async def get_bank(bank_id: str, db: Session = Depends(get_db)):
+async def get_bank(bank_id: str, db: Session = Depends(get_read_db)):
     """Récupère une banque par son ID"""
     try:
-        bank = db.query(models.Bank).filter(models.Bank.id == bank_id).first()
+        bank = db.query(models.Bank).options(*models.BANK_DETAIL_PROFILE).filter(
+            models.Bank.id == bank_id
+        ).first()
         if not bank:
             raise HTTPException(status_code=404, detail="Banque non trouvée")
         
@@ -82,10 +86,12 @@ async def get_bank(bank_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de la banque: {str(e)}")
 
 @router.get("/{bank_id}/credit-products")
-async def get_bank_credit_products(bank_id: str, db: Session = Depends(get_db)):
+async def get_bank_credit_products(bank_id: str, db: Session = Depends(get_read_db)):
     """Récupère les produits de crédit d'une banque"""
     try:
-        products = db.query(models.CreditProduct).filter(
+        products = db.query(models.CreditProduct).options(
+            joinedload(models.CreditProduct.bank).options(*models.BANK_CARD_PROFILE)
+        ).filter(
             models.CreditProduct.bank_id == bank_id,
             models.CreditProduct.is_active == True
         ).all()
@@ -132,10 +138,12 @@ async def get_bank_credit_products(bank_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des produits: {str(e)}")
 
 @router.get("/{bank_id}/savings-products")
-async def get_bank_savings_products(bank_id: str, db: Session = Depends(get_db)):
+async def get_bank_savings_products(bank_id: str, db: Session = Depends(get_read_db)):
     """Récupère les produits d'épargne d'une banque"""
     try:
-        products = db.query(models.SavingsProduct).filter(
+        products = db.query(models.SavingsProduct).options(
+            joinedload(models.SavingsProduct.bank).options(*models.BANK_CARD_PROFILE)
+        ).filter(
             models.SavingsProduct.bank_id == bank_id,
             models.SavingsProduct.is_active == True
         ).all()
@@ -1,10 +1,10 @@
 # credit_products_admin.py - Endpoints FastAPI pour les produits de crédit
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, desc, asc
 from typing import List, Optional
 from database import get_db
-from models import CreditProduct, Bank
+from models import CreditProduct, Bank, BANK_CARD_PROFILE
 from schemas import (
     CreditProductCreate, 
     CreditProductUpdate, 
@@ -14,9 +14,15 @@ from schemas import (
 )
 import uuid
 from datetime import datetime
+from fieldsets import parse_fields, query_options, serialize
+import audit_log
 
 router = APIRouter(prefix="/admin/credit-products", tags=["credit_admin"]) 
 
+# Relations exposables via ?fields=bank.name et champs de la vue compacte
+CREDIT_PRODUCT_RELATIONS = {"bank": CreditProduct.bank}
+CREDIT_PRODUCT_COMPACT_FIELDS = ("id", "name", "type", "average_rate", "is_active", "is_featured", "bank.id", "bank.name")
+
 @router.get("/", response_model=dict)
 def get_credit_products(
     db: Session = Depends(get_db),
@@ -26,13 +32,23 @@ def get_credit_products(
     bank_id: Optional[str] = Query(None, description="Filtrer par banque"),
     type: Optional[str] = Query(None, description="Filtrer par type de crédit"),
     is_active: Optional[str] = Query(None, description="Filtrer par statut (true/false)"),
+    fields: Optional[str] = Query(None, description="Champs à retourner (ex: id,name,bank.name)"),
+    view: Optional[str] = Query(None, description="Vue: full ou compact"),
 ):
     """
     Récupère la liste des produits de crédit avec pagination et filtres
     """
+    selection = parse_fields(
+        CreditProduct, fields, view,
+        CREDIT_PRODUCT_RELATIONS, CREDIT_PRODUCT_COMPACT_FIELDS
+    )
     try:
         # Construction de la requête de base
-        query = db.query(CreditProduct).options(joinedload(CreditProduct.bank))
+        if selection:
+            loader_options = query_options(CreditProduct, selection, CREDIT_PRODUCT_RELATIONS)
+        else:
+            loader_options = [joinedload(CreditProduct.bank).options(*BANK_CARD_PROFILE)]
+        query = db.query(CreditProduct).options(*loader_options)
         
         # Application des filtres
         filters = []
@@ -72,8 +88,10 @@ def get_credit_products(
         # Récupération des produits avec pagination
         products = query.offset(skip).limit(limit).all()
         
-        return {
-            "items": [
+        if selection:
+            items = [serialize(product, selection, CREDIT_PRODUCT_RELATIONS) for product in products]
+        else:
+            items = [
                 {
                     "id": product.id,
                     "name": product.name,
@@ -101,7 +119,10 @@ def get_credit_products(
                     } if product.bank else None
                 }
                 for product in products
-            ],
+            ]
+        
+        return {
+            "items": items,
             "total": total,
             "page": page,
             "limit": limit,
@@ -117,6 +138,7 @@ def get_credit_products(
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
 def create_credit_product(
     product_data: CreditProductCreate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -124,7 +146,7 @@ def create_credit_product(
     """
     try:
         # Vérifier que la banque existe
-        bank = db.query(Bank).filter(Bank.id == product_data.bank_id).first()
+        bank = db.query(Bank.id).filter(Bank.id == product_data.bank_id).first()
         if not bank:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -181,6 +203,7 @@ def create_credit_product(
         db.add(new_product)
         db.commit()
         db.refresh(new_product)
+        audit_log.record_request(request, "CREATE", "credit_product", new_product.id, None, product_data.dict())
         
         return {
             "message": "Produit de crédit créé avec succès",
@@ -206,7 +229,7 @@ def get_credit_product(
     """
     try:
         product = db.query(CreditProduct).options(
-            joinedload(CreditProduct.bank)
+            joinedload(CreditProduct.bank).options(*BANK_CARD_PROFILE)
         ).filter(CreditProduct.id == product_id).first()
         
         if not product:
@@ -258,6 +281,7 @@ def get_credit_product(
 def update_credit_product(
     product_id: str,
     product_data: CreditProductUpdate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -274,6 +298,7 @@ def update_credit_product(
         
         # Mise à jour des champs modifiés
         update_data = product_data.dict(exclude_unset=True)
+        before = audit_log.snapshot(product, update_data)
         
         for field, value in update_data.items():
             if hasattr(product, field):
@@ -283,6 +308,9 @@ def update_credit_product(
         
         db.commit()
         db.refresh(product)
+        old_values, new_values = audit_log.changes(before, product)
+        if new_values:
+            audit_log.record_request(request, "UPDATE", "credit_product", product_id, old_values, new_values)
         
         return {
             "message": "Produit de crédit mis à jour avec succès"
@@ -300,6 +328,7 @@ def update_credit_product(
 @router.delete("/{product_id}", response_model=dict)
 def delete_credit_product(
     product_id: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -314,8 +343,10 @@ def delete_credit_product(
                 detail=f"Produit de crédit avec l'ID {product_id} introuvable"
             )
         
+        product_name = product.name
         db.delete(product)
         db.commit()
+        audit_log.record_request(request, "DELETE", "credit_product", product_id, {"name": product_name}, None)
         
         return {
             "message": "Produit de crédit supprimé avec succès"
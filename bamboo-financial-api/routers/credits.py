@@ -1,7 +1,9 @@
 # routers/credits.py - Version corrigée avec gestion JSON
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from decimal import Decimal
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import List, Optional
 import math
 import uuid
@@ -9,31 +11,59 @@ import json  # Ajouté pour la sérialisation JSON
 from datetime import datetime
 import models
 import schemas
-from database import get_db
+from database import get_async_db, get_lazy_db, get_read_lazy_db, wants_primary, AsyncReadSessionLocal, LazySession
+from fieldsets import parse_fields, query_options, serialize
+from single_flight import SingleFlight, normalize_key
+import os
 
 router = APIRouter()
 
+# Relations exposables via ?fields=bank.name et champs de la vue compacte
+CREDIT_PRODUCT_RELATIONS = {"bank": models.CreditProduct.bank}
+CREDIT_PRODUCT_COMPACT_FIELDS = ("id", "name", "type", "average_rate", "min_amount", "max_amount", "bank.id", "bank.name", "bank.logo_url")
+
+# Comparateur : requêtes identiques simultanées regroupées, cache court optionnel (0 = désactivé)
+compare_flight = SingleFlight("credits_compare", ttl=float(os.getenv("COMPARE_CACHE_TTL_SECONDS", "0")))
+
+def credit_type_filter(credit_type: str):
+    """Filtre sur le code de type (auto, immobilier...) : égalité, servie par idx_credit_products_type_active (migration 008)"""
+    return models.CreditProduct.type == credit_type.strip().lower()
+
 @router.get("/products")
 async def get_credit_products(
     credit_type: Optional[str] = Query(None, description="Type de crédit"),
     min_amount: Optional[float] = Query(None, description="Montant minimum"),
     max_amount: Optional[float] = Query(None, description="Montant maximum"),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Champs à retourner (ex: id,name,average_rate,bank.name)"),
+    view: Optional[str] = Query(None, description="Vue: full ou compact"),
+    db: LazySession = Depends(get_read_lazy_db)
 ):
     """Récupère les produits de crédit avec filtres optionnels"""
+    selection = parse_fields(
+        models.CreditProduct, fields, view,
+        CREDIT_PRODUCT_RELATIONS, CREDIT_PRODUCT_COMPACT_FIELDS
+    )
     try:
-        query = db.query(models.CreditProduct).options(
-            joinedload(models.CreditProduct.bank)
-        ).filter(models.CreditProduct.is_active == True)
+        if selection:
+            loader_options = query_options(models.CreditProduct, selection, CREDIT_PRODUCT_RELATIONS)
+        else:
+            loader_options = [joinedload(models.CreditProduct.bank).options(*models.BANK_LIST_PROFILE)]
+        query = select(models.CreditProduct).options(
+            *loader_options
+        ).where(models.CreditProduct.is_active == True)
         
         if credit_type:
-            query = query.filter(models.CreditProduct.type.ilike(f"%{credit_type}%"))
+            query = query.where(credit_type_filter(credit_type))
         if min_amount is not None:
-            query = query.filter(models.CreditProduct.max_amount >= min_amount)
+            query = query.where(models.CreditProduct.max_amount >= min_amount)
         if max_amount is not None:
-            query = query.filter(models.CreditProduct.min_amount <= max_amount)
+            query = query.where(models.CreditProduct.min_amount <= max_amount)
         
-        products = query.all()
+        products = (await db.execute(query)).scalars().all()
+        await db.release()
+        
+        if selection:
+            return [serialize(product, selection, CREDIT_PRODUCT_RELATIONS) for product in products]
         
         # Conversion explicite en dictionnaires
         products_data = []
@@ -93,14 +123,18 @@ async def get_credit_products(
 @router.post("/simulate")
 async def simulate_credit(
     request: schemas.CreditSimulationRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Simule un crédit"""
     try:
         # Récupérer le produit de crédit
-        credit_product = db.query(models.CreditProduct).filter(
-            models.CreditProduct.id == request.credit_product_id
-        ).first()
+        credit_product = (await db.execute(
+            select(models.CreditProduct).options(
+                joinedload(models.CreditProduct.bank).options(*models.BANK_CARD_PROFILE)
+            ).where(
+                models.CreditProduct.id == request.credit_product_id
+            )
+        )).scalars().first()
         
         if not credit_product:
             raise HTTPException(status_code=404, detail="Produit de crédit non trouvé")
@@ -184,6 +218,13 @@ async def simulate_credit(
         if debt_ratio < 25:
             recommendations.append("Excellent profil ! Vous pourriez négocier de meilleures conditions.")
         
+        # Valeurs lues avant l'écriture : un rollback expire les objets de la session
+        applied_rate = float(credit_product.average_rate)
+        bank_info = {
+            "name": credit_product.bank.name,
+            "logo": credit_product.bank.logo_url
+        } if credit_product.bank else None
+        
         # CORRECTION: Sauvegarder la simulation avec conversion JSON explicite
         simulation = models.CreditSimulation(
             id=str(uuid.uuid4()),
@@ -194,7 +235,7 @@ async def simulate_credit(
             monthly_income=request.monthly_income,
             current_debts=request.current_debts or 0,
             down_payment=request.down_payment or 0,
-            applied_rate=float(credit_product.average_rate),
+            applied_rate=applied_rate,
             monthly_payment=monthly_payment,
             total_interest=total_interest,
             total_cost=total_cost,
@@ -207,18 +248,18 @@ async def simulate_credit(
         
         try:
             db.add(simulation)
-            db.commit()
-            db.refresh(simulation)
+            await db.commit()
+            await db.refresh(simulation)
         except Exception as db_error:
             print(f"Erreur base de données: {str(db_error)}")
-            db.rollback()
+            await db.rollback()
             # En cas d'erreur DB, continuer sans sauvegarder
             pass
         
         # Retourner la réponse sous forme de dictionnaire
         response_data = {
             "simulation_id": simulation.id,
-            "applied_rate": float(credit_product.average_rate),
+            "applied_rate": applied_rate,
             "monthly_payment": round(float(monthly_payment), 2),
             "total_interest": round(float(total_interest), 2),
             "total_cost": round(float(total_cost), 2),
@@ -226,10 +267,7 @@ async def simulate_credit(
             "eligible": eligible,
             "recommendations": recommendations,
             "amortization_schedule": amortization_schedule,
-            "bank_info": {
-                "name": credit_product.bank.name,
-                "logo": credit_product.bank.logo_url
-            } if credit_product.bank else None
+            "bank_info": bank_info
         }
         
         return response_data
@@ -244,14 +282,20 @@ async def simulate_credit(
 @router.post("/simulate-light")
 async def simulate_credit_light(
     request: schemas.CreditSimulationRequest,
-    db: Session = Depends(get_db)
+    db: LazySession = Depends(get_lazy_db)
 ):
     """Simule un crédit sans sauvegarde en base de données"""
     try:
         # Récupérer le produit de crédit
-        credit_product = db.query(models.CreditProduct).filter(
-            models.CreditProduct.id == request.credit_product_id
-        ).first()
+        credit_product = (await db.execute(
+            select(models.CreditProduct).options(
+                joinedload(models.CreditProduct.bank).options(*models.BANK_CARD_PROFILE)
+            ).where(
+                models.CreditProduct.id == request.credit_product_id
+            )
+        )).scalars().first()
+        
+        await db.release()
         
         if not credit_product:
             raise HTTPException(status_code=404, detail="Produit de crédit non trouvé")
@@ -338,39 +382,37 @@ async def simulate_credit_light(
         print(f"Erreur dans simulate_credit_light: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur simulation: {str(e)}")
 
-@router.get("/compare")
-async def compare_credit_offers(
-    credit_type: str = Query(..., description="Type de crédit (immobilier, consommation, auto)"),
-    amount: float = Query(..., description="Montant souhaité", ge=0),
-    duration: int = Query(..., description="Durée en mois", ge=1, le=480),
-    monthly_income: float = Query(..., description="Revenus mensuels", gt=0),
-    current_debts: float = Query(0, description="Dettes actuelles mensuelles", ge=0),
-    db: Session = Depends(get_db)
-):
-    """Compare les offres de crédit de différentes banques"""
+async def _compare_offers(credit_type: str, amount: float, duration: int, monthly_income: float,
+                          current_debts: float, primary_only: bool) -> dict:
+    """Comparaison calculée une fois pour toutes les requêtes identiques simultanées (session propre)"""
+    db = LazySession(lambda: AsyncReadSessionLocal(primary_only=primary_only))
     try:
         # Récupérer les produits compatibles avec jointure sur bank
-        products = db.query(models.CreditProduct).options(
-            joinedload(models.CreditProduct.bank)
-        ).filter(
-            models.CreditProduct.type.ilike(f"%{credit_type}%"),
-            models.CreditProduct.min_amount <= amount,
-            models.CreditProduct.max_amount >= amount,
-            models.CreditProduct.min_duration_months <= duration,
-            models.CreditProduct.max_duration_months >= duration,
-            models.CreditProduct.is_active == True
-        ).join(models.Bank).filter(
-            models.Bank.is_active == True
-        ).all()
-        
+        products = (await db.execute(
+            select(models.CreditProduct).options(
+                joinedload(models.CreditProduct.bank).options(*models.BANK_CARD_PROFILE)
+            ).where(
+                credit_type_filter(credit_type),
+                models.CreditProduct.min_amount <= amount,
+                models.CreditProduct.max_amount >= amount,
+                models.CreditProduct.min_duration_months <= duration,
+                models.CreditProduct.max_duration_months >= duration,
+                models.CreditProduct.is_active == True
+            ).join(models.Bank).where(
+                models.Bank.is_active == True
+            )
+        )).scalars().all()
+        # Dernière requête : la connexion est rendue avant les calculs de comparaison
+        await db.release()
+    
         if not products:
             return {
                 "comparisons": [],
                 "message": f"Aucun produit trouvé pour {credit_type} - {amount:,.0f} FCFA sur {duration} mois"
             }
-        
+    
         comparisons = []
-        
+    
         for product in products:
             try:
                 monthly_rate = float(product.average_rate) / 100 / 12
@@ -378,18 +420,18 @@ async def compare_credit_offers(
                     monthly_payment = amount / duration
                 else:
                     monthly_payment = amount * (monthly_rate * (1 + monthly_rate) ** duration) / ((1 + monthly_rate) ** duration - 1)
-                
+            
                 total_cost = monthly_payment * duration
                 total_interest = total_cost - amount
                 debt_ratio = ((monthly_payment + current_debts) / monthly_income) * 100
-                
+            
                 # Vérifier l'éligibilité
                 max_debt_ratio = 33
                 if product.eligibility_criteria and isinstance(product.eligibility_criteria, dict):
                     max_debt_ratio = product.eligibility_criteria.get("max_debt_ratio", 33)
-                
+            
                 eligible = debt_ratio <= max_debt_ratio
-                
+            
                 comparison_data = {
                     "bank": {
                         "id": product.bank.id,
@@ -412,28 +454,28 @@ async def compare_credit_offers(
                     "savings_vs_best": 0  # Calculé après tri
                 }
                 comparisons.append(comparison_data)
-                
+            
             except Exception as calc_error:
                 print(f"Erreur calcul pour produit {product.id}: {calc_error}")
                 continue
-        
+    
         if not comparisons:
             return {
                 "comparisons": [],
                 "message": "Erreur dans les calculs de comparaison"
             }
-        
+    
         # Trier par mensualité croissante
         comparisons.sort(key=lambda x: x["monthly_payment"])
-        
+    
         # Calculer les économies par rapport à la meilleure offre
         best_monthly = comparisons[0]["monthly_payment"]
         for comp in comparisons:
             comp["savings_vs_best"] = round(comp["monthly_payment"] - best_monthly, 2)
-        
+    
         # Statistiques
         eligible_offers = [c for c in comparisons if c["eligible"]]
-        
+    
         result = {
             "comparisons": comparisons,
             "statistics": {
@@ -453,8 +495,39 @@ async def compare_credit_offers(
                 "current_debts": current_debts
             }
         }
-        
         return result
+    finally:
+        await db.release()
+
+@router.get("/compare")
+async def compare_credit_offers(
+    request: Request,
+    credit_type: str = Query(..., description="Type de crédit (immobilier, consommation, auto)"),
+    amount: float = Query(..., description="Montant souhaité", ge=0),
+    duration: int = Query(..., description="Durée en mois", ge=1, le=480),
+    monthly_income: float = Query(..., description="Revenus mensuels", gt=0),
+    current_debts: float = Query(0, description="Dettes actuelles mensuelles", ge=0)
+):
+    """Compare les offres de crédit de différentes banques"""
+    try:
+        primary_only = wants_primary(request)
+        key = normalize_key(credit_type, amount, duration, monthly_income, current_debts, primary_only)
+        result = await compare_flight.do(key, lambda: _compare_offers(
+            credit_type, amount, duration, monthly_income, current_debts, primary_only
+        ))
+        if "search_params" not in result:
+            return result
+        # Résultat partagé : copie avec les paramètres tels que saisis par ce client
+        return {
+            **result,
+            "search_params": {
+                "credit_type": credit_type,
+                "amount": amount,
+                "duration": duration,
+                "monthly_income": monthly_income,
+                "current_debts": current_debts
+            }
+        }
         
     except Exception as e:
         print(f"Erreur dans compare_credit_offers: {str(e)}")
@@ -469,8 +542,7 @@ async def calculate_borrowing_capacity(
     max_debt_ratio: float = Query(33, description="Taux d'endettement maximum (%)", ge=25, le=40),
     down_payment: float = Query(0, description="Apport personnel", ge=0),
     include_insurance: bool = Query(True, description="Inclure assurance emprunteur"),
-    insurance_rate: float = Query(0.36, description="Taux d'assurance (% du capital)", ge=0, le=2),
-    db: Session = Depends(get_db)
+    insurance_rate: float = Query(0.36, description="Taux d'assurance (% du capital)", ge=0, le=2)
 ):
     """Calcule la capacité d'emprunt maximale"""
     try:
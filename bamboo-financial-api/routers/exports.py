@@ -0,0 +1,179 @@
+# routers/exports.py - Exports administrateur en flux (CSV, NDJSON, Excel)
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import select
+from datetime import datetime
+from typing import Optional
+import models
+from streaming_export import ExportColumn, EXPORT_FORMATS, EXPORT_FORMAT_PATTERN, export_response
+
+router = APIRouter(prefix="/admin/exports", tags=["Admin - Exports"])
+
+def _yes_no(value) -> str:
+    return "Oui" if value else "Non"
+
+def _day(value) -> str:
+    return value.strftime("%Y-%m-%d") if value else ""
+
+# ==================== JEUX DE DONNÉES ====================
+
+Bank, CreditProduct, SavingsProduct = models.Bank, models.CreditProduct, models.SavingsProduct
+InsuranceProduct, InsuranceQuote, AuditLog = models.InsuranceProduct, models.InsuranceQuote, models.AuditLog
+CreditSimulation, SavingsSimulation = models.CreditSimulation, models.SavingsSimulation
+
+BANK_EXPORT_COLUMNS = (
+    ExportColumn("id", "ID", Bank.id),
+    ExportColumn("name", "Nom", Bank.name),
+    ExportColumn("full_name", "Nom complet", Bank.full_name),
+    ExportColumn("description", "Description", Bank.description),
+    ExportColumn("contact_phone", "Téléphone", Bank.contact_phone),
+    ExportColumn("contact_email", "Email", Bank.contact_email),
+    ExportColumn("website", "Site web", Bank.website),
+    ExportColumn("address", "Adresse", Bank.address),
+    ExportColumn("swift_code", "Code SWIFT", Bank.swift_code),
+    ExportColumn("license_number", "Licence", Bank.license_number),
+    ExportColumn("established_year", "Année création", Bank.established_year),
+    ExportColumn("total_assets", "Total actifs", Bank.total_assets),
+    ExportColumn("rating", "Notation", Bank.rating),
+    ExportColumn("is_active", "Actif", Bank.is_active, _yes_no),
+    ExportColumn("created_at", "Date création", Bank.created_at, _day),
+    ExportColumn("updated_at", "Dernière MAJ", Bank.updated_at, _day),
+)
+
+# Jeu de données -> (colonnes, colonne de date pour since/until, tri)
+EXPORT_DATASETS = {
+    "banks": (BANK_EXPORT_COLUMNS, Bank.created_at, Bank.created_at.desc()),
+    "credit-products": ((
+        ExportColumn("id", "ID", CreditProduct.id),
+        ExportColumn("bank_id", "Banque", CreditProduct.bank_id),
+        ExportColumn("name", "Nom", CreditProduct.name),
+        ExportColumn("type", "Type", CreditProduct.type),
+        ExportColumn("min_amount", "Montant min", CreditProduct.min_amount),
+        ExportColumn("max_amount", "Montant max", CreditProduct.max_amount),
+        ExportColumn("min_duration_months", "Durée min (mois)", CreditProduct.min_duration_months),
+        ExportColumn("max_duration_months", "Durée max (mois)", CreditProduct.max_duration_months),
+        ExportColumn("average_rate", "Taux moyen", CreditProduct.average_rate),
+        ExportColumn("min_rate", "Taux min", CreditProduct.min_rate),
+        ExportColumn("max_rate", "Taux max", CreditProduct.max_rate),
+        ExportColumn("processing_time_hours", "Délai (heures)", CreditProduct.processing_time_hours),
+        ExportColumn("is_featured", "Mis en avant", CreditProduct.is_featured, _yes_no),
+        ExportColumn("is_active", "Actif", CreditProduct.is_active, _yes_no),
+        ExportColumn("created_at", "Date création", CreditProduct.created_at),
+    ), CreditProduct.created_at, CreditProduct.created_at.desc()),
+    "savings-products": ((
+        ExportColumn("id", "ID", SavingsProduct.id),
+        ExportColumn("bank_id", "Banque", SavingsProduct.bank_id),
+        ExportColumn("name", "Nom", SavingsProduct.name),
+        ExportColumn("type", "Type", SavingsProduct.type),
+        ExportColumn("interest_rate", "Taux", SavingsProduct.interest_rate),
+        ExportColumn("minimum_deposit", "Dépôt min", SavingsProduct.minimum_deposit),
+        ExportColumn("maximum_deposit", "Dépôt max", SavingsProduct.maximum_deposit),
+        ExportColumn("liquidity", "Liquidité", SavingsProduct.liquidity),
+        ExportColumn("term_months", "Durée (mois)", SavingsProduct.term_months),
+        ExportColumn("risk_level", "Risque", SavingsProduct.risk_level),
+        ExportColumn("is_featured", "Mis en avant", SavingsProduct.is_featured, _yes_no),
+        ExportColumn("is_active", "Actif", SavingsProduct.is_active, _yes_no),
+        ExportColumn("created_at", "Date création", SavingsProduct.created_at),
+    ), SavingsProduct.created_at, SavingsProduct.created_at.desc()),
+    "insurance-products": ((
+        ExportColumn("id", "ID", InsuranceProduct.id),
+        ExportColumn("insurance_company_id", "Compagnie", InsuranceProduct.insurance_company_id),
+        ExportColumn("name", "Nom", InsuranceProduct.name),
+        ExportColumn("type", "Type", InsuranceProduct.type),
+        ExportColumn("base_premium", "Prime de base", InsuranceProduct.base_premium),
+        ExportColumn("is_active", "Actif", InsuranceProduct.is_active, _yes_no),
+        ExportColumn("created_at", "Date création", InsuranceProduct.created_at),
+    ), InsuranceProduct.created_at, InsuranceProduct.created_at.desc()),
+    "credit-simulations": ((
+        ExportColumn("id", "ID", CreditSimulation.id),
+        ExportColumn("session_id", "Session", CreditSimulation.session_id),
+        ExportColumn("credit_product_id", "Produit", CreditSimulation.credit_product_id),
+        ExportColumn("requested_amount", "Montant demandé", CreditSimulation.requested_amount),
+        ExportColumn("duration_months", "Durée (mois)", CreditSimulation.duration_months),
+        ExportColumn("monthly_income", "Revenu mensuel", CreditSimulation.monthly_income),
+        ExportColumn("current_debts", "Dettes", CreditSimulation.current_debts),
+        ExportColumn("down_payment", "Apport", CreditSimulation.down_payment),
+        ExportColumn("applied_rate", "Taux appliqué", CreditSimulation.applied_rate),
+        ExportColumn("monthly_payment", "Mensualité", CreditSimulation.monthly_payment),
+        ExportColumn("total_cost", "Coût total", CreditSimulation.total_cost),
+        ExportColumn("total_interest", "Intérêts", CreditSimulation.total_interest),
+        ExportColumn("debt_ratio", "Taux d'endettement", CreditSimulation.debt_ratio),
+        ExportColumn("eligible", "Éligible", CreditSimulation.eligible),
+        ExportColumn("risk_score", "Score de risque", CreditSimulation.risk_score),
+        ExportColumn("client_ip", "IP", CreditSimulation.client_ip),
+        ExportColumn("created_at", "Date", CreditSimulation.created_at),
+    ), CreditSimulation.created_at, CreditSimulation.created_at.asc()),
+    "savings-simulations": ((
+        ExportColumn("id", "ID", SavingsSimulation.id),
+        ExportColumn("session_id", "Session", SavingsSimulation.session_id),
+        ExportColumn("savings_product_id", "Produit", SavingsSimulation.savings_product_id),
+        ExportColumn("initial_amount", "Apport initial", SavingsSimulation.initial_amount),
+        ExportColumn("monthly_contribution", "Versement mensuel", SavingsSimulation.monthly_contribution),
+        ExportColumn("duration_months", "Durée (mois)", SavingsSimulation.duration_months),
+        ExportColumn("final_amount", "Montant final", SavingsSimulation.final_amount),
+        ExportColumn("total_contributions", "Total versé", SavingsSimulation.total_contributions),
+        ExportColumn("total_interest", "Intérêts", SavingsSimulation.total_interest),
+        ExportColumn("effective_rate", "Taux effectif", SavingsSimulation.effective_rate),
+        ExportColumn("client_ip", "IP", SavingsSimulation.client_ip),
+        ExportColumn("created_at", "Date", SavingsSimulation.created_at),
+    ), SavingsSimulation.created_at, SavingsSimulation.created_at.asc()),
+    "insurance-quotes": ((
+        ExportColumn("id", "ID", InsuranceQuote.id),
+        ExportColumn("session_id", "Session", InsuranceQuote.session_id),
+        ExportColumn("insurance_product_id", "Produit", InsuranceQuote.insurance_product_id),
+        ExportColumn("insurance_type", "Type", InsuranceQuote.insurance_type),
+        ExportColumn("age", "Âge", InsuranceQuote.age),
+        ExportColumn("coverage_amount", "Couverture", InsuranceQuote.coverage_amount),
+        ExportColumn("monthly_premium", "Prime mensuelle", InsuranceQuote.monthly_premium),
+        ExportColumn("annual_premium", "Prime annuelle", InsuranceQuote.annual_premium),
+        ExportColumn("deductible", "Franchise", InsuranceQuote.deductible),
+        ExportColumn("valid_until", "Valide jusqu'au", InsuranceQuote.valid_until),
+        ExportColumn("client_ip", "IP", InsuranceQuote.client_ip),
+        ExportColumn("created_at", "Date", InsuranceQuote.created_at),
+    ), InsuranceQuote.created_at, InsuranceQuote.created_at.asc()),
+    "audit-logs": ((
+        ExportColumn("id", "ID", AuditLog.id),
+        ExportColumn("admin_user_id", "Administrateur", AuditLog.admin_user_id),
+        ExportColumn("action", "Action", AuditLog.action),
+        ExportColumn("entity_type", "Entité", AuditLog.entity_type),
+        ExportColumn("entity_id", "ID entité", AuditLog.entity_id),
+        ExportColumn("old_values", "Anciennes valeurs", AuditLog.old_values),
+        ExportColumn("new_values", "Nouvelles valeurs", AuditLog.new_values),
+        ExportColumn("ip_address", "IP", AuditLog.ip_address),
+        ExportColumn("created_at", "Date", AuditLog.created_at),
+    ), AuditLog.created_at, AuditLog.created_at.asc()),
+}
+
+def build_export(dataset: str, format: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Réponse en flux pour un jeu de données, filtré sur sa date de création"""
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Export inconnu: {dataset}")
+
+    columns, date_column, ordering = EXPORT_DATASETS[dataset]
+    statement = select(*[column.expression for column in columns]).order_by(ordering)
+    if since:
+        statement = statement.where(date_column >= since)
+    if until:
+        statement = statement.where(date_column < until)
+
+    filename = f"{dataset}_{datetime.now().strftime('%Y%m%d')}"
+    return export_response(statement, columns, format, filename)
+
+# ==================== ENDPOINTS ====================
+
+@router.get("")
+def list_exports():
+    """Jeux de données exportables"""
+    return {
+        "datasets": list(EXPORT_DATASETS.keys()),
+        "formats": list(EXPORT_FORMATS)
+    }
+
+@router.get("/{dataset}")
+def export_dataset(
+    dataset: str,
+    format: str = Query("csv", regex=EXPORT_FORMAT_PATTERN),
+    since: Optional[datetime] = Query(None, description="Date de création minimale (incluse)"),
+    until: Optional[datetime] = Query(None, description="Date de création maximale (exclue)")
+):
+    """Exporte un jeu de données en flux, sans le charger en mémoire"""
+    return build_export(dataset, format, since, until)
@@ -1,16 +1,21 @@
 # routers/insurance.py - Version corrigée
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, contains_eager
 from sqlalchemy import and_, or_
 from typing import List, Optional
-from database import get_db
-from models import InsuranceProduct, InsuranceCompany
+from database import get_db, get_read_db
+from models import InsuranceProduct, InsuranceCompany, INSURANCE_COMPANY_CARD_PROFILE
 import uuid
 from datetime import datetime, timedelta
 import json
+from fieldsets import parse_fields, query_options, serialize
 
 router = APIRouter()
 
+# Relations exposables via ?fields=company.name et champs de la vue compacte
+INSURANCE_PRODUCT_RELATIONS = {"company": InsuranceProduct.insurance_company}
+INSURANCE_PRODUCT_COMPACT_FIELDS = ("id", "name", "type", "base_premium", "company.id", "company.name", "company.logo_url")
+
 # Import conditionnel pour InsuranceQuote
 try:
     from models import InsuranceQuote
@@ -22,16 +27,22 @@ except ImportError:
 
 @router.get("/products")
 def get_insurance_products(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     insurance_type: Optional[str] = Query(None, description="Type d'assurance (auto, habitation, vie, sante, voyage, etc.)"),
     type: Optional[str] = Query(None, description="Type d'assurance (auto, habitation, vie, sante, voyage, etc.)"),
     company_id: Optional[str] = Query(None, description="ID de la compagnie d'assurance"),
     min_premium: Optional[float] = Query(None, description="Prime minimum"),
     max_premium: Optional[float] = Query(None, description="Prime maximum"),
     limit: int = Query(10, le=50),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Champs à retourner (ex: id,name,base_premium,company.name)"),
+    view: Optional[str] = Query(None, description="Vue: full ou compact")
 ):
     """Récupérer les produits d'assurance avec filtres"""
+    selection = parse_fields(
+        InsuranceProduct, fields, view,
+        INSURANCE_PRODUCT_RELATIONS, INSURANCE_PRODUCT_COMPACT_FIELDS
+    )
     try:
         # Construction de la requête de base - CORRECTION: éviter la jointure directe
         query = db.query(InsuranceProduct).filter(
@@ -57,11 +68,22 @@ def get_insurance_products(
             query = query.filter(InsuranceProduct.base_premium <= max_premium)
         
         # CORRECTION: Utiliser options pour la jointure eager loading
-        query = query.options(joinedload(InsuranceProduct.insurance_company))
+        if selection:
+            # La jointure sert déjà au filtre sur la compagnie : on la réutilise
+            query = query.options(*query_options(
+                InsuranceProduct, selection, INSURANCE_PRODUCT_RELATIONS, loader=contains_eager
+            ))
+        else:
+            query = query.options(
+                joinedload(InsuranceProduct.insurance_company).options(*INSURANCE_COMPANY_CARD_PROFILE)
+            )
         
         # Pagination et exécution
         products = query.offset(offset).limit(limit).all()
         
+        if selection:
+            return [serialize(product, selection, INSURANCE_PRODUCT_RELATIONS) for product in products]
+        
         # Format de la réponse avec sérialisation JSON correcte
         response_data = []
         for product in products:
@@ -134,7 +156,7 @@ def get_insurance_products(
 # Alternative avec une requête plus simple si le problème persiste
 @router.get("/products-simple")
 def get_insurance_products_simple(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     insurance_type: Optional[str] = Query(None),
     limit: int = Query(10, le=50),
     offset: int = Query(0, ge=0)
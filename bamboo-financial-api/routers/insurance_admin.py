@@ -1,5 +1,5 @@
 # routers/insurance_admin.py - Version corrigée avec routing correct
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, desc, func
 from typing import List, Optional, Dict, Any
@@ -9,7 +9,14 @@ import uuid
 import json
 
 from database import get_db
-from models import InsuranceProduct, InsuranceCompany
+from fieldsets import parse_fields, query_options, serialize
+import audit_log
+import entity_stats
+import counters
+from models import (
+    InsuranceProduct, InsuranceCompany,
+    INSURANCE_COMPANY_CARD_PROFILE, INSURANCE_COMPANY_LIST_PROFILE, INSURANCE_COMPANY_DETAIL_PROFILE
+)
 
 # Import conditionnel pour InsuranceQuote
 try:
@@ -21,6 +28,13 @@ except ImportError:
 
 router = APIRouter(prefix="/admin/insurance", tags=["insurance_admin"]) 
 
+# Champs des listes partielles (?fields=...) et des vues compactes
+INSURANCE_COMPANY_EXTRA_FIELDS = ("products_count",)
+INSURANCE_COMPANY_COMPACT_FIELDS = ("id", "name", "logo_url", "rating", "is_active", "products_count")
+INSURANCE_PRODUCT_RELATIONS = {"insurance_company": InsuranceProduct.insurance_company}
+INSURANCE_PRODUCT_EXTRA_FIELDS = ("quotes_count", "last_quote_date")
+INSURANCE_PRODUCT_COMPACT_FIELDS = ("id", "name", "type", "base_premium", "is_active", "insurance_company.id", "insurance_company.name")
+
 # ==================== SCHEMAS PYDANTIC ====================
 
 class InsuranceCompanyCreate(BaseModel):
@@ -140,9 +154,15 @@ def get_insurance_companies_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=100),
     search: Optional[str] = Query(None),
-    is_active: Optional[bool] = Query(None)
+    is_active: Optional[bool] = Query(None),
+    fields: Optional[str] = Query(None, description="Champs à retourner (ex: id,name,products_count)"),
+    view: Optional[str] = Query(None, description="Vue: full ou compact")
 ):
     """Récupérer toutes les compagnies d'assurance pour le backoffice"""
+    selection = parse_fields(
+        InsuranceCompany, fields, view,
+        compact=INSURANCE_COMPANY_COMPACT_FIELDS, extras=INSURANCE_COMPANY_EXTRA_FIELDS
+    )
     try:
         query = db.query(InsuranceCompany)
         
@@ -163,15 +183,26 @@ def get_insurance_companies_admin(
         
         # Pagination
         total = query.count()
-        companies = query.order_by(desc(InsuranceCompany.created_at)).offset(skip).limit(limit).all()
+        loader_options = query_options(InsuranceCompany, selection) if selection else INSURANCE_COMPANY_LIST_PROFILE
+        companies = query.options(*loader_options).order_by(
+            desc(InsuranceCompany.created_at)
+        ).offset(skip).limit(limit).all()
+        
+        # Produits actifs de toute la page en une requête groupée
+        products_counts = {}
+        if not selection or selection.wants("products_count"):
+            products_counts = entity_stats.company_product_counts(db, [company.id for company in companies])
         
         companies_data = []
         for company in companies:
-            # Compter les produits actifs
-            products_count = db.query(InsuranceProduct).filter(
-                InsuranceProduct.insurance_company_id == company.id,
-                InsuranceProduct.is_active == True
-            ).count()
+            if selection:
+                company_data = serialize(company, selection)
+                if selection.wants("products_count"):
+                    company_data["products_count"] = products_counts.get(company.id, 0)
+                companies_data.append(company_data)
+                continue
+            
+            products_count = products_counts.get(company.id, 0)
             
             # Sérialiser correctement les données JSON
             specialties = safe_serialize_json_field(company.specialties, [])
@@ -218,7 +249,9 @@ def get_insurance_company_admin(
 ):
     """Récupérer une compagnie d'assurance spécifique"""
     try:
-        company = db.query(InsuranceCompany).filter(InsuranceCompany.id == company_id).first()
+        company = db.query(InsuranceCompany).options(*INSURANCE_COMPANY_DETAIL_PROFILE).filter(
+            InsuranceCompany.id == company_id
+        ).first()
         
         if not company:
             raise HTTPException(status_code=404, detail="Compagnie non trouvée")
@@ -269,6 +302,7 @@ def get_insurance_company_admin(
 @router.post("/companies")
 def create_insurance_company(
     company_data: InsuranceCompanyCreate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Créer une nouvelle compagnie d'assurance"""
@@ -279,7 +313,7 @@ def create_insurance_company(
             raise HTTPException(status_code=400, detail={"errors": errors})
         
         # Vérifier l'unicité du nom
-        existing = db.query(InsuranceCompany).filter(
+        existing = db.query(InsuranceCompany.id).filter(
             InsuranceCompany.name == company_data.name.strip()
         ).first()
         
@@ -315,6 +349,7 @@ def create_insurance_company(
         db.add(company)
         db.commit()
         db.refresh(company)
+        audit_log.record_request(request, "CREATE", "insurance_company", company.id, None, company_data.dict())
         
         return {
             "message": "Compagnie d'assurance créée avec succès",
@@ -338,6 +373,7 @@ def create_insurance_company(
 def update_insurance_company(
     company_id: str,
     company_data: InsuranceCompanyUpdate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Mettre à jour une compagnie d'assurance"""
@@ -354,7 +390,7 @@ def update_insurance_company(
         
         # Vérifier l'unicité du nom (sauf pour la compagnie actuelle)
         if company_data.name and company_data.name.strip() != company.name:
-            existing = db.query(InsuranceCompany).filter(
+            existing = db.query(InsuranceCompany.id).filter(
                 InsuranceCompany.name == company_data.name.strip(),
                 InsuranceCompany.id != company_id
             ).first()
@@ -364,6 +400,7 @@ def update_insurance_company(
         
         # Mettre à jour les champs
         update_data = company_data.dict(exclude_unset=True)
+        before = audit_log.snapshot(company, update_data)
         for field, value in update_data.items():
             if field in ['specialties', 'coverage_areas'] and value is not None:
                 value = value if isinstance(value, list) else []
@@ -376,6 +413,9 @@ def update_insurance_company(
         
         db.commit()
         db.refresh(company)
+        old_values, new_values = audit_log.changes(before, company)
+        if new_values:
+            audit_log.record_request(request, "UPDATE", "insurance_company", company_id, old_values, new_values)
         
         return {
             "message": "Compagnie mise à jour avec succès",
@@ -398,6 +438,7 @@ def update_insurance_company(
 @router.delete("/companies/{company_id}")
 def delete_insurance_company(
     company_id: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Supprimer une compagnie d'assurance"""
@@ -425,13 +466,19 @@ def delete_insurance_company(
         ).count()
         
         if total_products > 0:
+            was_active = company.is_active
             company.is_active = False
             company.updated_at = datetime.now()
             db.commit()
+            audit_log.record_request(
+                request, "UPDATE", "insurance_company", company_id, {"is_active": was_active}, {"is_active": False}
+            )
             return {"message": "Compagnie désactivée avec succès (produits inactifs liés)"}
         else:
+            company_name = company.name
             db.delete(company)
             db.commit()
+            audit_log.record_request(request, "DELETE", "insurance_company", company_id, {"name": company_name}, None)
             return {"message": "Compagnie supprimée avec succès"}
         
     except HTTPException:
@@ -453,13 +500,21 @@ def get_insurance_products_admin(
     company_id: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
     min_premium: Optional[float] = Query(None),
-    max_premium: Optional[float] = Query(None)
+    max_premium: Optional[float] = Query(None),
+    fields: Optional[str] = Query(None, description="Champs à retourner (ex: id,name,insurance_company.name)"),
+    view: Optional[str] = Query(None, description="Vue: full ou compact")
 ):
     """Récupérer tous les produits d'assurance pour le backoffice"""
+    selection = parse_fields(
+        InsuranceProduct, fields, view,
+        INSURANCE_PRODUCT_RELATIONS, INSURANCE_PRODUCT_COMPACT_FIELDS, INSURANCE_PRODUCT_EXTRA_FIELDS
+    )
     try:
-        query = db.query(InsuranceProduct).options(
-            joinedload(InsuranceProduct.insurance_company)
-        )
+        if selection:
+            loader_options = query_options(InsuranceProduct, selection, INSURANCE_PRODUCT_RELATIONS)
+        else:
+            loader_options = [joinedload(InsuranceProduct.insurance_company).options(*INSURANCE_COMPANY_CARD_PROFILE)]
+        query = db.query(InsuranceProduct).options(*loader_options)
         
         # Filtrage par recherche
         if search:
@@ -496,25 +551,23 @@ def get_insurance_products_admin(
         total = query.count()
         products = query.order_by(desc(InsuranceProduct.created_at)).offset(skip).limit(limit).all()
         
+        # Devis de toute la page en une requête groupée
+        quote_stats = {}
+        if INSURANCE_QUOTE_AVAILABLE and (not selection or selection.extras):
+            quote_stats = entity_stats.product_quote_stats(db, [product.id for product in products])
+        
         products_data = []
         for product in products:
-            # Compter les devis
-            quotes_count = 0
-            last_quote_date = None
-            if INSURANCE_QUOTE_AVAILABLE:
-                try:
-                    from models import InsuranceQuote
-                    quotes_count = db.query(InsuranceQuote).filter(
-                        InsuranceQuote.insurance_product_id == product.id
-                    ).count()
-                    
-                    last_quote = db.query(InsuranceQuote).filter(
-                        InsuranceQuote.insurance_product_id == product.id
-                    ).order_by(desc(InsuranceQuote.created_at)).first()
-                    
-                    last_quote_date = last_quote.created_at if last_quote else None
-                except Exception:
-                    quotes_count = 0
+            quotes_count, last_quote_date = quote_stats.get(product.id, (0, None))
+            if selection:
+                product_data = serialize(product, selection, INSURANCE_PRODUCT_RELATIONS)
+                if selection.extras:
+                    if selection.wants("quotes_count"):
+                        product_data["quotes_count"] = quotes_count
+                    if selection.wants("last_quote_date"):
+                        product_data["last_quote_date"] = last_quote_date.isoformat() if last_quote_date else None
+                products_data.append(product_data)
+                continue
             
             # Sérialiser correctement les données JSON
             coverage_details = safe_serialize_json_field(product.coverage_details, {})
@@ -572,7 +625,7 @@ def get_insurance_product_admin(
     """Récupérer un produit d'assurance spécifique pour le backoffice"""
     try:
         product = db.query(InsuranceProduct).options(
-            joinedload(InsuranceProduct.insurance_company)
+            joinedload(InsuranceProduct.insurance_company).options(*INSURANCE_COMPANY_LIST_PROFILE)
         ).filter(InsuranceProduct.id == product_id).first()
         
         if not product:
@@ -645,6 +698,7 @@ def get_insurance_product_admin(
 @router.post("/products")
 def create_insurance_product(
     product_data: InsuranceProductCreate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Créer un nouveau produit d'assurance"""
@@ -730,6 +784,7 @@ def create_insurance_product(
         db.add(product)
         db.commit()
         db.refresh(product)
+        audit_log.record_request(request, "CREATE", "insurance_product", product.id, None, product_data.dict())
         
         return {
             "message": "Produit d'assurance créé avec succès",
@@ -757,6 +812,7 @@ def create_insurance_product(
 def update_insurance_product(
     product_id: str,
     product_data: InsuranceProductUpdate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Mettre à jour un produit d'assurance"""
@@ -814,6 +870,7 @@ def update_insurance_product(
             update_data['coverage_details'] = coverage_details
         
         # Appliquer les mises à jour
+        before = audit_log.snapshot(product, update_data)
         for field, value in update_data.items():
             if field in ['name', 'description'] and value is not None:
                 value = value.strip() if isinstance(value, str) else value
@@ -823,6 +880,9 @@ def update_insurance_product(
         
         db.commit()
         db.refresh(product)
+        old_values, new_values = audit_log.changes(before, product)
+        if new_values:
+            audit_log.record_request(request, "UPDATE", "insurance_product", product_id, old_values, new_values)
         
         return {
             "message": "Produit mis à jour avec succès",
@@ -845,6 +905,7 @@ def update_insurance_product(
 @router.delete("/products/{product_id}")
 def delete_insurance_product(
     product_id: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Supprimer un produit d'assurance"""
@@ -864,15 +925,21 @@ def delete_insurance_product(
                 
                 if quotes_count > 0:
                     # Désactiver au lieu de supprimer
+                    was_active = product.is_active
                     product.is_active = False
                     product.updated_at = datetime.now()
                     db.commit()
+                    audit_log.record_request(
+                        request, "UPDATE", "insurance_product", product_id, {"is_active": was_active}, {"is_active": False}
+                    )
                     return {"message": f"Produit désactivé (il y a {quotes_count} devis liés)"}
             except Exception:
                 pass
         
+        product_name = product.name
         db.delete(product)
         db.commit()
+        audit_log.record_request(request, "DELETE", "insurance_product", product_id, {"name": product_name}, None)
         
         return {"message": "Produit supprimé avec succès"}
         
@@ -889,34 +956,19 @@ def delete_insurance_product(
 def get_insurance_admin_stats(db: Session = Depends(get_db)):
     """Récupérer les statistiques administratives des assurances"""
     try:
-        # Statistiques des compagnies
-        total_companies = db.query(InsuranceCompany).count()
-        active_companies = db.query(InsuranceCompany).filter(InsuranceCompany.is_active == True).count()
-        
-        # Statistiques des produits
-        total_products = db.query(InsuranceProduct).count()
-        active_products = db.query(InsuranceProduct).filter(InsuranceProduct.is_active == True).count()
-        
-        # Produits par type
-        products_by_type = db.query(
-            InsuranceProduct.type,
-            func.count(InsuranceProduct.id).label("count")
-        ).filter(InsuranceProduct.is_active == True).group_by(InsuranceProduct.type).all()
+        # Compteurs en mémoire (counters.py)
+        total_companies = counters.count("insurance_companies")
+        active_companies = counters.count("insurance_companies", "active")
+        total_products = counters.count("insurance_products")
+        active_products = counters.count("insurance_products", "active")
+        products_by_type = counters.breakdown("insurance_products_active_by_type")
+        total_quotes = counters.count("insurance_quotes") if INSURANCE_QUOTE_AVAILABLE else 0
         
         # Prime moyenne
         avg_premium = db.query(func.avg(InsuranceProduct.base_premium)).filter(
             InsuranceProduct.is_active == True
         ).scalar() or 0
         
-        # Statistiques des devis (si disponible)
-        total_quotes = 0
-        if INSURANCE_QUOTE_AVAILABLE:
-            try:
-                from models import InsuranceQuote
-                total_quotes = db.query(InsuranceQuote).count()
-            except Exception:
-                total_quotes = 0
-        
         result = {
             "companies": {
                 "total": total_companies,
@@ -932,8 +984,8 @@ def get_insurance_admin_stats(db: Session = Depends(get_db)):
                 "total": total_quotes
             },
             "products_by_type": [
-                {"type": item.type, "count": item.count}
-                for item in products_by_type
+                {"type": product_type, "count": count}
+                for product_type, count in products_by_type.items()
             ],
             "average_premium": float(avg_premium)
         }
@@ -1,12 +1,14 @@
 # routers/savings.py - Version corrigée avec gestion d'erreurs
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select
 from typing import List, Optional
 import models
 import schemas
-from database import get_db
+from database import get_async_db, get_read_lazy_db, LazySession
+from fieldsets import parse_fields, query_options, serialize
 import uuid
 from datetime import datetime
 import logging
@@ -15,6 +17,10 @@ import json
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Relations exposables via ?fields=bank.name et champs de la vue compacte
+SAVINGS_PRODUCT_RELATIONS = {"bank": models.SavingsProduct.bank}
+SAVINGS_PRODUCT_COMPACT_FIELDS = ("id", "name", "type", "interest_rate", "minimum_deposit", "liquidity", "bank.id", "bank.name", "bank.logo_url")
+
 @router.get("/products")
 async def get_savings_products(
     skip: int = Query(0, ge=0),
@@ -23,32 +29,51 @@ async def get_savings_products(
     bank_id: Optional[str] = Query(None, description="ID de la banque"),
     min_rate: Optional[float] = Query(None, description="Taux minimum"),
     liquidity: Optional[str] = Query(None, description="Type de liquidité (immediate, notice, term)"),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Champs à retourner (ex: id,name,interest_rate,bank.name)"),
+    view: Optional[str] = Query(None, description="Vue: full ou compact"),
+    db: LazySession = Depends(get_read_lazy_db)
 ):
     """Récupère tous les produits d'épargne avec filtres optionnels"""
+    selection = parse_fields(
+        models.SavingsProduct, fields, view,
+        SAVINGS_PRODUCT_RELATIONS, SAVINGS_PRODUCT_COMPACT_FIELDS
+    )
     try:
-        query = db.query(models.SavingsProduct).join(models.Bank).filter(
+        if selection:
+            # La jointure sert déjà au filtre sur la banque : on la réutilise
+            loader_options = query_options(
+                models.SavingsProduct, selection, SAVINGS_PRODUCT_RELATIONS, loader=contains_eager
+            )
+        else:
+            loader_options = [contains_eager(models.SavingsProduct.bank).options(*models.BANK_LIST_PROFILE)]
+        query = select(models.SavingsProduct).join(models.Bank).options(
+            *loader_options
+        ).where(
             models.SavingsProduct.is_active == True,
             models.Bank.is_active == True
         )
         
         # Appliquer les filtres
         if type:
-            query = query.filter(models.SavingsProduct.type == type)
+            query = query.where(models.SavingsProduct.type == type)
         
         if bank_id:
-            query = query.filter(models.SavingsProduct.bank_id == bank_id)
+            query = query.where(models.SavingsProduct.bank_id == bank_id)
         
         if min_rate is not None:
-            query = query.filter(models.SavingsProduct.interest_rate >= min_rate)
+            query = query.where(models.SavingsProduct.interest_rate >= min_rate)
         
         if liquidity:
-            query = query.filter(models.SavingsProduct.liquidity == liquidity)
+            query = query.where(models.SavingsProduct.liquidity == liquidity)
         
         # Trier par taux décroissant par défaut
         query = query.order_by(models.SavingsProduct.interest_rate.desc())
         
-        products = query.offset(skip).limit(limit).all()
+        products = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
+        await db.release()
+        
+        if selection:
+            return [serialize(product, selection, SAVINGS_PRODUCT_RELATIONS) for product in products]
         
         # CORRECTION: Convertir manuellement les objets SQLAlchemy en dictionnaires
         result = []
@@ -115,13 +140,18 @@ async def get_savings_products(
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des produits d'épargne: {str(e)}")
 
 @router.get("/products/{product_id}")
-async def get_savings_product(product_id: str, db: Session = Depends(get_db)):
+async def get_savings_product(product_id: str, db: LazySession = Depends(get_read_lazy_db)):
     """Récupère un produit d'épargne par son ID"""
     try:
-        product = db.query(models.SavingsProduct).join(models.Bank).filter(
-            models.SavingsProduct.id == product_id,
-            models.SavingsProduct.is_active == True
-        ).first()
+        product = (await db.execute(
+            select(models.SavingsProduct).join(models.Bank).options(
+                contains_eager(models.SavingsProduct.bank).options(*models.BANK_LIST_PROFILE)
+            ).where(
+                models.SavingsProduct.id == product_id,
+                models.SavingsProduct.is_active == True
+            )
+        )).scalars().first()
+        await db.release()
         
         if not product:
             raise HTTPException(status_code=404, detail="Produit d'épargne non trouvé")
@@ -186,16 +216,18 @@ async def get_savings_product(product_id: str, db: Session = Depends(get_db)):
 @router.post("/simulate")
 async def simulate_savings(
     request: schemas.SavingsSimulationRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     http_request: Request = None
 ):
     """Simule l'épargne avec un produit donné"""
     try:
         # Vérifier que le produit existe et est actif
-        product = db.query(models.SavingsProduct).filter(
-            models.SavingsProduct.id == request.savings_product_id,
-            models.SavingsProduct.is_active == True
-        ).first()
+        product = (await db.execute(
+            select(models.SavingsProduct).where(
+                models.SavingsProduct.id == request.savings_product_id,
+                models.SavingsProduct.is_active == True
+            )
+        )).scalars().first()
         
         if not product:
             raise HTTPException(status_code=404, detail="Produit d'épargne non trouvé")
@@ -247,13 +279,13 @@ async def simulate_savings(
             )
             
             db.add(simulation)
-            db.commit()
+            await db.commit()
             logger.info(f"Simulation saved with ID: {simulation_id}")
             created_at = datetime.utcnow()
             
         except Exception as db_error:
             logger.warning(f"Could not save simulation to database: {str(db_error)}")
-            db.rollback()
+            await db.rollback()
             created_at = datetime.utcnow()
         
         # CORRECTION: Retourner un dictionnaire au lieu d'un objet Pydantic
@@ -278,7 +310,7 @@ async def simulate_savings(
         raise
     except Exception as e:
         logger.error(f"Error in savings simulation: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Erreur lors de la simulation: {str(e)}")
 
 def calculate_savings_simulation(
@@ -393,12 +425,14 @@ def generate_savings_recommendations(simulation_result: dict, product) -> List[s
     return recommendations
 
 @router.get("/types")
-async def get_savings_types(db: Session = Depends(get_db)):
+async def get_savings_types(db: LazySession = Depends(get_read_lazy_db)):
     """Récupère tous les types d'épargne disponibles"""
     try:
-        types = db.query(models.SavingsProduct.type).filter(
-            models.SavingsProduct.is_active == True
-        ).distinct().all()
+        types = (await db.execute(
+            select(models.SavingsProduct.type).where(
+                models.SavingsProduct.is_active == True
+            ).distinct()
+        )).all()
         
         return [{"type": t[0], "label": get_type_label(t[0])} for t in types]
         
@@ -1,10 +1,10 @@
 # savings_products_router.py - Endpoints FastAPI pour les produits d'épargne
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, desc, asc
 from typing import List, Optional
 from database import get_db
-from models import SavingsProduct, Bank
+from models import SavingsProduct, Bank, BANK_CARD_PROFILE
 from schemas import (
     SavingsProductCreate, 
     SavingsProductUpdate, 
@@ -14,9 +14,16 @@ from schemas import (
 )
 import uuid
 from datetime import datetime
+from fieldsets import parse_fields, query_options, serialize
+import audit_log
+import counters
 
 router = APIRouter(prefix="/admin/savings-products", tags=["savings_admin"]) 
 
+# Relations exposables via ?fields=bank.name et champs de la vue compacte
+SAVINGS_PRODUCT_RELATIONS = {"bank": SavingsProduct.bank}
+SAVINGS_PRODUCT_COMPACT_FIELDS = ("id", "name", "type", "interest_rate", "is_active", "is_featured", "bank.id", "bank.name")
+
 @router.get("/", response_model=dict)
 def get_savings_products(
     db: Session = Depends(get_db),
@@ -27,14 +34,24 @@ def get_savings_products(
     type: Optional[str] = Query(None, description="Filtrer par type de produit"),
     status: Optional[str] = Query(None, description="Filtrer par statut (active/inactive)"),
     sort_by: Optional[str] = Query("created_at", description="Champ de tri"),
-    sort_order: Optional[str] = Query("desc", description="Ordre de tri (asc/desc)")
+    sort_order: Optional[str] = Query("desc", description="Ordre de tri (asc/desc)"),
+    fields: Optional[str] = Query(None, description="Champs à retourner (ex: id,name,interest_rate,bank.name)"),
+    view: Optional[str] = Query(None, description="Vue: full ou compact")
 ):
     """
     Récupère la liste des produits d'épargne avec pagination et filtres
     """
+    selection = parse_fields(
+        SavingsProduct, fields, view,
+        SAVINGS_PRODUCT_RELATIONS, SAVINGS_PRODUCT_COMPACT_FIELDS
+    )
     try:
         # Construction de la requête de base
-        query = db.query(SavingsProduct).options(joinedload(SavingsProduct.bank))
+        if selection:
+            loader_options = query_options(SavingsProduct, selection, SAVINGS_PRODUCT_RELATIONS)
+        else:
+            loader_options = [joinedload(SavingsProduct.bank).options(*BANK_CARD_PROFILE)]
+        query = db.query(SavingsProduct).options(*loader_options)
         
         # Application des filtres
         filters = []
@@ -81,8 +98,10 @@ def get_savings_products(
         total_pages = (total + limit - 1) // limit
         current_page = (skip // limit) + 1
         
-        return {
-            "products": [
+        if selection:
+            items = [serialize(product, selection, SAVINGS_PRODUCT_RELATIONS) for product in products]
+        else:
+            items = [
                 {
                     "id": product.id,
                     "name": product.name,
@@ -105,7 +124,10 @@ def get_savings_products(
                     } if product.bank else None
                 }
                 for product in products
-            ],
+            ]
+        
+        return {
+            "products": items,
             "pagination": {
                 "total": total,
                 "skip": skip,
@@ -128,6 +150,7 @@ def get_savings_products(
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
 def create_savings_product(
     product_data: SavingsProductCreate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -135,7 +158,7 @@ def create_savings_product(
     """
     try:
         # Vérifier que la banque existe
-        bank = db.query(Bank).filter(Bank.id == product_data.bank_id).first()
+        bank = db.query(Bank.id).filter(Bank.id == product_data.bank_id).first()
         if not bank:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -218,6 +241,7 @@ def create_savings_product(
             db.commit()
             db.refresh(new_product)
             print(f"Produit créé avec succès : {new_product.id}")
+            audit_log.record_request(request, "CREATE", "savings_product", new_product.id, None, product_data.dict())
         except Exception as commit_error:
             db.rollback()
             print(f"Erreur lors du commit: {commit_error}")
@@ -271,7 +295,7 @@ def get_savings_product(
     """
     try:
         product = db.query(SavingsProduct).options(
-            joinedload(SavingsProduct.bank)
+            joinedload(SavingsProduct.bank).options(*BANK_CARD_PROFILE)
         ).filter(SavingsProduct.id == product_id).first()
         
         if not product:
@@ -326,6 +350,7 @@ def get_savings_product(
 def update_savings_product(
     product_id: str,
     product_data: SavingsProductUpdate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -342,7 +367,7 @@ def update_savings_product(
         
         # Vérification de la banque si changée
         if product_data.bank_id and product_data.bank_id != product.bank_id:
-            bank = db.query(Bank).filter(Bank.id == product_data.bank_id).first()
+            bank = db.query(Bank.id).filter(Bank.id == product_data.bank_id).first()
             if not bank:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -351,6 +376,7 @@ def update_savings_product(
         
         # Mise à jour des champs modifiés
         update_data = product_data.dict(exclude_unset=True)
+        before = audit_log.snapshot(product, update_data)
         
         for field, value in update_data.items():
             if hasattr(product, field):
@@ -360,6 +386,9 @@ def update_savings_product(
         
         db.commit()
         db.refresh(product)
+        old_values, new_values = audit_log.changes(before, product)
+        if new_values:
+            audit_log.record_request(request, "UPDATE", "savings_product", product_id, old_values, new_values)
         
         return {
             "message": "Produit d'épargne mis à jour avec succès",
@@ -378,6 +407,7 @@ def update_savings_product(
 @router.delete("/{product_id}", response_model=dict)
 def delete_savings_product(
     product_id: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -400,9 +430,13 @@ def delete_savings_product(
         
         if simulations_count > 0:
             # Désactiver le produit au lieu de le supprimer
+            was_active = product.is_active
             product.is_active = False
             product.updated_at = datetime.utcnow()
             db.commit()
+            audit_log.record_request(
+                request, "UPDATE", "savings_product", product_id, {"is_active": was_active}, {"is_active": False}
+            )
             
             return {
                 "message": f"Produit désactivé (il y a {simulations_count} simulation(s) associée(s))",
@@ -410,8 +444,10 @@ def delete_savings_product(
             }
         else:
             # Suppression définitive
+            product_name = product.name
             db.delete(product)
             db.commit()
+            audit_log.record_request(request, "DELETE", "savings_product", product_id, {"name": product_name}, None)
             
             return {
                 "message": "Produit d'épargne supprimé avec succès",
@@ -433,7 +469,9 @@ def get_banks_for_products(db: Session = Depends(get_db)):
     Récupère la liste des banques pour les formulaires de produits
     """
     try:
-        banks = db.query(Bank).filter(Bank.is_active == True).order_by(Bank.name).all()
+        banks = db.query(Bank).options(*BANK_CARD_PROFILE).filter(
+            Bank.is_active == True
+        ).order_by(Bank.name).all()
         
         return {
             "banks": [
@@ -461,16 +499,11 @@ def get_savings_products_statistics(db: Session = Depends(get_db)):
     try:
         from sqlalchemy import func
         
-        # Statistiques globales
-        total_products = db.query(SavingsProduct).count()
-        active_products = db.query(SavingsProduct).filter(SavingsProduct.is_active == True).count()
-        featured_products = db.query(SavingsProduct).filter(SavingsProduct.is_featured == True).count()
-        
-        # Statistiques par type
-        type_stats = db.query(
-            SavingsProduct.type,
-            func.count(SavingsProduct.id).label('count')
-        ).group_by(SavingsProduct.type).all()
+        # Statistiques globales et par type (compteurs en mémoire)
+        total_products = counters.count("savings_products")
+        active_products = counters.count("savings_products", "active")
+        featured_products = counters.count("savings_products_featured", "featured")
+        type_stats = counters.breakdown("savings_products_by_type")
         
         # Statistiques par banque
         bank_stats = db.query(
@@ -494,8 +527,8 @@ def get_savings_products_statistics(db: Session = Depends(get_db)):
                 "inactive_products": total_products - active_products
             },
             "by_type": [
-                {"type": stat.type, "count": stat.count}
-                for stat in type_stats
+                {"type": product_type, "count": count}
+                for product_type, count in type_stats.items()
             ],
             "by_bank": [
                 {"bank_name": stat.name, "count": stat.count}
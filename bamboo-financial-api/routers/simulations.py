@@ -1,11 +1,13 @@
 # routers/simulations.py - Router pour les simulations de crédit et épargne
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from typing import Optional
 import uuid
 import models
 import schemas
-from database import get_db
+from database import get_async_db
 from datetime import datetime
 import math
 
@@ -15,15 +17,19 @@ router = APIRouter()
 async def simulate_credit(
     simulation_request: schemas.CreditSimulationRequest,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Effectue une simulation de crédit"""
     
     # Vérifier que le produit existe
-    product = db.query(models.CreditProduct).filter(
-        models.CreditProduct.id == simulation_request.credit_product_id,
-        models.CreditProduct.is_active == True
-    ).first()
+    product = (await db.execute(
+        select(models.CreditProduct).options(
+            joinedload(models.CreditProduct.bank).options(*models.BANK_CARD_PROFILE)
+        ).where(
+            models.CreditProduct.id == simulation_request.credit_product_id,
+            models.CreditProduct.is_active == True
+        )
+    )).scalars().first()
     
     if not product:
         raise HTTPException(status_code=404, detail="Produit de crédit non trouvé")
@@ -71,14 +77,15 @@ async def simulate_credit(
         )
         
         db.add(db_simulation)
-        db.commit()
-        db.refresh(db_simulation)
+        await db.commit()
+        await db.refresh(db_simulation)
         
         simulation_result.id = db_simulation.id
         simulation_result.simulation_id = db_simulation.id
         
     except Exception as e:
         print(f"Erreur sauvegarde simulation: {e}")
+        await db.rollback()
         # Continuer même si la sauvegarde échoue
         pass
     
@@ -88,15 +95,19 @@ async def simulate_credit(
 async def simulate_savings(
     simulation_request: schemas.SavingsSimulationRequest,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Effectue une simulation d'épargne"""
     
     # Vérifier que le produit existe
-    product = db.query(models.SavingsProduct).filter(
-        models.SavingsProduct.id == simulation_request.savings_product_id,
-        models.SavingsProduct.is_active == True
-    ).first()
+    product = (await db.execute(
+        select(models.SavingsProduct).options(
+            joinedload(models.SavingsProduct.bank).options(*models.BANK_CARD_PROFILE)
+        ).where(
+            models.SavingsProduct.id == simulation_request.savings_product_id,
+            models.SavingsProduct.is_active == True
+        )
+    )).scalars().first()
     
     if not product:
         raise HTTPException(status_code=404, detail="Produit d'épargne non trouvé")
@@ -131,25 +142,34 @@ async def simulate_savings(
         )
         
         db.add(db_simulation)
-        db.commit()
-        db.refresh(db_simulation)
+        await db.commit()
+        await db.refresh(db_simulation)
         
         simulation_result.id = db_simulation.id
         simulation_result.simulation_id = db_simulation.id
         
     except Exception as e:
         print(f"Erreur sauvegarde simulation épargne: {e}")
+        await db.rollback()
         pass
     
     return simulation_result
 
 @router.get("/credit/{simulation_id}", response_model=schemas.CreditSimulationResponse)
-async def get_credit_simulation(simulation_id: str, db: Session = Depends(get_db)):
+async def get_credit_simulation(simulation_id: str, db: AsyncSession = Depends(get_async_db)):
     """Récupère une simulation de crédit"""
     
-    simulation = db.query(models.CreditSimulation).filter(
-        models.CreditSimulation.id == simulation_id
-    ).first()
+    # Le produit et sa banque sont sérialisés par le schéma : chargés ici, pas de lazy load en async
+    simulation = (await db.execute(
+        select(models.CreditSimulation).options(
+            *models.CREDIT_SIMULATION_DETAIL_PROFILE,
+            selectinload(models.CreditSimulation.credit_product).joinedload(
+                models.CreditProduct.bank
+            ).options(*models.BANK_LIST_PROFILE)
+        ).where(
+            models.CreditSimulation.id == simulation_id
+        )
+    )).scalars().first()
     
     if not simulation:
         raise HTTPException(status_code=404, detail="Simulation non trouvée")
@@ -157,12 +177,19 @@ async def get_credit_simulation(simulation_id: str, db: Session = Depends(get_db
     return simulation
 
 @router.get("/savings/{simulation_id}", response_model=schemas.SavingsSimulationResponse)
-async def get_savings_simulation(simulation_id: str, db: Session = Depends(get_db)):
+async def get_savings_simulation(simulation_id: str, db: AsyncSession = Depends(get_async_db)):
     """Récupère une simulation d'épargne"""
     
-    simulation = db.query(models.SavingsSimulation).filter(
-        models.SavingsSimulation.id == simulation_id
-    ).first()
+    simulation = (await db.execute(
+        select(models.SavingsSimulation).options(
+            *models.SAVINGS_SIMULATION_DETAIL_PROFILE,
+            selectinload(models.SavingsSimulation.savings_product).joinedload(
+                models.SavingsProduct.bank
+            ).options(*models.BANK_LIST_PROFILE)
+        ).where(
+            models.SavingsSimulation.id == simulation_id
+        )
+    )).scalars().first()
     
     if not simulation:
         raise HTTPException(status_code=404, detail="Simulation non trouvée")
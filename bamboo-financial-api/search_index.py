@@ -0,0 +1,397 @@
+# search_index.py - Index de recherche plein texte des produits (PostgreSQL tsvector + trigrammes / SQLite FTS5)
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any, Tuple
+import difflib
+import logging
+import re
+import threading
+
+import models
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "product_search_index"
+SEARCH_CONFIG = "french"
+PRODUCT_TYPES = ("credit", "savings", "insurance")
+
+# Backend actif : "postgresql", "sqlite" ou None si l'index n'a pas pu être créé
+_backend: Optional[str] = None
+# Vrai quand une écriture n'a pas pu être répercutée : l'index est ignoré jusqu'à sa reconstruction
+_stale = False
+_rebuild_lock = threading.Lock()
+
+# ==================== DDL ====================
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+        product_type VARCHAR(20) NOT NULL,
+        product_id VARCHAR(50) NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        category VARCHAR(50),
+        institution_name VARCHAR(200),
+        description TEXT,
+        is_active BOOLEAN NOT NULL DEFAULT TRUE,
+        institution_active BOOLEAN NOT NULL DEFAULT TRUE,
+        document TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(category, '')), 'B') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(institution_name, '')), 'B') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')
+        ) STORED,
+        PRIMARY KEY (product_type, product_id)
+    )
+    """,
+    f"ALTER TABLE {SEARCH_TABLE} ADD COLUMN IF NOT EXISTS institution_active BOOLEAN NOT NULL DEFAULT TRUE",
+    f"CREATE INDEX IF NOT EXISTS idx_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)",
+    f"CREATE INDEX IF NOT EXISTS idx_{SEARCH_TABLE}_name_trgm ON {SEARCH_TABLE} USING GIN (name gin_trgm_ops)",
+]
+
+SQLITE_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        product_type UNINDEXED,
+        product_id UNINDEXED,
+        name,
+        category,
+        institution_name,
+        description,
+        is_active UNINDEXED,
+        institution_active UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+]
+
+def ensure_search_index(bind=None) -> bool:
+    """Crée l'index de recherche adapté au dialecte (idempotent)"""
+    global _backend
+    bind = bind or engine
+    dialect = bind.dialect.name
+
+    if dialect == "postgresql":
+        statements = POSTGRES_DDL
+    elif dialect == "sqlite":
+        statements = SQLITE_DDL
+    else:
+        logger.warning(f"Recherche plein texte non supportée pour le dialecte {dialect}")
+        _backend = None
+        return False
+
+    try:
+        with bind.begin() as connection:
+            if dialect == "sqlite":
+                # Table FTS5 non modifiable : une ancienne version (sans institution_active) est recréée
+                columns = [row[1] for row in connection.execute(text(f"PRAGMA table_info({SEARCH_TABLE})"))]
+                if columns and "institution_active" not in columns:
+                    connection.execute(text(f"DROP TABLE {SEARCH_TABLE}"))
+            for statement in statements:
+                connection.execute(text(statement))
+        _backend = dialect
+        return True
+    except Exception as e:
+        logger.error(f"Erreur création index de recherche: {e}")
+        _backend = None
+        return False
+
+def is_available() -> bool:
+    """Indique si l'index de recherche est opérationnel et à jour"""
+    return _backend is not None and not _stale
+
+def is_stale() -> bool:
+    return _stale
+
+def mark_stale():
+    """L'index ne reflète plus le catalogue : recherche de repli jusqu'à la prochaine reconstruction"""
+    global _stale
+    _stale = True
+
+# ==================== ALIMENTATION DE L'INDEX ====================
+
+def _flag(value) -> bool:
+    """Drapeau is_active, NULL valant actif (défaut des modèles)"""
+    return bool(value) if value is not None else True
+
+def _institution(connection, product_type: str, product) -> Tuple[Optional[str], bool]:
+    """Nom et statut actif de la banque ou de la compagnie rattachée au produit"""
+    if product_type == "insurance":
+        table, institution_id = "insurance_companies", product.insurance_company_id
+    else:
+        table, institution_id = "banks", product.bank_id
+
+    if not institution_id:
+        return None, True
+    row = connection.execute(
+        text(f"SELECT name, is_active FROM {table} WHERE id = :id"), {"id": institution_id}
+    ).first()
+    return (row[0], _flag(row[1])) if row else (None, True)
+
+def _upsert(connection, product_type: str, product, institution_name: Optional[str], institution_active: bool = True):
+    """Insère ou remplace le document d'un produit"""
+    params = {
+        "product_type": product_type,
+        "product_id": product.id,
+        "name": product.name or "",
+        "category": product.type,
+        "institution_name": institution_name,
+        "description": product.description,
+        "is_active": _flag(product.is_active),
+        "institution_active": institution_active,
+    }
+
+    if _backend == "postgresql":
+        connection.execute(text(f"""
+            INSERT INTO {SEARCH_TABLE}
+                (product_type, product_id, name, category, institution_name, description, is_active, institution_active)
+            VALUES
+                (:product_type, :product_id, :name, :category, :institution_name, :description, :is_active, :institution_active)
+            ON CONFLICT (product_type, product_id) DO UPDATE SET
+                name = EXCLUDED.name,
+                category = EXCLUDED.category,
+                institution_name = EXCLUDED.institution_name,
+                description = EXCLUDED.description,
+                is_active = EXCLUDED.is_active,
+                institution_active = EXCLUDED.institution_active
+        """), params)
+    else:
+        _delete(connection, product_type, product.id)
+        params["is_active"] = 1 if params["is_active"] else 0
+        params["institution_active"] = 1 if params["institution_active"] else 0
+        connection.execute(text(f"""
+            INSERT INTO {SEARCH_TABLE}
+                (product_type, product_id, name, category, institution_name, description, is_active, institution_active)
+            VALUES
+                (:product_type, :product_id, :name, :category, :institution_name, :description, :is_active, :institution_active)
+        """), params)
+
+def _delete(connection, product_type: str, product_id: str):
+    """Retire un produit de l'index"""
+    connection.execute(
+        text(f"DELETE FROM {SEARCH_TABLE} WHERE product_type = :product_type AND product_id = :product_id"),
+        {"product_type": product_type, "product_id": product_id}
+    )
+
+def _update_institution(connection, product_type: str, institution_id: str, name: str, is_active: bool):
+    """Propage le nom et le statut d'une banque ou d'une compagnie aux documents concernés"""
+    if product_type == "insurance":
+        source = "SELECT id FROM insurance_products WHERE insurance_company_id = :institution_id"
+        types = ("insurance",)
+    else:
+        source = ("SELECT id FROM credit_products WHERE bank_id = :institution_id "
+                  "UNION SELECT id FROM savings_products WHERE bank_id = :institution_id")
+        types = ("credit", "savings")
+
+    for indexed_type in types:
+        connection.execute(text(f"""
+            UPDATE {SEARCH_TABLE} SET institution_name = :name, institution_active = :is_active
+            WHERE product_type = :product_type AND product_id IN ({source})
+        """), {"name": name, "is_active": is_active if _backend == "postgresql" else int(is_active),
+               "product_type": indexed_type, "institution_id": institution_id})
+
+def rebuild_search_index(db: Session) -> int:
+    """Reconstruit entièrement l'index à partir du catalogue"""
+    global _stale
+    if _backend is None:
+        return 0
+
+    # Remis à zéro avant la lecture : une écriture en échec pendant la reconstruction le repositionne
+    _stale = False
+    connection = db.connection()
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+
+    banks = {row.id: (row.name, _flag(row.is_active))
+             for row in db.query(models.Bank.id, models.Bank.name, models.Bank.is_active)}
+    companies = {row.id: (row.name, _flag(row.is_active))
+                 for row in db.query(models.InsuranceCompany.id, models.InsuranceCompany.name,
+                                     models.InsuranceCompany.is_active)}
+
+    count = 0
+    for product in db.query(models.CreditProduct).all():
+        _upsert(connection, "credit", product, *banks.get(product.bank_id, (None, True)))
+        count += 1
+    for product in db.query(models.SavingsProduct).all():
+        _upsert(connection, "savings", product, *banks.get(product.bank_id, (None, True)))
+        count += 1
+    for product in db.query(models.InsuranceProduct).all():
+        _upsert(connection, "insurance", product, *companies.get(product.insurance_company_id, (None, True)))
+        count += 1
+
+    try:
+        db.commit()
+    except Exception:
+        _stale = True
+        raise
+    logger.info(f"Index de recherche reconstruit: {count} produits")
+    return count
+
+def init_search_index():
+    """Crée l'index au démarrage et le remplit s'il est vide"""
+    from database import SessionLocal
+
+    if not ensure_search_index():
+        return False
+
+    db = SessionLocal()
+    try:
+        indexed = db.execute(text(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")).scalar()
+        if not indexed:
+            rebuild_search_index(db)
+        return True
+    finally:
+        db.close()
+
+def refresh_if_stale() -> bool:
+    """Reconstruit l'index s'il a été marqué périmé (une seule reconstruction à la fois)"""
+    from database import SessionLocal
+
+    if not _stale or _backend is None or not _rebuild_lock.acquire(blocking=False):
+        return False
+    db = SessionLocal()
+    try:
+        rebuild_search_index(db)
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erreur reconstruction de l'index de recherche: {e}")
+        return False
+    finally:
+        db.close()
+        _rebuild_lock.release()
+
+# ==================== MAINTENANCE SUR ÉCRITURE ====================
+
+def _maintain(connection, description: str, operation):
+    """Applique une mise à jour de l'index dans un savepoint : un échec n'annule jamais l'écriture
+    du catalogue, l'index est seulement marqué périmé"""
+    if _backend is None or _stale:
+        return
+    try:
+        with connection.begin_nested():
+            operation()
+    except Exception as e:
+        logger.error(f"Erreur indexation {description}, index marqué périmé: {e}")
+        mark_stale()
+
+def _product_listener(product_type: str):
+    """Construit les listeners insert/update d'un type de produit"""
+    def after_write(mapper, connection, target):
+        _maintain(connection, f"{product_type} {target.id}", lambda: _upsert(
+            connection, product_type, target, *_institution(connection, product_type, target)
+        ))
+    return after_write
+
+def _product_delete_listener(product_type: str):
+    """Construit le listener de suppression d'un type de produit"""
+    def after_delete(mapper, connection, target):
+        _maintain(connection, f"{product_type} {target.id}", lambda: _delete(connection, product_type, target.id))
+    return after_delete
+
+def _institution_listener(product_type: str):
+    """Réindexe le nom et le statut d'institution quand une banque ou une compagnie change"""
+    def after_update(mapper, connection, target):
+        attrs = inspect(target).attrs
+        if attrs.name.history.has_changes() or attrs.is_active.history.has_changes():
+            _maintain(connection, f"institution {target.id}", lambda: _update_institution(
+                connection, product_type, target.id, target.name, _flag(target.is_active)
+            ))
+    return after_update
+
+for _model, _product_type in (
+    (models.CreditProduct, "credit"),
+    (models.SavingsProduct, "savings"),
+    (models.InsuranceProduct, "insurance"),
+):
+    event.listen(_model, 'after_insert', _product_listener(_product_type))
+    event.listen(_model, 'after_update', _product_listener(_product_type))
+    event.listen(_model, 'after_delete', _product_delete_listener(_product_type))
+
+event.listen(models.Bank, 'after_update', _institution_listener("credit"))
+event.listen(models.InsuranceCompany, 'after_update', _institution_listener("insurance"))
+
+# ==================== RECHERCHE ====================
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def _fts5_query(q: str) -> Optional[str]:
+    """Transforme la saisie utilisateur en requête FTS5 sûre (préfixes, ET implicite)"""
+    tokens = _TOKEN_RE.findall(q.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def _search_postgresql(db: Session, q: str, product_type: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """Recherche classée tsvector + similarité trigramme (tolérance aux fautes)"""
+    rows = db.execute(text(f"""
+        SELECT product_type, product_id, name, category, institution_name,
+               ts_rank_cd(document, query) + similarity(name, :q) AS score
+        FROM {SEARCH_TABLE}, websearch_to_tsquery('{SEARCH_CONFIG}', :q) AS query
+        WHERE is_active AND institution_active
+          AND (document @@ query OR name % :q OR institution_name % :q)
+          AND (CAST(:product_type AS VARCHAR) IS NULL OR product_type = :product_type)
+        ORDER BY score DESC, name
+        LIMIT :limit
+    """), {"q": q, "product_type": product_type, "limit": limit}).mappings().all()
+    return [dict(row) for row in rows]
+
+def _search_sqlite(db: Session, q: str, product_type: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """Recherche FTS5 classée par bm25, avec repli approximatif sur les noms"""
+    match = _fts5_query(q)
+    if not match:
+        return []
+
+    type_filter = "AND product_type = :product_type" if product_type else ""
+    # bm25 renvoie un score négatif (plus petit = plus pertinent) : poids nom > catégorie/institution > description
+    rows = db.execute(text(f"""
+        SELECT product_type, product_id, name, category, institution_name,
+               -bm25({SEARCH_TABLE}, 0.0, 0.0, 10.0, 4.0, 4.0, 1.0, 0.0) AS score
+        FROM {SEARCH_TABLE}
+        WHERE {SEARCH_TABLE} MATCH :match AND is_active = 1 AND institution_active = 1 {type_filter}
+        ORDER BY score DESC
+        LIMIT :limit
+    """), {"match": match, "product_type": product_type, "limit": limit}).mappings().all()
+    results = [dict(row) for row in rows]
+
+    if results:
+        return results
+
+    # Tolérance aux fautes : rapprochement des noms indexés (catalogue de taille modeste)
+    candidates = db.execute(text(f"""
+        SELECT product_type, product_id, name, category, institution_name
+        FROM {SEARCH_TABLE}
+        WHERE is_active = 1 AND institution_active = 1 {type_filter}
+    """), {"product_type": product_type}).mappings().all()
+
+    query = q.lower()
+    scored = []
+    for row in candidates:
+        words = [row["name"].lower()] + _TOKEN_RE.findall(row["name"].lower())
+        score = max(difflib.SequenceMatcher(None, query, word).ratio() for word in words)
+        if score >= 0.6:
+            scored.append({**row, "score": score})
+
+    return sorted(scored, key=lambda item: item["score"], reverse=True)[:limit]
+
+def search_products(db: Session, q: str, product_type: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """Recherche unifiée et classée sur les trois catalogues de produits"""
+    q = (q or "").strip()
+    if not q or not is_available():
+        return []
+
+    if _backend == "postgresql":
+        return _search_postgresql(db, q, product_type, limit)
+    return _search_sqlite(db, q, product_type, limit)
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    if ensure_search_index():
+        session = SessionLocal()
+        try:
+            print(f"{rebuild_search_index(session)} produits indexés")
+        finally:
+            session.close()
+    else:
+        print("Index de recherche indisponible")
@@ -0,0 +1,189 @@
+# session_cache.py - Cache borné (LRU + TTL) des sessions utilisateur validées, indexé par empreinte du token
+# Évite les requêtes UserSession + User à chaque requête authentifiée. Les révocations (déconnexion,
+# réinitialisation, suppression de compte) évincent explicitement ; entre workers, un thread relit
+# périodiquement les utilisateurs modifiés (users.updated_at) et évince leurs entrées.
+from sqlalchemy import select
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+import logging
+import os
+import threading
+import time
+
+from user_models import User, hash_session_token
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+SESSION_CACHE_SYNC_SECONDS = float(os.getenv("SESSION_CACHE_SYNC_SECONDS", "5"))
+
+# Colonnes jamais copiées dans l'instantané (secrets)
+_EXCLUDED_COLUMNS = {"password_hash", "verification_code", "verification_expires_at"}
+SNAPSHOT_COLUMNS = tuple(
+    column.name for column in User.__table__.columns if column.name not in _EXCLUDED_COLUMNS
+)
+
+# Même empreinte que la colonne user_sessions.token_hash (jamais de token en clair dans le cache)
+token_hash = hash_session_token
+
+class UserSnapshot:
+    """Copie en lecture seule d'un utilisateur, détachée de toute session SQLAlchemy"""
+
+    __slots__ = SNAPSHOT_COLUMNS
+
+    def __init__(self, user: User):
+        for name in SNAPSHOT_COLUMNS:
+            value = getattr(user, name)
+            if isinstance(value, dict):
+                value = dict(value)
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UserSnapshot est en lecture seule : charger l'utilisateur pour le modifier")
+
+    def __repr__(self) -> str:
+        return f"<UserSnapshot {self.id}>"
+
+# ==================== CACHE ====================
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, Tuple[UserSnapshot, float]]" = OrderedDict()
+_by_user: Dict[str, Set[str]] = {}
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def _remove(key: str):
+    entry = _entries.pop(key, None)
+    if entry is None:
+        return
+    hashes = _by_user.get(entry[0].id)
+    if hashes:
+        hashes.discard(key)
+        if not hashes:
+            del _by_user[entry[0].id]
+
+def get(token: str) -> Optional[UserSnapshot]:
+    """Utilisateur d'une session validée récemment, ou None (absente ou expirée)"""
+    key = token_hash(token)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry[1] <= now:
+            if entry is not None:
+                _remove(key)
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return entry[0]
+
+def peek(token: str) -> Optional[UserSnapshot]:
+    """Comme get(), sans effet sur l'ordre LRU ni sur les compteurs (contrôle d'admission)"""
+    key = token_hash(token)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+def put(token: str, user: User, session_expires_at: Optional[datetime] = None) -> UserSnapshot:
+    """Met en cache l'utilisateur d'une session valide, au plus jusqu'à l'expiration de la session"""
+    snapshot = UserSnapshot(user)
+    ttl = SESSION_CACHE_TTL_SECONDS
+    if session_expires_at:
+        ttl = min(ttl, (session_expires_at - datetime.utcnow()).total_seconds())
+    if ttl <= 0:
+        return snapshot
+
+    key = token_hash(token)
+    with _lock:
+        _remove(key)
+        _entries[key] = (snapshot, time.monotonic() + ttl)
+        _by_user.setdefault(snapshot.id, set()).add(key)
+        while len(_entries) > SESSION_CACHE_MAX_ENTRIES:
+            _remove(next(iter(_entries)))
+            _stats["evictions"] += 1
+    return snapshot
+
+def evict_token(token: str):
+    """Évince une session (déconnexion)"""
+    evict_hash(token_hash(token))
+
+def evict_hash(digest: str):
+    """Évince une session connue par son empreinte (révocation depuis la liste des sessions)"""
+    with _lock:
+        _remove(digest)
+
+def evict_user(user_id: str):
+    """Évince toutes les sessions d'un utilisateur (déconnexion globale, mot de passe, profil, suppression)"""
+    with _lock:
+        for key in list(_by_user.get(user_id, ())):
+            _remove(key)
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _by_user.clear()
+
+def stats() -> dict:
+    with _lock:
+        return {"entries": len(_entries), "max_entries": SESSION_CACHE_MAX_ENTRIES,
+                "ttl_seconds": SESSION_CACHE_TTL_SECONDS, **_stats}
+
+# ==================== INVALIDATION ENTRE WORKERS ====================
+
+class _Synchronizer:
+    """Évince les utilisateurs modifiés par les autres workers depuis le dernier passage"""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._since: Optional[datetime] = None
+
+    def sync(self):
+        from database import SessionLocal
+
+        # Marge d'une période : un léger décalage d'horloge ou une transaction lente ne fait pas rater de mise à jour
+        now = datetime.utcnow()
+        since = (self._since or now) - timedelta(seconds=SESSION_CACHE_SYNC_SECONDS)
+        db = SessionLocal()
+        try:
+            changed = db.execute(select(User.id).where(User.updated_at >= since)).scalars().all()
+        finally:
+            db.close()
+        self._since = now
+        for user_id in changed:
+            evict_user(user_id)
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            if not _entries:
+                self._since = datetime.utcnow()
+                continue
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Erreur synchronisation du cache de sessions: {e}")
+
+    def start(self, interval: float):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._since = datetime.utcnow()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="session-cache-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+_synchronizer = _Synchronizer()
+
+def start(interval: float = SESSION_CACHE_SYNC_SECONDS):
+    _synchronizer.start(interval)
+
+def stop():
+    _synchronizer.stop()
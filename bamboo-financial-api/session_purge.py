@@ -0,0 +1,93 @@
+# session_purge.py - Purge périodique des sessions utilisateur expirées ou désactivées, par lots
+# Chaque lot est une transaction courte (DELETE ... WHERE id IN (...)) : pas de long verrou sur user_sessions.
+# Usage (depuis la racine de l'API) : python -m session_purge
+from sqlalchemy import delete, or_, select
+from datetime import datetime
+from typing import Optional
+import logging
+import os
+import threading
+
+from user_models import UserSession
+
+logger = logging.getLogger(__name__)
+
+SESSION_PURGE_INTERVAL_SECONDS = float(os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "3600"))
+SESSION_PURGE_BATCH_SIZE = int(os.getenv("SESSION_PURGE_BATCH_SIZE", "1000"))
+
+def purgeable_sessions(now: datetime, batch_size: int):
+    """Identifiants d'un lot de sessions expirées ou désactivées"""
+    return select(UserSession.id).where(
+        or_(UserSession.expires_at < now, UserSession.is_active == False)
+    ).limit(batch_size)
+
+def purge_sessions(batch_size: int = SESSION_PURGE_BATCH_SIZE, max_batches: Optional[int] = None,
+                   stop_event: Optional[threading.Event] = None) -> int:
+    """Supprime les sessions expirées ou désactivées par lots ; retourne le nombre de lignes supprimées"""
+    from database import SessionLocal
+
+    now = datetime.utcnow()
+    deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        db = SessionLocal()
+        try:
+            ids = db.execute(purgeable_sessions(now, batch_size)).scalars().all()
+            if ids:
+                db.execute(delete(UserSession).where(UserSession.id.in_(ids)))
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        deleted += len(ids)
+        batches += 1
+        # Courte pause entre deux lots : laisse passer le trafic d'authentification
+        if len(ids) < batch_size or (stop_event and stop_event.wait(0.05)):
+            break
+
+    if deleted:
+        logger.info(f"Sessions purgées: {deleted} ({batches} lots)")
+    return deleted
+
+class _Purger:
+    """Thread de purge périodique"""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                purge_sessions(stop_event=self._stop)
+            except Exception as e:
+                logger.error(f"Erreur purge des sessions: {e}")
+
+    def start(self, interval: float):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="session-purge", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+_purger = _Purger()
+
+def start(interval: float = SESSION_PURGE_INTERVAL_SECONDS):
+    """Purge toutes les interval secondes (0 pour désactiver)"""
+    if interval > 0:
+        _purger.start(interval)
+
+def stop():
+    _purger.stop()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"{purge_sessions()} sessions purgées")
@@ -0,0 +1,87 @@
+# single_flight.py - Regroupement des calculs identiques simultanés (single-flight) et cache court optionnel
+# La première requête pour une clé lance le calcul dans une tâche ; les doublons qui arrivent pendant
+# le calcul attendent la même tâche au lieu de relancer leurs requêtes SQL. Avec ttl > 0, le résultat
+# est ensuite servi depuis un cache LRU borné pendant ttl secondes (par worker).
+# Le calcul ne dépend d'aucune requête HTTP : il ouvre sa propre session, et l'annulation d'un
+# client (déconnexion) n'interrompt pas le calcul attendu par les autres.
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import os
+import time
+
+SINGLE_FLIGHT_CACHE_MAX_ENTRIES = int(os.getenv("SINGLE_FLIGHT_CACHE_MAX_ENTRIES", "1024"))
+
+def normalize_key(*parts) -> Tuple:
+    """Clé hashable : chaînes sans casse (filtres ilike), nombres entiers et flottants confondus"""
+    normalized = []
+    for part in parts:
+        if isinstance(part, str):
+            part = part.lower()
+        elif isinstance(part, float) and part.is_integer():
+            part = int(part)
+        normalized.append(part)
+    return tuple(normalized)
+
+class SingleFlight:
+    """Un calcul en cours au plus par clé ; résultat partagé (à ne pas modifier) et éventuellement mis en cache"""
+
+    def __init__(self, name: str, ttl: float = 0.0, max_entries: int = SINGLE_FLIGHT_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._cache: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0, "cache_hits": 0, "errors": 0}
+        _flights[name] = self
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Any:
+        """Résultat de function() pour cette clé : depuis le cache, le calcul en cours, ou un nouveau calcul"""
+        self.stats["calls"] += 1
+        if self.ttl > 0:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._cache.move_to_end(key)
+                    self.stats["cache_hits"] += 1
+                    return entry[0]
+                del self._cache[key]
+
+        task = self._calls.get(key)
+        if task is None:
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(function())
+            self._calls[key] = task
+            task.add_done_callback(lambda done, key=key: self._finished(key, done))
+        else:
+            self.stats["coalesced"] += 1
+        # shield : un client annulé ne doit pas annuler le calcul partagé
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            # Erreur transmise à toutes les requêtes en attente, jamais mise en cache
+            self.stats["errors"] += 1
+            return
+        if self.ttl > 0:
+            self._cache[key] = (task.result(), time.monotonic() + self.ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        """Vide le cache (les calculs en cours se terminent normalement)"""
+        self._cache.clear()
+
+    def metrics(self) -> dict:
+        return {"ttl_seconds": self.ttl, "in_flight": len(self._calls), "cached": len(self._cache), **self.stats}
+
+_flights: Dict[str, SingleFlight] = {}
+
+def snapshot() -> dict:
+    """Compteurs de chaque groupe de calculs du worker courant"""
+    return {name: flight.metrics() for name, flight in _flights.items()}
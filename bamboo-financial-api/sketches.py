@@ -0,0 +1,501 @@
+# sketches.py - Esquisses de distribution des simulations : t-digest (quantiles) et HyperLogLog (sessions distinctes)
+# Mises à jour à chaque simulation enregistrée, persistées périodiquement dans simulation_sketches.
+# Usage (depuis la racine de l'API) : python -m sketches  (reconstruction complète depuis les tables brutes)
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session, object_session
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import base64
+import hashlib
+import logging
+import math
+import threading
+import zlib
+
+import models
+
+logger = logging.getLogger(__name__)
+
+Sketch = models.SimulationSketch
+
+# ==================== T-DIGEST ====================
+
+class TDigest:
+    """
+    t-digest fusionnant (Dunning) : au plus ~compression centroïdes, précis aux extrémités.
+    Les valeurs sont d'abord mises en tampon puis fusionnées par lots.
+    """
+
+    BUFFER_SIZE = 500
+
+    def __init__(self, compression: float = 100.0):
+        self.compression = compression
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._means: List[float] = []
+        self._weights: List[float] = []
+        self._buffer: List[Tuple[float, float]] = []
+
+    def add(self, value: float, weight: float = 1.0):
+        value = float(value)
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self._buffer) >= self.BUFFER_SIZE:
+            self._compress()
+
+    def merge(self, other: "TDigest"):
+        """Ajoute les centroïdes d'une autre esquisse (t-digest est fusionnable)"""
+        other._compress()
+        if not other.count:
+            return
+        self._buffer.extend(zip(other._means, other._weights))
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q(self, k: float) -> float:
+        return (math.sin(min(k, self.compression / 4) * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in points)
+
+        means, weights = [], []
+        mean, weight = points[0]
+        cumulated = 0.0
+        limit = self._q(self._k(0) + 1) * total
+        for value, value_weight in points[1:]:
+            if cumulated + weight + value_weight <= limit:
+                weight += value_weight
+                mean += (value - mean) * value_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                cumulated += weight
+                limit = self._q(self._k(cumulated / total) + 1) * total
+                mean, weight = value, value_weight
+        means.append(mean)
+        weights.append(weight)
+        self._means, self._weights = means, weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Valeur estimée au quantile q (0..1), interpolée entre les centres des centroïdes"""
+        self._compress()
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        target = q * self.count
+        cumulated = 0.0
+        previous_center, previous_mean = 0.0, self.min
+        for mean, weight in zip(self._means, self._weights):
+            center = cumulated + weight / 2
+            if target < center:
+                span = center - previous_center
+                ratio = (target - previous_center) / span if span else 0
+                return previous_mean + (mean - previous_mean) * ratio
+            previous_center, previous_mean = center, mean
+            cumulated += weight
+
+        span = self.count - previous_center
+        ratio = (target - previous_center) / span if span else 0
+        return previous_mean + (self.max - previous_mean) * ratio
+
+    def to_dict(self) -> dict:
+        self._compress()
+        return {
+            "compression": self.compression,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "centroids": [[round(mean, 6), weight] for mean, weight in zip(self._means, self._weights)]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TDigest":
+        digest = cls(data.get("compression", 100.0))
+        digest.count = data.get("count", 0)
+        digest.min, digest.max = data.get("min"), data.get("max")
+        for mean, weight in data.get("centroids", []):
+            digest._means.append(mean)
+            digest._weights.append(weight)
+        return digest
+
+# ==================== HYPERLOGLOG ====================
+
+class HyperLogLog:
+    """HyperLogLog à 2^precision registres (erreur type ~1.04/sqrt(2^precision), 1.6 % pour 12)"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str):
+        hashed = int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        rest = hashed & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        """Union : maximum registre par registre"""
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def estimate(self) -> int:
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        raw = alpha * size * size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        # Petites cardinalités : comptage linéaire
+        if raw <= 2.5 * size and zeros:
+            return round(size * math.log(size / zeros))
+        return round(raw)
+
+    def to_dict(self) -> dict:
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(zlib.compress(bytes(self.registers))).decode("ascii")
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HyperLogLog":
+        sketch = cls(data.get("precision", 12))
+        sketch.registers = bytearray(zlib.decompress(base64.b64decode(data["registers"])))
+        return sketch
+
+# ==================== MÉTRIQUES SUIVIES ====================
+
+# Type de simulation -> (modèle, table produits, colonne produit, métriques t-digest)
+SIMULATION_SOURCES = {
+    "credit": (models.CreditSimulation, "credit_products", "credit_product_id",
+               ("requested_amount", "duration_months", "monthly_income", "debt_ratio")),
+    "savings": (models.SavingsSimulation, "savings_products", "savings_product_id",
+                ("initial_amount", "monthly_contribution", "duration_months")),
+}
+SESSIONS_METRIC = "sessions"
+DEFAULT_QUANTILES = (0.5, 0.9)
+
+SketchKey = Tuple[str, str, str, str]  # (simulation_type, scope, scope_key, metric)
+
+def _new_sketch(metric: str):
+    return HyperLogLog() if metric == SESSIONS_METRIC else TDigest()
+
+def _load_sketch(kind: str, payload: dict):
+    return HyperLogLog.from_dict(payload) if kind == "hll" else TDigest.from_dict(payload)
+
+def _kind(sketch) -> str:
+    return "hll" if isinstance(sketch, HyperLogLog) else "tdigest"
+
+def _scopes(product_id: Optional[str], product_type: Optional[str]) -> List[Tuple[str, str]]:
+    scopes = [("all", "")]
+    if product_type:
+        scopes.append(("type", product_type))
+    if product_id:
+        scopes.append(("product", product_id))
+    return scopes
+
+def _observe(target: Dict[SketchKey, object], simulation_type: str, product_id: Optional[str],
+             product_type: Optional[str], values: dict, session_id: Optional[str]):
+    """Ajoute une simulation aux esquisses de chaque portée (globale, type, produit)"""
+    for scope, scope_key in _scopes(product_id, product_type):
+        for metric, value in values.items():
+            if value is None:
+                continue
+            key = (simulation_type, scope, scope_key, metric)
+            if key not in target:
+                target[key] = TDigest()
+            target[key].add(float(value))
+        if session_id:
+            key = (simulation_type, scope, scope_key, SESSIONS_METRIC)
+            if key not in target:
+                target[key] = HyperLogLog()
+            target[key].add(session_id)
+
+# ==================== ÉTAT EN MÉMOIRE ====================
+# _current : vue servie (base + écritures locales) ; _pending : écritures locales pas encore persistées.
+# Chaque worker ne persiste que ses deltas, fusionnés dans la ligne en base : pas d'écrasement.
+
+_lock = threading.Lock()
+_current: Dict[SketchKey, object] = {}
+_pending: Dict[SketchKey, object] = {}
+_product_types: Dict[Tuple[str, str], Optional[str]] = {}
+_loaded_at: Optional[datetime] = None
+_ready = False
+
+# ==================== MAINTENANCE SUR ÉCRITURE ====================
+
+_PENDING_KEY = "sketch_observations"
+
+def _product_type(connection, product_table: str, product_id: str) -> Optional[str]:
+    """Type du produit, mis en cache (une requête par produit et par worker)"""
+    cache_key = (product_table, product_id)
+    if cache_key not in _product_types:
+        _product_types[cache_key] = connection.execute(
+            text(f"SELECT type FROM {product_table} WHERE id = :id"), {"id": product_id}
+        ).scalar()
+    return _product_types[cache_key]
+
+def _insert_listener(simulation_type: str):
+    model, product_table, product_column, metrics = SIMULATION_SOURCES[simulation_type]
+
+    def after_insert(mapper, connection, target):
+        if not _ready:
+            return
+        session = object_session(target)
+        if session is None:
+            return
+        product_id = getattr(target, product_column)
+        product_type = _product_type(connection, product_table, product_id) if product_id else None
+        session.info.setdefault(_PENDING_KEY, []).append((
+            simulation_type, product_id, product_type,
+            {metric: getattr(target, metric) for metric in metrics},
+            target.session_id
+        ))
+    return after_insert
+
+def _apply_pending(session):
+    observations = session.info.pop(_PENDING_KEY, None)
+    if not observations:
+        return
+    with _lock:
+        for observation in observations:
+            _observe(_pending, *observation)
+            _observe(_current, *observation)
+
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+for _simulation_type in SIMULATION_SOURCES:
+    event.listen(SIMULATION_SOURCES[_simulation_type][0], 'after_insert', _insert_listener(_simulation_type))
+
+# Appliquées au commit seulement : une simulation annulée n'entre pas dans les distributions
+event.listen(Session, 'after_commit', _apply_pending)
+event.listen(Session, 'after_rollback', _discard_pending)
+
+# ==================== PERSISTANCE ====================
+
+def _read_all(db: Session) -> Dict[SketchKey, object]:
+    return {
+        (row.simulation_type, row.scope, row.scope_key, row.metric): _load_sketch(row.kind, row.payload)
+        for row in db.execute(select(Sketch)).scalars()
+    }
+
+def _merge_into_rows(db: Session, deltas: Dict[SketchKey, object]):
+    """Fusionne des deltas dans les lignes persistées (verrouillées pendant la mise à jour)"""
+    keys = list(deltas)
+    for start in range(0, len(keys), 200):
+        chunk = keys[start:start + 200]
+        rows = {
+            (row.simulation_type, row.scope, row.scope_key, row.metric): row
+            for row in db.execute(
+                select(Sketch).where(
+                    Sketch.simulation_type.in_({key[0] for key in chunk}),
+                    Sketch.scope.in_({key[1] for key in chunk}),
+                    Sketch.scope_key.in_({key[2] for key in chunk})
+                ).with_for_update()
+            ).scalars()
+        }
+        for key in chunk:
+            delta = deltas[key]
+            row = rows.get(key)
+            if row is None:
+                db.add(Sketch(
+                    simulation_type=key[0], scope=key[1], scope_key=key[2], metric=key[3],
+                    kind=_kind(delta), observations=_observations(delta), payload=delta.to_dict()
+                ))
+                continue
+            stored = _load_sketch(row.kind, row.payload)
+            stored.merge(delta)
+            row.payload = stored.to_dict()
+            row.observations = (row.observations or 0) + _observations(delta)
+
+def _observations(sketch) -> int:
+    return int(sketch.count) if isinstance(sketch, TDigest) else 0
+
+def flush() -> int:
+    """
+    Persiste les deltas locaux puis recharge toutes les esquisses (écritures des autres workers incluses).
+    En cas d'échec, les deltas sont remis en attente pour le prochain passage.
+    """
+    global _pending, _current, _loaded_at
+    from database import SessionLocal
+
+    with _lock:
+        deltas, _pending = _pending, {}
+
+    db = SessionLocal()
+    try:
+        if deltas:
+            _merge_into_rows(db, deltas)
+            db.commit()
+        stored = _read_all(db)
+    except Exception:
+        db.rollback()
+        with _lock:
+            for key, delta in deltas.items():
+                if key in _pending:
+                    delta.merge(_pending[key])
+                _pending[key] = delta
+        raise
+    finally:
+        db.close()
+
+    with _lock:
+        # Deltas arrivés pendant la persistance : pas encore en base, réappliqués à la vue
+        for key, delta in _pending.items():
+            stored.setdefault(key, _new_sketch(key[3])).merge(delta)
+        _current = stored
+        _loaded_at = datetime.utcnow()
+    return len(deltas)
+
+def rebuild(db: Session, batch_size: int = 5000) -> int:
+    """Reconstruit toutes les esquisses depuis les tables brutes (lecture par lots)"""
+    global _current, _pending, _loaded_at
+    rebuilt: Dict[SketchKey, object] = {}
+
+    for simulation_type, (model, product_table, product_column, metrics) in SIMULATION_SOURCES.items():
+        product_model = models.CreditProduct if simulation_type == "credit" else models.SavingsProduct
+        product_id_column = getattr(model, product_column)
+        statement = select(
+            product_id_column, product_model.type, model.session_id,
+            *[getattr(model, metric) for metric in metrics]
+        ).outerjoin(product_model, product_id_column == product_model.id).execution_options(yield_per=batch_size)
+        for row in db.execute(statement):
+            _observe(rebuilt, simulation_type, row[0], row[1], dict(zip(metrics, row[3:])), row[2])
+
+    db.query(Sketch).delete()
+    for key, sketch in rebuilt.items():
+        db.add(Sketch(
+            simulation_type=key[0], scope=key[1], scope_key=key[2], metric=key[3],
+            kind=_kind(sketch), observations=_observations(sketch), payload=sketch.to_dict()
+        ))
+    db.commit()
+
+    with _lock:
+        _current, _pending = rebuilt, {}
+        _loaded_at = datetime.utcnow()
+    logger.info(f"Esquisses de simulations reconstruites: {len(rebuilt)}")
+    return len(rebuilt)
+
+def init_sketches() -> bool:
+    """Crée la table au démarrage, la construit si elle est vide, puis charge les esquisses"""
+    global _ready, _current, _loaded_at
+    from database import SessionLocal, engine
+
+    try:
+        Sketch.__table__.create(bind=engine, checkfirst=True)
+    except Exception as e:
+        logger.error(f"Erreur création des esquisses de simulations: {e}")
+        _ready = False
+        return False
+
+    db = SessionLocal()
+    try:
+        if not db.query(Sketch.metric).first() and (
+            db.query(models.CreditSimulation.id).first() or db.query(models.SavingsSimulation.id).first()
+        ):
+            rebuild(db)
+        else:
+            stored = _read_all(db)
+            with _lock:
+                _current = stored
+                _loaded_at = datetime.utcnow()
+        _ready = True
+        return True
+    finally:
+        db.close()
+
+class _Flusher:
+    """Thread de persistance périodique"""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                flush()
+            except Exception as e:
+                logger.error(f"Erreur persistance des esquisses: {e}")
+
+    def start(self, interval: float):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="sketches-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+_flusher = _Flusher()
+
+def start(interval: float = 60):
+    """Persistance toutes les interval secondes"""
+    _flusher.start(interval)
+
+def stop():
+    """Arrête le thread et persiste les derniers deltas"""
+    _flusher.stop()
+    if _ready:
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Erreur persistance finale des esquisses: {e}")
+
+# ==================== LECTURE ====================
+
+def distribution(simulation_type: str, scope: str = "all", scope_key: str = "",
+                 quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, object]:
+    """Quantiles de chaque métrique et nombre estimé de sessions distinctes pour une portée"""
+    metrics = SIMULATION_SOURCES[simulation_type][3]
+    quantiles = tuple(quantiles)
+    result = {"metrics": {}, "unique_sessions": 0}
+
+    with _lock:
+        for metric in metrics:
+            digest = _current.get((simulation_type, scope, scope_key, metric))
+            if digest is None or not digest.count:
+                result["metrics"][metric] = {"count": 0, "min": None, "max": None,
+                                             **{f"p{round(q * 100)}": None for q in quantiles}}
+                continue
+            result["metrics"][metric] = {
+                "count": int(digest.count),
+                "min": digest.min,
+                "max": digest.max,
+                **{f"p{round(q * 100)}": round(digest.quantile(q), 2) for q in quantiles}
+            }
+        sessions = _current.get((simulation_type, scope, scope_key, SESSIONS_METRIC))
+        result["unique_sessions"] = sessions.estimate() if sessions else 0
+
+    result["loaded_at"] = _loaded_at.isoformat() if _loaded_at else None
+    return result
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+
+    Sketch.__table__.create(bind=engine, checkfirst=True)
+    session = SessionLocal()
+    try:
+        print(f"{rebuild(session)} esquisses reconstruites")
+    finally:
+        session.close()
@@ -0,0 +1,230 @@
+# streaming_export.py - Exports en flux (CSV, NDJSON, XLSX) à mémoire constante
+# Les lignes sont lues par lots (yield_per / curseur serveur) et écrites au fil de l'eau
+# dans une StreamingResponse : ni le résultat complet ni le fichier ne sont gardés en mémoire.
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+import csv
+import io
+import json
+import re
+import zipfile
+
+from database import ReadSessionLocal
+
+BATCH_SIZE = 1000
+EXPORT_FORMATS = ("csv", "ndjson", "excel")
+EXPORT_FORMAT_PATTERN = "^(csv|ndjson|excel)$"
+
+class ExportColumn:
+    """Colonne exportée : clé NDJSON, en-tête CSV/XLSX, expression SQL et mise en forme optionnelle"""
+
+    def __init__(self, key: str, header: str, expression, formatter: Optional[Callable[[Any], Any]] = None):
+        self.key = key
+        self.header = header
+        self.expression = expression
+        self.formatter = formatter
+
+# ==================== LECTURE PAR LOTS ====================
+
+def iter_batches(statement, columns: Sequence[ExportColumn], batch_size: int = BATCH_SIZE,
+                 session_factory=ReadSessionLocal) -> Iterator[List[list]]:
+    """
+    Exécute la requête avec yield_per (curseur côté serveur sous PostgreSQL) et produit des lots
+    de lignes mises en forme. La session appartient au générateur : elle reste ouverte pendant
+    l'envoi de la réponse et se ferme à la fin du flux ou si le client se déconnecte.
+    """
+    formatters = [column.formatter for column in columns]
+    db = session_factory()
+    try:
+        result = db.execute(statement.execution_options(yield_per=batch_size))
+        for partition in result.partitions():
+            yield [
+                [formatter(value) if formatter else value for formatter, value in zip(formatters, row)]
+                for row in partition
+            ]
+    finally:
+        db.close()
+
+# ==================== ÉCRITURE ====================
+
+def _text_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def csv_chunks(columns: Sequence[ExportColumn], batches: Iterable[List[list]]) -> Iterator[bytes]:
+    """CSV : en-têtes puis un bloc d'octets par lot"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.header for column in columns])
+    yield buffer.getvalue().encode("utf-8")
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_text_value(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+
+def ndjson_chunks(columns: Sequence[ExportColumn], batches: Iterable[List[list]]) -> Iterator[bytes]:
+    """NDJSON : un objet JSON par ligne"""
+    keys = [column.key for column in columns]
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(keys, row)), default=_json_default, ensure_ascii=False) + "\n"
+            for row in batch
+        ).encode("utf-8")
+
+# ---------- XLSX ----------
+# Classeur minimal (une feuille, chaînes en ligne) écrit dans une archive zip en flux :
+# zipfile accepte une sortie non adressable et utilise alors des descripteurs de données.
+
+_XLSX_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_XLSX_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_XLSX_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{_XLSX_REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+class _ChunkSink(io.RawIOBase):
+    """Sortie non adressable qui accumule les octets écrits jusqu'au prochain drain()"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def _xlsx_cell(reference: str, value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    text = escape(_INVALID_XML_CHARS.sub("", _text_value(value)))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _xlsx_row(number: int, letters: List[str], values: Sequence) -> str:
+    cells = "".join(_xlsx_cell(f"{letter}{number}", value) for letter, value in zip(letters, values))
+    return f'<row r="{number}">{cells}</row>'
+
+def xlsx_chunks(columns: Sequence[ExportColumn], batches: Iterable[List[list]], sheet_name: str = "Export") -> Iterator[bytes]:
+    """XLSX : feuille unique écrite ligne à ligne dans une archive zip produite en flux"""
+    sink = _ChunkSink()
+    letters = [_column_letter(index) for index in range(len(columns))]
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, _XML_HEADER + content)
+        archive.writestr("xl/workbook.xml", _XML_HEADER + (
+            f'<workbook xmlns="{_XLSX_MAIN_NS}" xmlns:r="{_XLSX_REL_NS}">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield sink.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((
+                _XML_HEADER + f'<worksheet xmlns="{_XLSX_MAIN_NS}"><sheetData>'
+                + _xlsx_row(1, letters, [column.header for column in columns])
+            ).encode("utf-8"))
+
+            number = 1
+            for batch in batches:
+                rows = []
+                for row in batch:
+                    number += 1
+                    rows.append(_xlsx_row(number, letters, row))
+                sheet.write("".join(rows).encode("utf-8"))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+
+            sheet.write(b"</sheetData></worksheet>")
+
+    yield sink.drain()
+
+# ==================== RÉPONSE ====================
+
+_MEDIA_TYPES = {
+    "csv": ("text/csv", "csv"),  # Starlette ajoute lui-même "; charset=utf-8" aux types text/*
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "excel": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+def content_disposition(filename: str) -> str:
+    """En-tête de téléchargement : nom entre guillemets (repli ASCII) et forme RFC 5987 pour les accents"""
+    fallback = filename.encode("ascii", "replace").decode("ascii").replace("\\", "_").replace('"', "_")
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+def export_response(statement, columns: Sequence[ExportColumn], format: str, filename: str,
+                    batch_size: int = BATCH_SIZE) -> StreamingResponse:
+    """StreamingResponse d'un export dans le format demandé (csv, ndjson ou excel)"""
+    media_type, extension = _MEDIA_TYPES[format]
+    batches = iter_batches(statement, columns, batch_size)
+
+    if format == "csv":
+        body = csv_chunks(columns, batches)
+    elif format == "ndjson":
+        body = ndjson_chunks(columns, batches)
+    else:
+        body = xlsx_chunks(columns, batches, sheet_name=filename)
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": content_disposition(f"{filename}.{extension}")}
+    )
@@ -0,0 +1,238 @@
+# suggest_index.py - Index de préfixes en mémoire pour l'autocomplétion (produits, banques, assureurs)
+# Les recherches lisent les tableaux en mémoire sans session SQL. Après une écriture du catalogue,
+# l'index est reconstruit dans le pool de threads (une seule reconstruction à la fois, single-flight)
+# pendant que les requêtes continuent d'être servies par les anciens tableaux.
+# Entre workers, un thread compare périodiquement la version du catalogue (nombre de lignes et
+# MAX(updated_at) de chaque table) à celle de la dernière reconstruction ; un âge maximal sert de filet.
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, object_session
+from typing import List, Dict, Any, Optional, Set, Tuple
+import asyncio
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+import models
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_INDEX_SYNC_SECONDS = float(os.getenv("SUGGEST_INDEX_SYNC_SECONDS", "10"))
+SUGGEST_INDEX_MAX_AGE_SECONDS = float(os.getenv("SUGGEST_INDEX_MAX_AGE_SECONDS", "900"))
+
+# Sources indexées : (modèle, type de suggestion)
+SUGGEST_SOURCES = (
+    (models.CreditProduct, "credit"),
+    (models.SavingsProduct, "savings"),
+    (models.InsuranceProduct, "insurance"),
+    (models.Bank, "bank"),
+    (models.InsuranceCompany, "insurer"),
+)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Tableau trié de clés normalisées et entrées associées (remplacés d'un bloc à chaque reconstruction)
+_keys: Tuple[str, ...] = ()
+_entries: Tuple[Dict[str, Any], ...] = ()
+_stale = True
+_built = False
+_generation = 0  # incrémenté à chaque invalidation : une reconstruction déjà commencée reste périmée
+_version: Optional[Tuple] = None  # version du catalogue lue par la dernière reconstruction
+_built_at = 0.0
+_lock = threading.Lock()
+_rebuild_flight = SingleFlight("suggest_index")
+_background: Set[asyncio.Task] = set()
+
+def normalize(value: str) -> str:
+    """Minuscules sans accents, pour une comparaison de préfixes stable"""
+    value = unicodedata.normalize("NFKD", value or "")
+    return "".join(c for c in value if not unicodedata.combining(c)).lower().strip()
+
+def _index_keys(name: str) -> List[str]:
+    """Clés d'un nom : le nom complet puis chaque suffixe commençant à un mot"""
+    normalized = normalize(name)
+    starts = [match.start() for match in _WORD_RE.finditer(normalized)]
+    return list(dict.fromkeys(normalized[start:] for start in starts)) or [normalized]
+
+def catalog_version(db: Session) -> Tuple:
+    """(nombre de lignes, dernier updated_at) de chaque table indexée, en une requête :
+    change à toute insertion, modification ou suppression, quel que soit le worker"""
+    columns = []
+    for model, kind in SUGGEST_SOURCES:
+        columns.append(select(func.count(model.id)).scalar_subquery())
+        columns.append(select(func.max(model.updated_at)).scalar_subquery())
+    return tuple(db.execute(select(*columns)).one())
+
+def rebuild(db: Session) -> int:
+    """Reconstruit l'index à partir du catalogue actif (synchrone : hors de la boucle d'événements)"""
+    global _keys, _entries, _stale, _built, _version, _built_at
+
+    generation = _generation
+    # Lue avant les lignes : une écriture concurrente donne une version différente au prochain contrôle
+    version = catalog_version(db)
+    pairs = []
+    for model, kind in SUGGEST_SOURCES:
+        rows = db.query(model.id, model.name).filter(model.is_active == True).all()
+        for row in rows:
+            if not row.name:
+                continue
+            entry = {"id": row.id, "label": row.name, "kind": kind}
+            for key in _index_keys(row.name):
+                pairs.append((key, entry))
+
+    pairs.sort(key=lambda pair: pair[0])
+    with _lock:
+        _keys = tuple(pair[0] for pair in pairs)
+        _entries = tuple(pair[1] for pair in pairs)
+        _stale = generation != _generation
+        _built = True
+        _version = version
+        _built_at = time.monotonic()
+
+    logger.info(f"Index d'autocomplétion reconstruit: {len(pairs)} clés")
+    return len(pairs)
+
+def _rebuild_detached() -> int:
+    """Reconstruction avec sa propre session (primaire : l'écriture qui a invalidé l'index doit être vue)"""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return rebuild(db)
+    finally:
+        db.close()
+
+async def refresh() -> int:
+    """Reconstruit l'index dans le pool de threads ; les appels simultanés partagent la même reconstruction"""
+    return await _rebuild_flight.do("rebuild", lambda: run_in_threadpool(_rebuild_detached))
+
+async def _refresh_quietly():
+    try:
+        await refresh()
+    except Exception as e:
+        logger.error(f"Erreur reconstruction de l'index d'autocomplétion: {e}")
+
+def _schedule_refresh():
+    """Lance la reconstruction en tâche de fond (référence gardée jusqu'à la fin de la tâche)"""
+    task = asyncio.ensure_future(_refresh_quietly())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+async def suggest(q: str, limit: int = 8) -> List[Dict[str, Any]]:
+    """Retourne les complétions dont un mot commence par la saisie"""
+    prefix = normalize(q)
+    if not prefix:
+        return []
+
+    if _built and time.monotonic() - _built_at > SUGGEST_INDEX_MAX_AGE_SECONDS:
+        invalidate()
+
+    if _stale:
+        if _built:
+            # Les anciens tableaux restent servis pendant la reconstruction
+            _schedule_refresh()
+        else:
+            await refresh()
+
+    keys, entries = _keys, _entries
+    results = []
+    seen = set()
+    position = bisect.bisect_left(keys, prefix)
+    while position < len(keys) and keys[position].startswith(prefix):
+        entry = entries[position]
+        identity = (entry["kind"], entry["id"])
+        if identity not in seen:
+            seen.add(identity)
+            results.append(entry)
+            if len(results) >= limit:
+                break
+        position += 1
+
+    return results
+
+def invalidate():
+    """Force la reconstruction de l'index à la prochaine requête"""
+    global _stale, _generation
+    with _lock:
+        _generation += 1
+        _stale = True
+
+# ==================== INVALIDATION SUR ÉCRITURE ====================
+
+def _mark_session_dirty(mapper, connection, target):
+    """Note dans la session qu'un nom du catalogue a pu changer"""
+    session = object_session(target)
+    if session is not None:
+        session.info["suggest_index_dirty"] = True
+
+def _after_commit(session):
+    """Invalide l'index seulement une fois l'écriture validée"""
+    if session.info.pop("suggest_index_dirty", False):
+        invalidate()
+
+def _after_rollback(session):
+    """Oublie les modifications annulées"""
+    session.info.pop("suggest_index_dirty", None)
+
+for _model, _kind in SUGGEST_SOURCES:
+    event.listen(_model, 'after_insert', _mark_session_dirty)
+    event.listen(_model, 'after_update', _mark_session_dirty)
+    event.listen(_model, 'after_delete', _mark_session_dirty)
+
+event.listen(Session, 'after_commit', _after_commit)
+event.listen(Session, 'after_rollback', _after_rollback)
+
+# ==================== INVALIDATION ENTRE WORKERS ====================
+
+class _Synchronizer:
+    """Invalide l'index quand le catalogue a été modifié par un autre worker"""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sync(self):
+        from database import SessionLocal
+
+        if not _built or _stale:
+            return
+        db = SessionLocal()
+        try:
+            version = catalog_version(db)
+        finally:
+            db.close()
+        if version != _version:
+            invalidate()
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Erreur contrôle de version de l'index d'autocomplétion: {e}")
+
+    def start(self, interval: float):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="suggest-index-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+_synchronizer = _Synchronizer()
+
+def start(interval: float = SUGGEST_INDEX_SYNC_SECONDS):
+    _synchronizer.start(interval)
+
+def stop():
+    _synchronizer.stop()
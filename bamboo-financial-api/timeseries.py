@@ -0,0 +1,125 @@
+# timeseries.py - Séries temporelles portables (PostgreSQL / SQLite) : regroupement, trous, sous-échantillonnage
+from sqlalchemy import Date, cast, func
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+
+GRANULARITIES = ("day", "week", "month")
+GRANULARITY_PATTERN = "^(day|week|month)$"
+DEFAULT_MAX_POINTS = 60
+
+# ==================== CALENDRIER ====================
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    # SQLite renvoie les dates sous forme de texte 'AAAA-MM-JJ[ HH:MM:SS]'
+    return date.fromisoformat(str(value)[:10])
+
+def bucket_start(value, granularity: str) -> date:
+    """Début du créneau contenant une date (semaines ISO : lundi)"""
+    day = _as_date(value)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def next_bucket(bucket: date, granularity: str) -> date:
+    """Début du créneau suivant"""
+    if granularity == "week":
+        return bucket + timedelta(days=7)
+    if granularity == "month":
+        return date(bucket.year + bucket.month // 12, bucket.month % 12 + 1, 1)
+    return bucket + timedelta(days=1)
+
+def bucket_range(start, end, granularity: str) -> List[date]:
+    """Tous les créneaux entre deux dates, bornes incluses"""
+    buckets = []
+    bucket, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    while bucket <= last:
+        buckets.append(bucket)
+        bucket = next_bucket(bucket, granularity)
+    return buckets
+
+def auto_granularity(start, end, max_points: int = DEFAULT_MAX_POINTS) -> str:
+    """Créneau le plus fin dont le nombre de points tient dans max_points"""
+    days = (_as_date(end) - _as_date(start)).days + 1
+    if days <= max_points:
+        return "day"
+    if math.ceil(days / 7) + 1 <= max_points:
+        return "week"
+    return "month"
+
+# ==================== SQL ====================
+
+def bucket_expression(column, granularity: str, dialect_name: str):
+    """Expression SQL du début de créneau, équivalente à bucket_start()"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularité inconnue: {granularity}")
+
+    if dialect_name == "postgresql":
+        if granularity == "day":
+            return cast(column, Date)
+        return cast(func.date_trunc(granularity, column), Date)
+
+    # SQLite : modificateurs de date()
+    if granularity == "week":
+        return func.date(column, "-6 days", "weekday 1")
+    if granularity == "month":
+        return func.date(column, "start of month")
+    return func.date(column)
+
+# ==================== SÉRIES ====================
+
+def fill_gaps(values: Dict[date, dict], start, end, granularity: str, metrics: Iterable[str]) -> List[dict]:
+    """Série complète : un point par créneau, à zéro quand la base n'a rien renvoyé"""
+    metrics = tuple(metrics)
+    empty = {name: 0 for name in metrics}
+    return [
+        {"bucket": bucket, **values.get(bucket, empty)}
+        for bucket in bucket_range(start, end, granularity)
+    ]
+
+def downsample(points: List[dict], max_points: int, metrics: Iterable[str]) -> List[dict]:
+    """Fusionne des créneaux consécutifs (métriques additives) pour ne pas dépasser max_points"""
+    if max_points < 1 or len(points) <= max_points:
+        return points
+    metrics = tuple(metrics)
+    size = math.ceil(len(points) / max_points)
+    merged = []
+    for index in range(0, len(points), size):
+        group = points[index:index + size]
+        merged.append({
+            "bucket": group[0]["bucket"],
+            **{name: sum(point[name] for point in group) for name in metrics}
+        })
+    return merged
+
+def series(db: Session, column, metrics: Dict[str, object], start, end,
+           granularity: Optional[str] = None, max_points: int = DEFAULT_MAX_POINTS,
+           filters: Tuple = ()) -> Tuple[str, List[dict]]:
+    """
+    Agrège des métriques additives (SUM/COUNT) par créneau entre start et end, trous comblés.
+    Sans granularité, choisit la plus fine qui tient dans max_points ; au-delà, sous-échantillonne.
+    Retourne (granularité, [{"bucket": date, métrique: valeur, ...}]).
+    """
+    granularity = granularity or auto_granularity(start, end, max_points)
+    bucket = bucket_expression(column, granularity, db.get_bind().dialect.name).label("bucket")
+
+    rows = db.query(bucket, *[expression.label(name) for name, expression in metrics.items()]).filter(
+        column >= _as_date(start), *filters
+    ).group_by(bucket).all()
+
+    values = {}
+    for row in rows:
+        point = values.setdefault(bucket_start(row.bucket, granularity), {name: 0 for name in metrics})
+        for name in metrics:
+            value = getattr(row, name) or 0
+            point[name] += int(value) if isinstance(value, int) else float(value)
+
+    points = fill_gaps(values, start, end, granularity, metrics)
+    return granularity, downsample(points, max_points, metrics)
@@ -5,6 +5,7 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
+import hashlib
 import uuid
 import secrets
 
@@ -15,6 +16,10 @@ except ImportError:
     from sqlalchemy.ext.declarative import declarative_base
     Base = declarative_base()
 
+def hash_session_token(token: str) -> str:
+    """Empreinte SHA-256 (hex, 64 caractères) d'un token de session : seule valeur stockée en base"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 # ==================== MODÈLES UTILISATEUR ====================
 
 class User(Base):
@@ -116,7 +121,8 @@ class UserSession(Base):
     user_id = Column(String(50), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     
     # Informations de session
-    token = Column(String(500), unique=True, nullable=False, index=True)
+    # Empreinte du JWT (jamais le token lui-même) : index unique à largeur fixe
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
     device_info = Column(JSON, default=dict, nullable=False)
     ip_address = Column(String(45), nullable=True)
     user_agent = Column(Text, nullable=True)